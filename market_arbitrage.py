@@ -1,9 +1,12 @@
 # Objective: find market arbitrages, e.g. sell a pack for more (fee excluded) than the cost to craft it (fee included).
 
 
+from contextlib import nullcontext
 from typing import Annotated
 
+from src.data_context import shared_data_context
 from src.inventory_utils import create_then_sell_booster_packs_for_batch
+from src.item_nameid_backfill import background_item_nameid_backfill
 from src.market_arbitrage_utils import (
     convert_arbitrages_for_batch_create_then_sell,
     find_badge_arbitrages,
@@ -13,13 +16,19 @@ from src.market_arbitrage_utils import (
 )
 from src.market_listing import update_marketability_status
 from src.market_order import load_market_order_data
+from src.profiling_utils import profiling_hook
 from src.sack_of_gems import print_gem_price_reminder
+from src.telemetry_utils import set_num_items_out, track_stage, track_workflow
 
 
+@track_workflow("market_arbitrage")
+@shared_data_context()
 def apply_workflow(
     *,  # enforce keyword arguments
     retrieve_listings_from_scratch: bool = True,
     retrieve_market_orders_online: bool = True,
+    refresh_only_changed_listings: bool = False,
+    stale_while_revalidate: bool = False,
     enforced_sack_of_gems_price: float | None = None,
     minimum_allowed_sack_of_gems_price: float | None = None,
     automatically_create_then_sell_booster_packs: bool = False,
@@ -51,18 +60,55 @@ def apply_workflow(
         from_javascript=from_javascript,
     )
 
-    market_order_dict = load_market_order_data(
-        filtered_badge_data,
-        retrieve_market_orders_online=retrieve_market_orders_online,
-        verbose=verbose,
-    )
+    def print_revalidated_arbitrages(
+        revalidated_market_order_dict: dict[str, dict],
+    ) -> None:
+        print(
+            "# Results after *background* update of market order data for the most relevant arbitrages",
+        )
+        print_arbitrages(
+            find_badge_arbitrages(
+                filtered_badge_data,
+                revalidated_market_order_dict,
+            ),
+        )
 
-    badge_arbitrages = find_badge_arbitrages(
-        filtered_badge_data,
-        market_order_dict,
-        verbose=verbose,
+    # Missing item name IDs are backfilled in the background, with the budget of listing queries left idle while market
+    # orders are downloaded. NB: the backfill starts after the crawl of search pages, so that it is prioritized based on
+    # the latest listings.
+    backfill = (
+        background_item_nameid_backfill(
+            from_javascript=from_javascript,
+            verbose=verbose,
+        )
+        if retrieve_market_orders_online
+        else nullcontext()
     )
 
+    # NB: if stale_while_revalidate is True, market orders are loaded from disk, so that results are displayed at once,
+    # and an updated ranking is displayed once the most relevant market orders are downloaded again.
+    with (
+        backfill,
+        track_stage("load market order data", filtered_badge_data) as stage,
+    ):
+        market_order_dict = load_market_order_data(
+            filtered_badge_data,
+            retrieve_market_orders_online=retrieve_market_orders_online,
+            refresh_only_changed_listings=refresh_only_changed_listings,
+            stale_while_revalidate=stale_while_revalidate,
+            on_revalidated=print_revalidated_arbitrages,
+            verbose=verbose,
+        )
+        set_num_items_out(stage, market_order_dict)
+
+    with track_stage("find badge arbitrages", filtered_badge_data) as stage:
+        badge_arbitrages = find_badge_arbitrages(
+            filtered_badge_data,
+            market_order_dict,
+            verbose=verbose,
+        )
+        set_num_items_out(stage, badge_arbitrages)
+
     print("# Reminder of the gem price")
     print_gem_price_reminder(
         enforced_sack_of_gems_price=enforced_sack_of_gems_price,
@@ -79,18 +125,25 @@ def apply_workflow(
     )
     print_arbitrages(badge_arbitrages)
 
-    latest_badge_arbitrages = update_badge_arbitrages_with_latest_market_order_data(
-        badge_data=filtered_badge_data,
-        arbitrage_data=badge_arbitrages,
-        retrieve_market_orders_online=True,
-        verbose=verbose,
-    )
+    with track_stage(
+        "update arbitrages with latest market orders",
+        badge_arbitrages,
+    ) as stage:
+        latest_badge_arbitrages = update_badge_arbitrages_with_latest_market_order_data(
+            badge_data=filtered_badge_data,
+            arbitrage_data=badge_arbitrages,
+            retrieve_market_orders_online=True,
+            verbose=verbose,
+        )
+        set_num_items_out(stage, latest_badge_arbitrages)
+
     # Update marketability status
     if enforce_update_of_marketability_status:
         few_selected_listing_hashes = list(latest_badge_arbitrages.keys())
-        item_nameids = update_marketability_status(
-            few_selected_listing_hashes=few_selected_listing_hashes,
-        )
+        with track_stage("update marketability status", few_selected_listing_hashes):
+            item_nameids = update_marketability_status(
+                few_selected_listing_hashes=few_selected_listing_hashes,
+            )
 
         # Override values which had been previously loaded into memory
         #
@@ -112,11 +165,15 @@ def apply_workflow(
             profit_threshold=profit_threshold,
         )
 
-        _creation_results, _sale_results = create_then_sell_booster_packs_for_batch(
+        with track_stage(
+            "create then sell booster packs",
             price_dict_for_listing_hashes,
-            focus_on_marketable_items=True,
-            profile_id=profile_id,
-        )
+        ):
+            _creation_results, _sale_results = create_then_sell_booster_packs_for_batch(
+                price_dict_for_listing_hashes,
+                focus_on_marketable_items=True,
+                profile_id=profile_id,
+            )
 
     return True
 
@@ -124,6 +181,8 @@ def apply_workflow(
 def main() -> bool:
     retrieve_listings_from_scratch = True
     retrieve_market_orders_online = True
+    # Listings are crawled first, so market orders are only downloaded for listings which changed on search pages.
+    refresh_only_changed_listings = True
     enforced_sack_of_gems_price = None
     minimum_allowed_sack_of_gems_price = None
     automatically_create_then_sell_booster_packs = True
@@ -137,6 +196,7 @@ def main() -> bool:
     apply_workflow(
         retrieve_listings_from_scratch=retrieve_listings_from_scratch,
         retrieve_market_orders_online=retrieve_market_orders_online,
+        refresh_only_changed_listings=refresh_only_changed_listings,
         enforced_sack_of_gems_price=enforced_sack_of_gems_price,
         minimum_allowed_sack_of_gems_price=minimum_allowed_sack_of_gems_price,
         automatically_create_then_sell_booster_packs=automatically_create_then_sell_booster_packs,
@@ -152,4 +212,5 @@ def main() -> bool:
 
 
 if __name__ == "__main__":
-    main()
+    with profiling_hook("market_arbitrage"):
+        main()
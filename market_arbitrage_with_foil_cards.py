@@ -4,6 +4,9 @@
 # ALL the computations are performed with fee included: opportunities are compared from the perspective of the buyer.
 #
 # In summary, we do not care about buy orders here! We only care about sell orders!
+from src.data_context import shared_data_context
+from src.goo_value_predictor import find_app_ids_whose_query_can_be_skipped
+from src.item_type_inference import infer_item_types
 from src.market_foil_utils import (
     build_dictionary_of_representative_listing_hashes,
     determine_whether_an_arbitrage_might_exist_for_foil_cards,
@@ -24,14 +27,19 @@ from src.market_foil_utils import (
     try_again_to_download_item_type,
 )
 from src.market_listing import get_item_nameid_batch, load_all_listing_details
+from src.profiling_utils import profiling_hook
 from src.sack_of_gems import load_sack_of_gems_price
+from src.telemetry_utils import set_num_items_out, track_stage, track_workflow
 from src.utils import (
+    convert_listing_hash_to_app_id,
     get_goo_details_file_nam_for_for_foil_cards,
     get_listing_details_output_file_name_for_foil_cards,
     get_listing_output_file_name_for_foil_cards,
 )
 
 
+@track_workflow("market_arbitrage_with_foil_cards")
+@shared_data_context()
 def apply_workflow_for_foil_cards(
     *,
     retrieve_listings_from_scratch: bool = False,
@@ -39,6 +47,8 @@ def apply_workflow_for_foil_cards(
     retrieve_gem_price_from_scratch: bool = False,
     enforced_sack_of_gems_price: float | None = None,  # price in euros
     start_index: int = 0,
+    use_goo_value_predictor: bool = False,
+    use_item_type_inference: bool = False,
     verbose: bool = True,
 ) -> bool:
     listing_output_file_name = get_listing_output_file_name_for_foil_cards()
@@ -51,19 +61,25 @@ def apply_workflow_for_foil_cards(
 
     # Fetch all the listings of foil cards
 
-    all_listings = get_listings_for_foil_cards(
-        retrieve_listings_from_scratch=retrieve_listings_from_scratch,
-        listing_output_file_name=listing_output_file_name,
-        start_index=start_index,
-        verbose=verbose,
-    )
+    with track_stage("load listings") as stage:
+        listing_index = get_listings_for_foil_cards(
+            retrieve_listings_from_scratch=retrieve_listings_from_scratch,
+            listing_output_file_name=listing_output_file_name,
+            start_index=start_index,
+            with_index=True,
+            verbose=verbose,
+        )
+        all_listings = listing_index["listings"]
+        set_num_items_out(stage, all_listings)
 
     # Group listings by appID
 
-    groups_by_app_id = group_listing_hashes_by_app_id(
-        all_listings,
-        verbose=verbose,
-    )
+    with track_stage("group listing hashes by appID", all_listings) as stage:
+        groups_by_app_id = group_listing_hashes_by_app_id(
+            listing_index,
+            verbose=verbose,
+        )
+        set_num_items_out(stage, groups_by_app_id)
 
     # Find the cheapest listing in each group
 
@@ -109,18 +125,19 @@ def apply_workflow_for_foil_cards(
 
     # Filter out listings associated with an appID for which we already know the goo details.
 
-    filtered_representative_listing_hashes_with_missing_goo_details = filter_out_listing_hashes_if_goo_details_are_already_known_for_app_id(
+    with track_stage(
+        "filter out appIDs with known goo details",
         filtered_representative_listing_hashes,
-        goo_details_file_name_for_for_foil_cards=goo_details_file_name_for_for_foil_cards,
-        verbose=verbose,
-    )
-
-    # Pre-retrieval of item name ids (and item types at the same time)
-
-    get_item_nameid_batch(
-        filtered_representative_listing_hashes_with_missing_goo_details,
-        listing_details_output_file_name=listing_details_output_file_name,
-    )
+    ) as stage:
+        filtered_representative_listing_hashes_with_missing_goo_details = filter_out_listing_hashes_if_goo_details_are_already_known_for_app_id(
+            filtered_representative_listing_hashes,
+            goo_details_file_name_for_for_foil_cards=goo_details_file_name_for_for_foil_cards,
+            verbose=verbose,
+        )
+        set_num_items_out(
+            stage,
+            filtered_representative_listing_hashes_with_missing_goo_details,
+        )
 
     # Load the price of a sack of 1000 gems
 
@@ -132,34 +149,108 @@ def apply_workflow_for_foil_cards(
     else:
         sack_of_gems_price_in_euros = enforced_sack_of_gems_price
 
+    # Skip appIDs which cannot be profitable, according to goo values predicted offline
+
+    if use_goo_value_predictor:
+        with track_stage("predict goo values", groups_by_app_id) as stage:
+            app_ids_to_skip = find_app_ids_whose_query_can_be_skipped(
+                list(groups_by_app_id),
+                all_listings=all_listings,
+                cheapest_listing_hashes=cheapest_listing_hashes,
+                sack_of_gems_price_in_euros=sack_of_gems_price_in_euros,
+                goo_details_file_name=goo_details_file_name_for_for_foil_cards,
+                verbose=verbose,
+            )
+            set_num_items_out(stage, app_ids_to_skip)
+
+        app_ids_to_skip_as_a_set = set(app_ids_to_skip)
+        filtered_representative_listing_hashes_with_missing_goo_details = [
+            listing_hash
+            for listing_hash in filtered_representative_listing_hashes_with_missing_goo_details
+            if convert_listing_hash_to_app_id(listing_hash)
+            not in app_ids_to_skip_as_a_set
+        ]
+    else:
+        app_ids_to_skip = None
+
+    # Infer item types offline, so that listing pages are only fetched for appIDs with an uncertain item type
+
+    if use_item_type_inference:
+        with track_stage("infer item types", groups_by_app_id) as stage:
+            inferred_item_types = infer_item_types(
+                list(groups_by_app_id),
+                all_listing_details=load_all_listing_details(
+                    listing_details_output_file_name=listing_details_output_file_name,
+                ),
+                verbose=verbose,
+            )
+            set_num_items_out(stage, inferred_item_types)
+
+        filtered_representative_listing_hashes_with_missing_goo_details = [
+            listing_hash
+            for listing_hash in filtered_representative_listing_hashes_with_missing_goo_details
+            if convert_listing_hash_to_app_id(listing_hash) not in inferred_item_types
+        ]
+    else:
+        inferred_item_types = None
+
+    # Pre-retrieval of item name ids (and item types at the same time)
+
+    with track_stage(
+        "get item name ids",
+        filtered_representative_listing_hashes_with_missing_goo_details,
+    ):
+        get_item_nameid_batch(
+            filtered_representative_listing_hashes_with_missing_goo_details,
+            listing_details_output_file_name=listing_details_output_file_name,
+        )
+
     # Fetch goo values
 
+    # NB: listing details are loaded, and indexed by appID, only once for the rest of the workflow.
     all_listing_details = load_all_listing_details(
         listing_details_output_file_name=listing_details_output_file_name,
     )
 
-    all_goo_details = download_missing_goo_details(
-        groups_by_app_id=groups_by_app_id,
-        listing_candidates=filtered_representative_listing_hashes_with_missing_goo_details,
-        all_listing_details=all_listing_details,
-        listing_details_output_file_name=listing_details_output_file_name,
-        goo_details_file_name_for_for_foil_cards=goo_details_file_name_for_for_foil_cards,
-        verbose=verbose,
+    dictionary_of_representative_listing_hashes = (
+        build_dictionary_of_representative_listing_hashes(all_listing_details)
     )
 
+    with track_stage("download missing goo details", groups_by_app_id):
+        all_goo_details = download_missing_goo_details(
+            groups_by_app_id=groups_by_app_id,
+            listing_candidates=filtered_representative_listing_hashes_with_missing_goo_details,
+            all_listing_details=all_listing_details,
+            listing_details_output_file_name=listing_details_output_file_name,
+            goo_details_file_name_for_for_foil_cards=goo_details_file_name_for_for_foil_cards,
+            dictionary_of_representative_listing_hashes=dictionary_of_representative_listing_hashes,
+            app_ids_to_skip=app_ids_to_skip,
+            inferred_item_types=inferred_item_types,
+            verbose=verbose,
+        )
+
     # List unknown item types
 
     try_again_to_find_item_type = False
 
-    app_ids_with_unreliable_goo_details = (
-        find_app_ids_with_unknown_item_type_for_their_representatives(
+    with track_stage("find appIDs with unknown item type", groups_by_app_id) as stage:
+        app_ids_with_unreliable_goo_details = find_app_ids_with_unknown_item_type_for_their_representatives(
             groups_by_app_id=groups_by_app_id,
             listing_candidates=filtered_representative_listing_hashes,
             all_listing_details=all_listing_details,
             listing_details_output_file_name=listing_details_output_file_name,
+            dictionary_of_representative_listing_hashes=dictionary_of_representative_listing_hashes,
             verbose=verbose,
         )
-    )
+
+        if inferred_item_types is not None:
+            app_ids_with_unreliable_goo_details = [
+                app_id
+                for app_id in app_ids_with_unreliable_goo_details
+                if app_id not in inferred_item_types
+            ]
+
+        set_num_items_out(stage, app_ids_with_unreliable_goo_details)
 
     if try_again_to_find_item_type:
         try_again_to_download_item_type(
@@ -205,17 +296,19 @@ def apply_workflow_for_foil_cards(
 
     # Find market arbitrages
 
-    arbitrages = determine_whether_an_arbitrage_might_exist_for_foil_cards(
-        eligible_listing_hashes,
-        all_goo_details=all_goo_details,
-        app_ids_with_unreliable_goo_details=app_ids_with_unreliable_goo_details,
-        app_ids_with_unknown_goo_value=app_ids_with_unknown_goo_value,
-        all_listings=all_listings,
-        listing_output_file_name=listing_output_file_name,
-        sack_of_gems_price_in_euros=sack_of_gems_price_in_euros,
-        retrieve_gem_price_from_scratch=retrieve_gem_price_from_scratch,
-        verbose=verbose,
-    )
+    with track_stage("find arbitrages", eligible_listing_hashes) as stage:
+        arbitrages = determine_whether_an_arbitrage_might_exist_for_foil_cards(
+            eligible_listing_hashes,
+            all_goo_details=all_goo_details,
+            app_ids_with_unreliable_goo_details=app_ids_with_unreliable_goo_details,
+            app_ids_with_unknown_goo_value=app_ids_with_unknown_goo_value,
+            all_listings=all_listings,
+            listing_output_file_name=listing_output_file_name,
+            sack_of_gems_price_in_euros=sack_of_gems_price_in_euros,
+            retrieve_gem_price_from_scratch=retrieve_gem_price_from_scratch,
+            verbose=verbose,
+        )
+        set_num_items_out(stage, arbitrages)
 
     print_arbitrages_for_foil_cards(
         arbitrages,
@@ -231,6 +324,8 @@ def main() -> bool:
     retrieve_gem_price_from_scratch = True
     enforced_sack_of_gems_price = None  # price in euros
     start_index = 0  # to resume the update in case of wrong status code
+    use_goo_value_predictor = True
+    use_item_type_inference = True
     verbose = True
 
     apply_workflow_for_foil_cards(
@@ -239,6 +334,8 @@ def main() -> bool:
         retrieve_gem_price_from_scratch=retrieve_gem_price_from_scratch,
         enforced_sack_of_gems_price=enforced_sack_of_gems_price,
         start_index=start_index,
+        use_goo_value_predictor=use_goo_value_predictor,
+        use_item_type_inference=use_item_type_inference,
         verbose=verbose,
     )
 
@@ -246,4 +343,5 @@ def main() -> bool:
 
 
 if __name__ == "__main__":
-    main()
+    with profiling_hook("market_arbitrage_with_foil_cards"):
+        main()
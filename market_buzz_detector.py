@@ -2,6 +2,7 @@
 
 from typing import Final
 
+from src.data_context import shared_data_context
 from src.market_arbitrage_utils import (
     filter_out_badges_with_low_sell_price,
     find_badge_arbitrages,
@@ -18,12 +19,16 @@ from src.market_listing import get_item_nameid_batch
 from src.market_order import load_market_order_data
 from src.market_search import load_all_listings, update_all_listings
 from src.market_utils import filter_out_dubious_listing_hashes
+from src.profiling_utils import profiling_hook
+from src.telemetry_utils import set_num_items_out, track_stage, track_workflow
 
 DEFAULT_MIN_SELL_PRICE: Final[int] = 30
 DEFAULT_MIN_NUM_LISTINGS: Final[int] = 3
 DEFAULT_NUM_PACKS_TO_DISPLAY: Final[int] = 10
 
 
+@track_workflow("market_buzz_detector")
+@shared_data_context()
 def main(
     *,
     retrieve_listings_from_scratch: bool = False,
@@ -40,62 +45,74 @@ def main(
     # Load list of all listing hashes
 
     if retrieve_listings_from_scratch:
-        update_all_listings()
+        with track_stage("download listings"):
+            update_all_listings()
 
-    all_listings = load_all_listings()
+    with track_stage("load listings") as stage:
+        all_listings = load_all_listings()
+        set_num_items_out(stage, all_listings)
 
-    all_listings = filter_out_dubious_listing_hashes(all_listings)
+    with track_stage("filter out dubious listing hashes", all_listings) as stage:
+        all_listings = filter_out_dubious_listing_hashes(all_listings)
+        set_num_items_out(stage, all_listings)
 
     # Import information from SteamCardExchange
 
-    aggregated_badge_data = fill_in_badge_data_with_data_from_steam_card_exchange(
-        all_listings,
-        force_update_from_steam_card_exchange=force_update_from_steam_card_exchange,
-        enforced_sack_of_gems_price=enforced_sack_of_gems_price,
-        minimum_allowed_sack_of_gems_price=minimum_allowed_sack_of_gems_price,
-    )
-
-    # *Heuristic* filtering of listing hashes
-
-    if use_a_constant_price_threshold:
-        filtered_listing_hashes = filter_listings(
+    with track_stage("fill in data from SteamCardExchange", all_listings):
+        aggregated_badge_data = fill_in_badge_data_with_data_from_steam_card_exchange(
             all_listings,
-            min_sell_price=min_sell_price,
-            min_num_listings=min_num_listings,
-        )
-
-        filtered_listings = {
-            k: v for k, v in all_listings.items() if k in filtered_listing_hashes
-        }
-
-        filtered_badge_data = fill_in_badge_data_with_data_from_steam_card_exchange(
-            filtered_listings,
             force_update_from_steam_card_exchange=force_update_from_steam_card_exchange,
             enforced_sack_of_gems_price=enforced_sack_of_gems_price,
             minimum_allowed_sack_of_gems_price=minimum_allowed_sack_of_gems_price,
         )
 
-    else:
-        filtered_badge_data = filter_out_badges_with_low_sell_price(
-            aggregated_badge_data,
-        )
+    # *Heuristic* filtering of listing hashes
+
+    with track_stage("filter listings", aggregated_badge_data) as stage:
+        if use_a_constant_price_threshold:
+            filtered_listing_hashes = filter_listings(
+                all_listings,
+                min_sell_price=min_sell_price,
+                min_num_listings=min_num_listings,
+            )
+
+            filtered_listings = {
+                k: v for k, v in all_listings.items() if k in filtered_listing_hashes
+            }
 
-        filtered_listing_hashes = [
-            badge["listing_hash"] for badge in filtered_badge_data.values()
-        ]
+            filtered_badge_data = fill_in_badge_data_with_data_from_steam_card_exchange(
+                filtered_listings,
+                force_update_from_steam_card_exchange=force_update_from_steam_card_exchange,
+                enforced_sack_of_gems_price=enforced_sack_of_gems_price,
+                minimum_allowed_sack_of_gems_price=minimum_allowed_sack_of_gems_price,
+            )
+
+        else:
+            filtered_badge_data = filter_out_badges_with_low_sell_price(
+                aggregated_badge_data,
+            )
+
+            filtered_listing_hashes = [
+                badge["listing_hash"] for badge in filtered_badge_data.values()
+            ]
+
+        set_num_items_out(stage, filtered_badge_data)
 
     # Pre-retrieval of item name ids
 
-    get_item_nameid_batch(filtered_listing_hashes)
+    with track_stage("get item name ids", filtered_listing_hashes):
+        get_item_nameid_batch(filtered_listing_hashes)
 
     # Download market orders
 
-    market_order_dict = load_market_order_data(
-        filtered_badge_data,
-        trim_output=True,
-        retrieve_market_orders_online=retrieve_market_orders_online,
-        verbose=verbose,
-    )
+    with track_stage("load market order data", filtered_badge_data) as stage:
+        market_order_dict = load_market_order_data(
+            filtered_badge_data,
+            trim_output=True,
+            retrieve_market_orders_online=retrieve_market_orders_online,
+            verbose=verbose,
+        )
+        set_num_items_out(stage, market_order_dict)
 
     # Only keep marketable booster packs
 
@@ -120,11 +137,13 @@ def main(
 
     # Detect potential arbitrages
 
-    badge_arbitrages = find_badge_arbitrages(
-        filtered_badge_data,
-        market_order_dict,
-        verbose=verbose,
-    )
+    with track_stage("find badge arbitrages", filtered_badge_data) as stage:
+        badge_arbitrages = find_badge_arbitrages(
+            filtered_badge_data,
+            market_order_dict,
+            verbose=verbose,
+        )
+        set_num_items_out(stage, badge_arbitrages)
 
     print("\n# Results for detected *potential* arbitrages\n")
     print_arbitrages(
@@ -135,15 +154,16 @@ def main(
 
 
 if __name__ == "__main__":
-    main(
-        retrieve_listings_from_scratch=True,
-        retrieve_market_orders_online=True,
-        force_update_from_steam_card_exchange=True,
-        enforced_sack_of_gems_price=None,
-        minimum_allowed_sack_of_gems_price=None,
-        use_a_constant_price_threshold=False,
-        min_sell_price=30,
-        min_num_listings=3,
-        num_packs_to_display=100,
-        verbose=True,
-    )
+    with profiling_hook("market_buzz_detector"):
+        main(
+            retrieve_listings_from_scratch=True,
+            retrieve_market_orders_online=True,
+            force_update_from_steam_card_exchange=True,
+            enforced_sack_of_gems_price=None,
+            minimum_allowed_sack_of_gems_price=None,
+            use_a_constant_price_threshold=False,
+            min_sell_price=30,
+            min_num_listings=3,
+            num_packs_to_display=100,
+            verbose=True,
+        )
@@ -11,6 +11,8 @@
 # Therefore, the cost of crafting a badge is identical for every game: that is twice the price of a sack of 1000 gems.
 # If you pay 0.31 € per sack of gems, which you then turn into booster packs, then your *badge* crafting cost is 0.62 €.
 
+from src.data_context import shared_data_context
+from src.job_scheduler import shared_job_scheduler
 from src.market_arbitrage_utils import find_badge_arbitrages, print_arbitrages
 from src.market_buzz_utils import (
     filter_out_unmarketable_packs,
@@ -22,11 +24,14 @@ from src.market_gamble_utils import (
     count_listing_hashes_per_app_id,
     enumerate_item_rarity_patterns,
     filter_out_candidates_whose_ask_price_is_below_threshold,
+    get_listing_indexes_with_other_rarity_tags,
     get_listings,
-    get_listings_with_other_rarity_tags,
     get_market_orders,
 )
 from src.market_listing import get_item_nameid_batch
+from src.profiling_utils import profiling_hook
+from src.rarity_pattern_catalog import get_item_rarity_patterns_per_app_id
+from src.telemetry_utils import set_num_items_out, track_stage, track_workflow
 from src.utils import (
     get_category_name_for_emoticons,
     get_category_name_for_profile_backgrounds,
@@ -39,11 +44,16 @@ from src.utils import (
 )
 
 
+@track_workflow("market_gamble_detector")
+@shared_data_context()
+@shared_job_scheduler()
 def main(
     *,
     look_for_profile_backgrounds: bool = True,  # if True, profile backgrounds, otherwise, emoticons.
     retrieve_listings_from_scratch: bool = False,
     retrieve_listings_with_another_rarity_tag_from_scratch: bool = False,
+    use_rarity_pattern_catalog: bool = True,
+    retrieve_missing_rarity_patterns: bool = True,
     retrieve_market_orders_online: bool = True,
     focus_on_listing_hashes_never_seen_before: bool = True,
     price_threshold_in_cents: float | None = None,
@@ -73,52 +83,84 @@ def main(
         market_order_output_file_name = get_market_order_file_name_for_emoticons()
 
     # Load list of all listing hashes with common rarity tag
-
-    all_listings = get_listings(
-        listing_output_file_name=listing_output_file_name,
-        retrieve_listings_from_scratch=retrieve_listings_from_scratch,
-    )
+    #
+    # NB: if listings are retrieved from scratch, the crawl of the other category keeps running in the background, while
+    # listing pages and market orders are downloaded for this category.
+
+    with track_stage("load listings") as stage:
+        listing_index = get_listings(
+            listing_output_file_name=listing_output_file_name,
+            retrieve_listings_from_scratch=retrieve_listings_from_scratch,
+            with_index=True,
+        )
+        all_listings = listing_index["listings"]
+        set_num_items_out(stage, all_listings)
 
     # Count the number of **different** items with common rarity tag for each appID
 
-    listing_hashes_per_app_id_for_common = count_listing_hashes_per_app_id(all_listings)
+    listing_hashes_per_app_id_for_common = count_listing_hashes_per_app_id(
+        listing_index,
+    )
 
-    # Load list of all listing hashes with other rarity tags (uncommon and rare)
+    if (
+        use_rarity_pattern_catalog
+        and not retrieve_listings_with_another_rarity_tag_from_scratch
+    ):
+        # Patterns C/UC/R are read from a catalog, which is only refreshed for new appIDs, so that listings with other
+        # rarity tags do not have to be crawled.
+
+        with track_stage(
+            "load rarity patterns",
+            listing_hashes_per_app_id_for_common,
+        ) as stage:
+            item_rarity_patterns_per_app_id = get_item_rarity_patterns_per_app_id(
+                listing_hashes_per_app_id_for_common,
+                look_for_profile_backgrounds=look_for_profile_backgrounds,
+                retrieve_missing_rarity_patterns=retrieve_missing_rarity_patterns,
+                verbose=verbose,
+            )
+            set_num_items_out(stage, item_rarity_patterns_per_app_id)
 
-    (
-        all_listings_for_uncommon,
-        all_listings_for_rare,
-    ) = get_listings_with_other_rarity_tags(
-        look_for_profile_backgrounds=look_for_profile_backgrounds,
-        retrieve_listings_with_another_rarity_tag_from_scratch=retrieve_listings_with_another_rarity_tag_from_scratch,
-    )
+    else:
+        # Load list of all listing hashes with other rarity tags (uncommon and rare)
 
-    # Count the number of **different** items with other rarity tags (uncommon and rare)  for each appID
+        with track_stage("load listings with other rarity tags"):
+            (
+                listing_index_for_uncommon,
+                listing_index_for_rare,
+            ) = get_listing_indexes_with_other_rarity_tags(
+                look_for_profile_backgrounds=look_for_profile_backgrounds,
+                retrieve_listings_with_another_rarity_tag_from_scratch=retrieve_listings_with_another_rarity_tag_from_scratch,
+            )
 
-    listing_hashes_per_app_id_for_uncommon = count_listing_hashes_per_app_id(
-        all_listings_for_uncommon,
-    )
-    listing_hashes_per_app_id_for_rare = count_listing_hashes_per_app_id(
-        all_listings_for_rare,
-    )
+        # Count the number of **different** items with other rarity tags (uncommon and rare)  for each appID
 
-    # Enumerate patterns C/UC/R for each appID
+        listing_hashes_per_app_id_for_uncommon = count_listing_hashes_per_app_id(
+            listing_index_for_uncommon,
+        )
+        listing_hashes_per_app_id_for_rare = count_listing_hashes_per_app_id(
+            listing_index_for_rare,
+        )
 
-    item_rarity_patterns_per_app_id = enumerate_item_rarity_patterns(
-        listing_hashes_per_app_id_for_common,
-        listing_hashes_per_app_id_for_uncommon,
-        listing_hashes_per_app_id_for_rare,
-    )
+        # Enumerate patterns C/UC/R for each appID
+
+        item_rarity_patterns_per_app_id = enumerate_item_rarity_patterns(
+            listing_hashes_per_app_id_for_common,
+            listing_hashes_per_app_id_for_uncommon,
+            listing_hashes_per_app_id_for_rare,
+        )
 
     # *Heuristic* filtering of listing hashes
 
-    filtered_badge_data = filter_out_candidates_whose_ask_price_is_below_threshold(
-        all_listings,
-        item_rarity_patterns_per_app_id=item_rarity_patterns_per_app_id,
-        price_threshold_in_cents=price_threshold_in_cents,
-        drop_rate_estimates_for_common_rarity=drop_rate_estimates_for_common_rarity,
-        category_name=category_name,
-    )
+    with track_stage("filter out candidates with low ask", all_listings) as stage:
+        filtered_badge_data = filter_out_candidates_whose_ask_price_is_below_threshold(
+            all_listings,
+            item_rarity_patterns_per_app_id=item_rarity_patterns_per_app_id,
+            price_threshold_in_cents=price_threshold_in_cents,
+            drop_rate_estimates_for_common_rarity=drop_rate_estimates_for_common_rarity,
+            category_name=category_name,
+        )
+        set_num_items_out(stage, filtered_badge_data)
 
     # Pre-retrieval of item name ids
 
@@ -126,23 +168,26 @@ def main(
         badge["listing_hash"] for badge in filtered_badge_data.values()
     ]
 
-    get_item_nameid_batch(
-        selected_listing_hashes,
-        listing_details_output_file_name=listing_details_output_file_name,
-    )
+    with track_stage("get item name ids", selected_listing_hashes):
+        get_item_nameid_batch(
+            selected_listing_hashes,
+            listing_details_output_file_name=listing_details_output_file_name,
+        )
 
     # Download market orders
 
-    market_order_dict = get_market_orders(
-        filtered_badge_data,
-        retrieve_market_orders_online=retrieve_market_orders_online,
-        focus_on_listing_hashes_never_seen_before=focus_on_listing_hashes_never_seen_before,
-        listing_details_output_file_name=listing_details_output_file_name,
-        market_order_output_file_name=market_order_output_file_name,
-        enforce_cooldown=enforce_cooldown,
-        allow_to_skip_dummy_data=allow_to_skip_dummy_data,
-        verbose=verbose,
-    )
+    with track_stage("load market order data", filtered_badge_data) as stage:
+        market_order_dict = get_market_orders(
+            filtered_badge_data,
+            retrieve_market_orders_online=retrieve_market_orders_online,
+            focus_on_listing_hashes_never_seen_before=focus_on_listing_hashes_never_seen_before,
+            listing_details_output_file_name=listing_details_output_file_name,
+            market_order_output_file_name=market_order_output_file_name,
+            enforce_cooldown=enforce_cooldown,
+            allow_to_skip_dummy_data=allow_to_skip_dummy_data,
+            verbose=verbose,
+        )
+        set_num_items_out(stage, market_order_dict)
 
     # Only keep marketable booster packs
 
@@ -169,11 +214,13 @@ def main(
 
     # Detect potential arbitrages
 
-    badge_arbitrages = find_badge_arbitrages(
-        filtered_badge_data,
-        market_order_dict,
-        verbose=verbose,
-    )
+    with track_stage("find badge arbitrages", filtered_badge_data) as stage:
+        badge_arbitrages = find_badge_arbitrages(
+            filtered_badge_data,
+            market_order_dict,
+            verbose=verbose,
+        )
+        set_num_items_out(stage, badge_arbitrages)
 
     print("\n# Results for detected *potential* arbitrages\n")
     print_arbitrages(
@@ -186,16 +233,19 @@ def main(
 
 
 if __name__ == "__main__":
-    main(
-        look_for_profile_backgrounds=True,  # if True, profile backgrounds, otherwise, emoticons.
-        retrieve_listings_from_scratch=False,
-        retrieve_listings_with_another_rarity_tag_from_scratch=False,
-        retrieve_market_orders_online=True,
-        focus_on_listing_hashes_never_seen_before=True,
-        price_threshold_in_cents=None,
-        drop_rate_estimates_for_common_rarity=None,
-        num_packs_to_display=100,
-        enforce_cooldown=True,
-        allow_to_skip_dummy_data=False,
-        verbose=True,
-    )
+    with profiling_hook("market_gamble_detector"):
+        main(
+            look_for_profile_backgrounds=True,  # if True, profile backgrounds, otherwise, emoticons.
+            retrieve_listings_from_scratch=False,
+            retrieve_listings_with_another_rarity_tag_from_scratch=False,
+            use_rarity_pattern_catalog=True,
+            retrieve_missing_rarity_patterns=True,
+            retrieve_market_orders_online=True,
+            focus_on_listing_hashes_never_seen_before=True,
+            price_threshold_in_cents=None,
+            drop_rate_estimates_for_common_rarity=None,
+            num_packs_to_display=100,
+            enforce_cooldown=True,
+            allow_to_skip_dummy_data=False,
+            verbose=True,
+        )
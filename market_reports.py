@@ -0,0 +1,98 @@
+# Objective: run any combination of reports in a single process, e.g. for a nightly job.
+#
+# The reports share a data context, so that each data file is loaded, and each remote price is fetched, at most once
+# per run, instead of once per report.
+
+from typing import Final
+
+from market_arbitrage import apply_workflow
+from market_buzz_detector import main as detect_buzz
+from market_gamble_detector import main as detect_gambles
+from src.data_context import shared_data_context
+from src.gamble_expected_value import print_ranked_gambles, rank_gambles
+from src.profiling_utils import profiling_hook
+from src.sack_of_gems import get_gem_price
+from src.telemetry_utils import track_workflow
+
+REPORT_NAMES: Final[list[str]] = [
+    "arbitrage",
+    "buzz",
+    "gamble_profile_backgrounds",
+    "gamble_emoticons",
+    "gamble_expected_value",
+]
+
+
+@track_workflow("market_reports")
+@shared_data_context()
+def run_reports(
+    report_names: list[str] | None = None,
+    *,
+    retrieve_listings_from_scratch: bool = False,
+    retrieve_market_orders_online: bool = False,
+    enforced_sack_of_gems_price: float | None = None,
+    minimum_allowed_sack_of_gems_price: float | None = None,
+    num_packs_to_display: int = 10,
+    verbose: bool = False,
+) -> bool:
+    if report_names is None:
+        report_names = REPORT_NAMES
+
+    for report_name in report_names:
+        print(f"\n# Report: {report_name}\n")
+
+        if report_name == "arbitrage":
+            apply_workflow(
+                retrieve_listings_from_scratch=retrieve_listings_from_scratch,
+                retrieve_market_orders_online=retrieve_market_orders_online,
+                enforced_sack_of_gems_price=enforced_sack_of_gems_price,
+                minimum_allowed_sack_of_gems_price=minimum_allowed_sack_of_gems_price,
+                automatically_create_then_sell_booster_packs=False,
+                verbose=verbose,
+            )
+        elif report_name == "buzz":
+            detect_buzz(
+                retrieve_listings_from_scratch=retrieve_listings_from_scratch,
+                retrieve_market_orders_online=retrieve_market_orders_online,
+                enforced_sack_of_gems_price=enforced_sack_of_gems_price,
+                minimum_allowed_sack_of_gems_price=minimum_allowed_sack_of_gems_price,
+                num_packs_to_display=num_packs_to_display,
+                verbose=verbose,
+            )
+        elif report_name in {"gamble_profile_backgrounds", "gamble_emoticons"}:
+            detect_gambles(
+                look_for_profile_backgrounds=bool(
+                    report_name == "gamble_profile_backgrounds",
+                ),
+                retrieve_listings_from_scratch=retrieve_listings_from_scratch,
+                retrieve_market_orders_online=retrieve_market_orders_online,
+                num_packs_to_display=num_packs_to_display,
+                verbose=verbose,
+            )
+        elif report_name == "gamble_expected_value":
+            ranking = rank_gambles(
+                gem_price_in_euros=get_gem_price(
+                    enforced_sack_of_gems_price=enforced_sack_of_gems_price,
+                    minimum_allowed_sack_of_gems_price=minimum_allowed_sack_of_gems_price,
+                ),
+            )
+            print_ranked_gambles(ranking, num_gambles_to_display=num_packs_to_display)
+        else:
+            print(f"Unknown report: {report_name}. Valid reports: {REPORT_NAMES}.")
+
+    return True
+
+
+def main() -> bool:
+    return run_reports(
+        REPORT_NAMES,
+        retrieve_listings_from_scratch=True,
+        retrieve_market_orders_online=True,
+        num_packs_to_display=100,
+        verbose=True,
+    )
+
+
+if __name__ == "__main__":
+    with profiling_hook("market_reports"):
+        main()
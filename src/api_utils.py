@@ -15,12 +15,18 @@ def get_rate_limits(
             "market_order": {"queries": 50, "minutes": 1},
             "market_search": {"queries": 50, "minutes": 1},
             "market_listing": {"queries": 25, "minutes": 3},
+            "goo_value": {"queries": 50, "minutes": 1},
+            "inventory": {"queries": 10, "minutes": 1},
+            "market_sell": {"queries": 20, "minutes": 1},
         }
     else:
         base_limits = {
             "market_order": {"queries": 25, "minutes": 5},
             "market_search": {"queries": 25, "minutes": 5},
             "market_listing": {"queries": 25, "minutes": 5},
+            "goo_value": {"queries": 25, "minutes": 5},
+            "inventory": {"queries": 5, "minutes": 1},
+            "market_sell": {"queries": 20, "minutes": 1},
         }
 
     limits = base_limits[api_type]
@@ -1,5 +1,3 @@
-import requests
-
 from src.personal_info import update_and_save_cookie_to_disk_if_values_changed
 from src.utils import TIMEOUT_IN_SECONDS
 
@@ -19,6 +17,8 @@ def filter_cookie_fields(
 
 
 def force_update_sessionid(cookie: dict[str, str]) -> dict[str, str]:
+    import requests  # noqa: PLC0415
+
     filtered_cookie = filter_cookie_fields(cookie, MINIMAL_COOKIE_FIELDS)
     r = requests.get(
         url=STEAM_COMMUNITY_URL,
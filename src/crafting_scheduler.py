@@ -0,0 +1,199 @@
+# Objective: craft booster packs as soon as they become craftable, with a timer heap of next creation times.
+#
+# The scheduler sleeps until the earliest next creation time, then checks the profitability of this appID only, with
+# prices refreshed just before the decision: a single download of market orders, and the price of a sack of gems, which
+# is cached for GEM_PRICE_CACHE_DURATION_IN_MINUTES. The appID is then rescheduled after the crafting cooldown, whether
+# a booster pack was created then sold, or the arbitrage did not hold anymore, so that there is no polling.
+#
+# Caveat: the scheduler must not run within a shared data context, which would memoize the price of a sack of gems for
+#         the whole run.
+
+import heapq
+import time
+from collections.abc import Callable
+
+from src.creation_time_utils import (
+    get_crafting_cooldown_duration_in_seconds,
+    get_current_time,
+    get_next_creation_datetime,
+    load_next_creation_time_data,
+)
+from src.inventory_utils import create_then_sell_booster_packs_for_batch
+from src.market_arbitrage_utils import (
+    convert_arbitrages_for_batch_create_then_sell,
+    filter_out_badges_with_low_sell_price,
+    find_badge_arbitrages,
+)
+from src.market_order import (
+    download_market_order_data_batch,
+    load_market_order_data_from_disk,
+)
+from src.market_utils import load_aggregated_badge_data
+from src.sack_of_gems import get_gem_price
+
+type CraftingSchedule = list[tuple[float, str]]
+
+
+def build_crafting_schedule(
+    app_ids: list[str],
+    next_creation_times: dict[str, str] | None = None,
+) -> CraftingSchedule:
+    # Heap of (timestamp of the next creation time, appID)
+    if next_creation_times is None:
+        next_creation_times = load_next_creation_time_data()
+
+    current_time = get_current_time()
+
+    schedule = [
+        (
+            get_next_creation_datetime(
+                next_creation_times.get(app_id),
+                current_time,
+            ).timestamp(),
+            app_id,
+        )
+        for app_id in app_ids
+    ]
+    heapq.heapify(schedule)
+
+    return schedule
+
+
+def check_arbitrage_for_app_id(
+    app_id: str,
+    badge_data: dict[str, dict],
+    profit_threshold: float = 0.01,  # profit in euros
+    *,
+    verbose: bool = True,
+) -> dict[str, int]:
+    # Download the market orders of this appID only, and return the price dictionary to create then sell its pack.
+    individual_badge_data = badge_data[app_id]
+
+    # NB: the cost is refreshed with the latest price of a sack of gems, instead of the price known when badge data was
+    # aggregated, which may be hours old.
+    single_badge_data = {
+        app_id: individual_badge_data
+        | {
+            "gem_price": individual_badge_data["gem_amount"]
+            * get_gem_price(retrieve_gem_price_from_scratch=True, verbose=verbose),
+        },
+    }
+
+    # NB: market orders of other appIDs are loaded from disk, so that they are not erased when saved to disk.
+    market_order_dict = download_market_order_data_batch(
+        single_badge_data,
+        market_order_dict=load_market_order_data_from_disk(),
+        enforce_cooldown=False,
+        verbose=verbose,
+    )
+
+    # The sell price is refreshed too, with the ask which was just downloaded.
+    listing_hash = individual_badge_data["listing_hash"]
+    ask = market_order_dict.get(listing_hash, {}).get("ask", -1)
+    if ask > 0:
+        single_badge_data[app_id]["sell_price"] = ask
+
+    badge_arbitrages = find_badge_arbitrages(
+        single_badge_data,
+        market_order_dict,
+        verbose=verbose,
+    )
+
+    return convert_arbitrages_for_batch_create_then_sell(
+        badge_arbitrages,
+        profit_threshold=profit_threshold,
+        verbose=verbose,
+    )
+
+
+def run_crafting_scheduler(
+    app_ids: list[str],
+    badge_data: dict[str, dict],
+    profit_threshold: float = 0.01,  # profit in euros
+    max_num_checks: int | None = None,
+    sleep_fn: Callable[[float], None] = time.sleep,
+    *,
+    is_a_simulation: bool = True,
+    # Caveat: if False, then packs will be crafted, which costs money!
+    verbose: bool = True,
+) -> dict[str, dict | None]:
+    # NB: the scheduler runs forever, unless a maximal number of profitability checks is specified.
+    schedule = build_crafting_schedule(
+        [app_id for app_id in app_ids if app_id in badge_data],
+    )
+
+    creation_results: dict[str, dict | None] = {}
+    num_checks = 0
+
+    while schedule and (max_num_checks is None or num_checks < max_num_checks):
+        next_creation_timestamp, app_id = heapq.heappop(schedule)
+
+        waiting_time = next_creation_timestamp - get_current_time().timestamp()
+        if waiting_time > 0:
+            if verbose:
+                print(
+                    f"Sleeping {waiting_time:.0f} seconds until a booster pack can be crafted for appID = {app_id}.",
+                )
+            sleep_fn(waiting_time)
+
+        price_dict_for_listing_hashes = check_arbitrage_for_app_id(
+            app_id,
+            badge_data,
+            profit_threshold=profit_threshold,
+            verbose=verbose,
+        )
+        num_checks += 1
+
+        is_crafted = False
+
+        if price_dict_for_listing_hashes and not is_a_simulation:
+            new_creation_results, _sale_results = (
+                create_then_sell_booster_packs_for_batch(
+                    price_dict_for_listing_hashes,
+                )
+            )
+            creation_results.update(new_creation_results)
+            is_crafted = any(
+                creation_result is not None
+                for creation_result in new_creation_results.values()
+            )
+
+        if not is_crafted and verbose:
+            print(f"No booster pack crafted for appID = {app_id}.")
+
+        heapq.heappush(
+            schedule,
+            (
+                get_current_time().timestamp()
+                + get_crafting_cooldown_duration_in_seconds(),
+                app_id,
+            ),
+        )
+
+    return creation_results
+
+
+def main(
+    max_num_checks: int | None = None,
+    *,
+    is_a_simulation: bool = True,
+) -> bool:
+    # NB: badges recently crafted are kept, contrary to get_filtered_badge_data(), because they are scheduled for later.
+    aggregated_badge_data = load_aggregated_badge_data(
+        retrieve_listings_from_scratch=False,
+        from_javascript=True,
+    )
+    filtered_badge_data = filter_out_badges_with_low_sell_price(aggregated_badge_data)
+
+    run_crafting_scheduler(
+        list(filtered_badge_data),
+        filtered_badge_data,
+        max_num_checks=max_num_checks,
+        is_a_simulation=is_a_simulation,
+    )
+
+    return True
+
+
+if __name__ == "__main__":
+    main(is_a_simulation=False)
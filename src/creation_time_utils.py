@@ -150,6 +150,45 @@ def get_crafting_cooldown_duration_in_seconds() -> int:
     return 24 * 3600 * get_crafting_cooldown_duration_in_days()
 
 
+def get_next_creation_datetime(
+    next_creation_time: str | None,
+    current_time: datetime.datetime | None = None,
+) -> datetime.datetime:
+    # Return the time at which a booster pack can be crafted, or the current time if it can already be crafted.
+    if current_time is None:
+        current_time = get_current_time()
+
+    if next_creation_time is None:
+        return current_time
+
+    parsed_next_creation_time = get_time_struct_from_str(next_creation_time)
+
+    # Manually set the year, because it was not stored at creation time, following Valve's time format.
+    if (
+        current_time.month == 12
+        and current_time.day == 31
+        and parsed_next_creation_time.month == parsed_next_creation_time.day == 1
+    ):
+        year_to_be_manually_set = current_time.year + 1
+    else:
+        year_to_be_manually_set = current_time.year
+
+    parsed_next_creation_time = parsed_next_creation_time.replace(
+        year=year_to_be_manually_set,
+    )
+
+    delta_in_seconds = (parsed_next_creation_time - current_time).total_seconds()
+
+    # NB: if the next creation time is further away than the cooldown, then the cooldown actually ended last year.
+    if (
+        delta_in_seconds < 0
+        or get_crafting_cooldown_duration_in_seconds() < delta_in_seconds
+    ):
+        return current_time
+
+    return parsed_next_creation_time
+
+
 def determine_whether_a_booster_pack_can_be_crafted(
     badge_data: dict,
     current_time: datetime.datetime | None = None,
@@ -157,45 +196,10 @@ def determine_whether_a_booster_pack_can_be_crafted(
     if current_time is None:
         current_time = get_current_time()
 
-    next_creation_time = badge_data["next_creation_time"]
-
-    if next_creation_time is None:
-        a_booster_pack_can_be_crafted = True
-    else:
-        parsed_next_creation_time = get_time_struct_from_str(next_creation_time)
-
-        if (
-            current_time.month == 12
-            and current_time.day == 31
-            and parsed_next_creation_time.month == parsed_next_creation_time.day == 1
-        ):
-            # Today is the Dec 31, and the next creation time is the day after, on January 1.
-            year_to_be_manually_set = current_time.year + 1
-        else:
-            year_to_be_manually_set = current_time.year
-
-        # Manually set the year, because it was not stored at creation time, following Valve's time format.
-        parsed_next_creation_time = parsed_next_creation_time.replace(
-            year=year_to_be_manually_set,
-        )
-
-        delta = parsed_next_creation_time - current_time
-        delta_in_seconds = delta.total_seconds()
-
-        # parsed_next_creation_time < current_time
-        cooldown_has_ended = bool(delta_in_seconds < 0)
-
-        # current_time + cooldown < parsed_next_creation_time
-        # NB: this is necessary because we do not keep track of the year.
-        cooldown_actually_ended_last_year = bool(
-            get_crafting_cooldown_duration_in_seconds() < delta_in_seconds,
-        )
-
-        a_booster_pack_can_be_crafted = (
-            cooldown_has_ended or cooldown_actually_ended_last_year
-        )
-
-    return a_booster_pack_can_be_crafted
+    return (
+        get_next_creation_datetime(badge_data["next_creation_time"], current_time)
+        <= current_time
+    )
 
 
 def main() -> bool:
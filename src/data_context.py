@@ -0,0 +1,163 @@
+# Objective: share data between several reports run in the same process, so that each data file is loaded, and each
+# remote price is fetched, at most once per run.
+#
+# Usage:
+#   with shared_data_context():
+#       run_report_1()
+#       run_report_2()
+#
+# NB: outside of a shared data context, nothing is memoized, so that standalone scripts behave as before.
+#
+# Background threads which use the shared data context, e.g. to revalidate market orders, are started with
+# start_background_thread(), so that they are joined before the context is torn down.
+
+import copy
+import threading
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+
+_context: dict | None = None
+_context_depth = 0
+_background_threads: list[threading.Thread] = []
+
+
+def is_data_context_active() -> bool:
+    return _context is not None
+
+
+@contextmanager
+def shared_data_context() -> Iterator[dict]:
+    # The context is reentrant: nested contexts share the memo of the outermost one.
+    global _context, _context_depth  # noqa: PLW0603
+
+    if _context is None:
+        _context = {"files": {}, "derived": {}, "values": {}}
+    _context_depth += 1
+
+    try:
+        yield _context
+    finally:
+        if _context_depth == 1:
+            join_background_threads()
+
+        _context_depth -= 1
+        if _context_depth == 0:
+            _context = None
+
+
+def start_background_thread(target: Callable[[], None], name: str) -> threading.Thread:
+    # NB: the thread is not a daemon, so that the process waits for fresh data to be saved to disk before exiting.
+    thread = threading.Thread(target=target, name=name)
+    _background_threads.append(thread)
+    thread.start()
+
+    return thread
+
+
+def join_background_threads() -> None:
+    while _background_threads:
+        thread = _background_threads.pop()
+        if thread is not threading.current_thread():
+            thread.join()
+
+
+def copy_data[T](data: T) -> T:
+    # Reports freely add keys to the rows of the dictionaries which they load, e.g. all_listings[listing_hash], so
+    # both the outer dictionary and its rows are copied. This is much cheaper than a deep copy or a second parsing.
+    if isinstance(data, dict):
+        return {k: copy.copy(v) for k, v in data.items()}
+
+    return copy.copy(data)
+
+
+def get_file_modification_time(fname: str) -> int:
+    return Path(fname).stat().st_mtime_ns
+
+
+def load_file_with_memo[T](fname: str, load_fn: Callable[[str], T]) -> T:
+    # NB: the context is read once, in case it is torn down meanwhile by another thread.
+    context = _context
+    if context is None:
+        return load_fn(fname)
+
+    # NB: this raises FileNotFoundError if the file is missing, like load_fn() would.
+    modification_time = get_file_modification_time(fname)
+
+    key = str(Path(fname).resolve())
+    memo = context["files"].get(key)
+
+    if memo is None or memo["modification_time"] != modification_time:
+        memo = {"modification_time": modification_time, "data": load_fn(fname)}
+        context["files"][key] = memo
+
+    return copy_data(memo["data"])
+
+
+def update_file_memo(fname: str, data: object) -> None:
+    # Called after saving a file to disk, so that the next load does not parse the file again.
+    context = _context
+    if context is None:
+        return
+
+    key = str(Path(fname).resolve())
+    context["files"][key] = {
+        "modification_time": get_file_modification_time(fname),
+        "data": copy_data(data),
+    }
+
+
+def load_derived_data_with_memo[T](fname: str, derive_fn: Callable[[], T]) -> T:
+    # Memoize data derived from a file, e.g. an index, for the version of the file on disk.
+    context = _context
+    if context is None:
+        return derive_fn()
+
+    # NB: this raises FileNotFoundError if the file is missing, like derive_fn() would.
+    modification_time = get_file_modification_time(fname)
+
+    key = str(Path(fname).resolve())
+    memo = context["derived"].get(key)
+
+    if memo is None or memo["modification_time"] != modification_time:
+        memo = {"modification_time": modification_time, "data": derive_fn()}
+        context["derived"][key] = memo
+
+    return copy_data(memo["data"])
+
+
+def update_derived_data_memo[T](
+    fname: str,
+    update_fn: Callable[[T], None],
+    previous_modification_time: int | None,
+) -> None:
+    # Called after saving a file to disk, so that data derived from the previous version of the file is updated in place,
+    # instead of being derived again from scratch. Data derived from another version is dropped.
+    context = _context
+    if context is None:
+        return
+
+    key = str(Path(fname).resolve())
+    memo = context["derived"].get(key)
+
+    if memo is None:
+        return
+
+    if memo["modification_time"] != previous_modification_time:
+        del context["derived"][key]
+        return
+
+    update_fn(memo["data"])
+    memo["modification_time"] = get_file_modification_time(fname)
+
+
+def get_value_with_memo[T](key: str, compute_fn: Callable[[], T]) -> T:
+    # Memoize the result of a remote query, e.g. the price of a sack of gems.
+    context = _context
+    if context is None:
+        return compute_fn()
+
+    if key not in context["values"]:
+        context["values"][key] = compute_fn()
+
+    return copy_data(context["values"][key])
@@ -2,8 +2,8 @@
 
 import time
 
-import requests
-
+from src.data_context import get_value_with_memo
+from src.http_cache import cached_get
 from src.json_utils import load_json, save_json
 from src.utils import TIMEOUT_IN_SECONDS, get_steam_card_exchange_file_name
 
@@ -46,12 +46,32 @@ def download_data_from_steam_card_exchange(
     if steam_card_exchange_file_name is None:
         steam_card_exchange_file_name = get_steam_card_exchange_file_name()
 
+    # NB: within a shared data context, data is only downloaded once per run.
+    return get_value_with_memo(
+        "steam_card_exchange",
+        lambda: download_data_from_steam_card_exchange_from_scratch(
+            steam_card_exchange_file_name,
+            save_to_disk=save_to_disk,
+        ),
+    )
+
+
+def download_data_from_steam_card_exchange_from_scratch(
+    steam_card_exchange_file_name: str,
+    *,
+    save_to_disk: bool = True,
+) -> dict | None:
     print("Downloading data from scratch.")
 
     url = get_steamcardexchange_api_end_point_url()
     req_data = get_steamcardexchange_api_params()
 
-    resp_data = requests.get(url=url, params=req_data, timeout=TIMEOUT_IN_SECONDS)
+    resp_data = cached_get(
+        url,
+        params=req_data,
+        cache_policy="steam_card_exchange",
+        timeout=TIMEOUT_IN_SECONDS,
+    )
 
     if resp_data.ok:
         response = resp_data.json()
@@ -0,0 +1,95 @@
+# Objective: check that the resolution of representatives and item types in the foil pipeline scales linearly with the
+# number of appIDs, based on synthetic data.
+#
+# As of 2024, there are about 14k appIDs with foil cards. The benchmark goes up to 10x this number.
+
+import time
+from typing import Final
+
+from src.listing_index import build_listing_index
+from src.market_foil_utils import (
+    build_dictionary_of_representative_listing_hashes,
+    find_app_ids_with_unknown_item_type_for_their_representatives,
+    find_representative_listing_hashes,
+    group_listing_hashes_by_app_id,
+)
+
+CURRENT_NUM_APP_IDS: Final[int] = 14_000
+NUM_CARDS_PER_APP_ID: Final[int] = 6
+NUM_REPETITIONS: Final[int] = 3
+
+
+def generate_synthetic_foil_data(
+    num_app_ids: int,
+    num_cards_per_app_id: int = NUM_CARDS_PER_APP_ID,
+) -> tuple[dict[str, dict], dict[str, dict]]:
+    all_listings = {}
+    all_listing_details = {}
+
+    for app_id in range(num_app_ids):
+        for card_no in range(num_cards_per_app_id):
+            listing_hash = f"{app_id}-Card {card_no} (Foil)"
+            all_listings[listing_hash] = {"sell_listings": 1, "sell_price": 3}
+
+            # Item types are known for the first card of two appIDs out of three.
+            if card_no == 0 and app_id % 3 != 0:
+                all_listing_details[listing_hash] = {"item_type_no": 2}
+
+    return all_listings, all_listing_details
+
+
+def time_item_type_resolution(
+    num_app_ids: int,
+    num_repetitions: int = NUM_REPETITIONS,
+) -> float:
+    all_listings, all_listing_details = generate_synthetic_foil_data(num_app_ids)
+
+    groups_by_app_id = group_listing_hashes_by_app_id(
+        build_listing_index(all_listings),
+        verbose=False,
+    )
+    dictionary_of_representative_listing_hashes = (
+        build_dictionary_of_representative_listing_hashes(all_listing_details)
+    )
+    listing_candidates = find_representative_listing_hashes(
+        groups_by_app_id,
+        dictionary_of_representative_listing_hashes,
+    )
+
+    durations = []
+
+    for _ in range(num_repetitions):
+        start_time = time.perf_counter()
+        find_app_ids_with_unknown_item_type_for_their_representatives(
+            groups_by_app_id,
+            listing_candidates,
+            all_listing_details=all_listing_details,
+            verbose=False,
+        )
+        durations.append(time.perf_counter() - start_time)
+
+    # The minimum is the least noisy estimate of the duration.
+    return min(durations)
+
+
+def compute_scaling_ratio(
+    num_app_ids: int,
+    scaling_factor: int = 10,
+) -> float:
+    # The ratio is about equal to the scaling factor for a linear algorithm, and to its square for a quadratic one.
+    duration = time_item_type_resolution(num_app_ids)
+    scaled_duration = time_item_type_resolution(num_app_ids * scaling_factor)
+
+    return scaled_duration / duration
+
+
+def main(num_app_ids: int = CURRENT_NUM_APP_IDS) -> bool:
+    for scaled_num_app_ids in [num_app_ids // 10, num_app_ids, num_app_ids * 10]:
+        duration = time_item_type_resolution(scaled_num_app_ids)
+        print(f"#app_ids = {scaled_num_app_ids:7} ; duration = {duration:.3f} s")
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
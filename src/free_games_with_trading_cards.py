@@ -3,9 +3,6 @@
 import collections.abc
 from pathlib import Path
 
-import requests
-import steamspypi
-
 from src.market_search import load_all_listings
 from src.personal_info import (
     get_cookie_dict,
@@ -19,6 +16,8 @@ def get_user_data_url() -> str:
 
 
 def download_user_data() -> dict | None:
+    import requests  # noqa: PLC0415
+
     cookie = get_cookie_dict()
 
     resp_data = requests.get(
@@ -50,6 +49,8 @@ def download_owned_apps(*, verbose: bool = True) -> list[str]:
 
 
 def download_free_apps(method: str = "price", *, verbose: bool = True) -> set[str]:
+    import steamspypi  # noqa: PLC0415
+
     if method == "price":
         data = steamspypi.load()
 
@@ -0,0 +1,358 @@
+# Objective: rank gambles on profile backgrounds and emoticons with the full distribution of badge-crafting outcomes.
+#
+# Each crafted badge drops one profile background and one emoticon of the same appID. For each category:
+# - an item of Common rarity drops with the probability estimated for the item rarity pattern C/UC/R of the appID,
+#   or with the drop-rate of the category if the pattern has never been observed,
+# - the rest is split between Uncommon and Rare rarities as in the drop-rates of the category,
+# - every item is equally likely within its rarity.
+# An item is worth its highest bid, without fee. Items without any known bid are worth nothing: asks are not used, as
+# they can be arbitrarily high for items which are rarely traded.
+#
+# The value of one badge is thus a discrete distribution, in cents, and the value of n badges is its n-fold
+# convolution, from which the expected profit, its variance, and the probability of profit are computed exactly.
+# Both categories are ranked in a single pass, and rankings are memoized per gem price in a shared data context.
+
+from typing import Final
+
+from src.data_context import get_value_with_memo
+from src.drop_rate_estimates import (
+    clamp_proportion,
+    get_drop_rate_estimates,
+    get_drop_rate_estimates_based_on_item_rarity_pattern,
+    get_drop_rate_field,
+    get_rarity_fields,
+)
+from src.market_order import load_market_order_data_from_disk
+from src.market_search import load_all_listings
+from src.sack_of_gems import get_gem_amount_required_to_craft_badge, get_gem_price
+from src.transaction_fee import compute_sell_price_without_fee
+from src.utils import (
+    convert_listing_hash_to_app_id,
+    get_category_name_for_emoticons,
+    get_category_name_for_profile_backgrounds,
+    get_listing_output_file_name_for_emoticons,
+    get_listing_output_file_name_for_profile_backgrounds,
+    get_market_order_file_name_for_emoticons,
+    get_market_order_file_name_for_profile_backgrounds,
+)
+
+# Value in cents -> probability
+type ValueDistribution = dict[int, float]
+
+DEFAULT_NUM_BADGES: Final[int] = 1
+# Outcomes less likely than this threshold are discarded, so that the support of n-fold convolutions stays small.
+MIN_PROBABILITY_OF_OUTCOME: Final[float] = 1e-9
+NUM_GAMBLES_TO_DISPLAY: Final[int] = 10
+
+
+def get_item_value_in_cents(
+    listing_hash: str,
+    market_order_dict: dict[str, dict],
+) -> int:
+    try:
+        bid_in_euros = market_order_dict[listing_hash]["bid"]
+    except KeyError:
+        bid_in_euros = -1
+
+    # NB: the bid is -1 if there is no buy order.
+    if bid_in_euros <= 0:
+        return 0
+
+    return round(100 * compute_sell_price_without_fee(bid_in_euros))
+
+
+def group_item_values_by_app_id(
+    all_listings_per_rarity: dict[str, dict[str, dict]],
+    market_order_dict: dict[str, dict],
+) -> dict[str, dict[str, list[int]]]:
+    # For each appID, and for each rarity, list the values in cents of the items.
+    item_values_per_app_id: dict[str, dict[str, list[int]]] = {}
+
+    for rarity, all_listings in all_listings_per_rarity.items():
+        for listing_hash in all_listings:
+            app_id = convert_listing_hash_to_app_id(listing_hash)
+            item_value = get_item_value_in_cents(listing_hash, market_order_dict)
+            item_values_per_app_id.setdefault(app_id, {}).setdefault(
+                rarity,
+                [],
+            ).append(item_value)
+
+    return item_values_per_app_id
+
+
+def compute_rarity_probabilities(
+    item_values_per_rarity: dict[str, list[int]],
+    drop_rates_for_category: dict[str, float],
+    drop_rate_estimates_for_common_rarity: dict[tuple[int, int, int], float],
+) -> dict[str, float]:
+    item_rarity_pattern_as_tuple = tuple(
+        len(item_values_per_rarity.get(rarity, [])) for rarity in get_rarity_fields()
+    )
+
+    try:
+        common_drop_rate = drop_rate_estimates_for_common_rarity[
+            item_rarity_pattern_as_tuple
+        ]
+    except KeyError:
+        # Instead of assuming a drop-rate of 100% for item rarity patterns which have never been observed.
+        common_drop_rate = drop_rates_for_category["common"]
+
+    common_drop_rate = clamp_proportion(common_drop_rate)
+
+    num_other_drops = (
+        drop_rates_for_category["uncommon"] + drop_rates_for_category["rare"]
+    )
+
+    rarity_probabilities = {
+        "common": common_drop_rate,
+        "uncommon": (1 - common_drop_rate)
+        * drop_rates_for_category["uncommon"]
+        / num_other_drops,
+        "rare": (1 - common_drop_rate)
+        * drop_rates_for_category["rare"]
+        / num_other_drops,
+    }
+
+    # Rarities without any known item are ignored, and the probabilities of the other rarities are normalized.
+    rarity_probabilities = {
+        rarity: probability
+        for rarity, probability in rarity_probabilities.items()
+        if item_values_per_rarity.get(rarity)
+    }
+    normalization_factor = sum(rarity_probabilities.values())
+
+    return {
+        rarity: probability / normalization_factor
+        for rarity, probability in rarity_probabilities.items()
+    }
+
+
+def build_item_value_distribution(
+    item_values_per_rarity: dict[str, list[int]],
+    rarity_probabilities: dict[str, float],
+) -> ValueDistribution:
+    distribution: ValueDistribution = {}
+
+    for rarity, probability in rarity_probabilities.items():
+        item_values = item_values_per_rarity[rarity]
+
+        for item_value in item_values:
+            distribution[item_value] = distribution.get(item_value, 0.0) + (
+                probability / len(item_values)
+            )
+
+    return distribution
+
+
+def convolve_distributions(
+    distribution: ValueDistribution,
+    other_distribution: ValueDistribution,
+    min_probability: float = MIN_PROBABILITY_OF_OUTCOME,
+) -> ValueDistribution:
+    # Distribution of the sum of two independent values.
+    convolution: ValueDistribution = {}
+
+    for value, probability in distribution.items():
+        for other_value, other_probability in other_distribution.items():
+            summed_value = value + other_value
+            convolution[summed_value] = convolution.get(summed_value, 0.0) + (
+                probability * other_probability
+            )
+
+    return {
+        value: probability
+        for value, probability in convolution.items()
+        if probability >= min_probability
+    }
+
+
+def compute_distribution_after_n_badges(
+    badge_value_distribution: ValueDistribution,
+    num_badges: int,
+) -> ValueDistribution:
+    # Exponentiation by squaring, so that only O(log n) convolutions are computed.
+    distribution: ValueDistribution = {0: 1.0}
+    power_of_distribution = badge_value_distribution
+
+    while num_badges > 0:
+        if num_badges % 2 == 1:
+            distribution = convolve_distributions(distribution, power_of_distribution)
+        num_badges //= 2
+        if num_badges > 0:
+            power_of_distribution = convolve_distributions(
+                power_of_distribution,
+                power_of_distribution,
+            )
+
+    return distribution
+
+
+def compute_mean(distribution: ValueDistribution) -> float:
+    return sum(value * probability for value, probability in distribution.items())
+
+
+def compute_variance(distribution: ValueDistribution) -> float:
+    mean = compute_mean(distribution)
+
+    return sum(
+        (value - mean) ** 2 * probability for value, probability in distribution.items()
+    )
+
+
+def summarize_gamble(
+    badge_value_distribution: ValueDistribution,
+    badge_price_in_cents: float,
+    num_badges: int = DEFAULT_NUM_BADGES,
+) -> dict[str, float]:
+    distribution = compute_distribution_after_n_badges(
+        badge_value_distribution,
+        num_badges,
+    )
+    crafting_cost_in_cents = num_badges * badge_price_in_cents
+
+    return {
+        "expected_profit": compute_mean(distribution) - crafting_cost_in_cents,
+        "variance": compute_variance(distribution),
+        "probability_of_profit": sum(
+            probability
+            for value, probability in distribution.items()
+            if value > crafting_cost_in_cents
+        ),
+    }
+
+
+def load_item_values_per_category() -> dict[str, dict[str, dict[str, list[int]]]]:
+    file_names_per_category = {
+        get_category_name_for_profile_backgrounds(): (
+            get_listing_output_file_name_for_profile_backgrounds,
+            get_market_order_file_name_for_profile_backgrounds(),
+        ),
+        get_category_name_for_emoticons(): (
+            get_listing_output_file_name_for_emoticons,
+            get_market_order_file_name_for_emoticons(),
+        ),
+    }
+
+    item_values_per_category = {}
+
+    for category_name, (
+        get_listing_output_file_name,
+        market_order_output_file_name,
+    ) in file_names_per_category.items():
+        all_listings_per_rarity = {
+            rarity: load_all_listings(get_listing_output_file_name(rarity=rarity))
+            for rarity in get_rarity_fields()
+        }
+
+        market_order_dict = load_market_order_data_from_disk(
+            market_order_output_file_name=market_order_output_file_name,
+        )
+
+        item_values_per_category[category_name] = group_item_values_by_app_id(
+            all_listings_per_rarity,
+            market_order_dict,
+        )
+
+    return item_values_per_category
+
+
+def build_badge_value_distributions(
+    item_values_per_category: dict[str, dict[str, dict[str, list[int]]]],
+) -> dict[str, ValueDistribution]:
+    # The value of a badge is the sum of the values of the profile background and of the emoticon which it drops.
+    drop_rate_field = get_drop_rate_field()
+    drop_rate_estimates = get_drop_rate_estimates(verbose=False)
+    drop_rate_estimates_for_common_rarity = (
+        get_drop_rate_estimates_based_on_item_rarity_pattern(verbose=False)[
+            drop_rate_field
+        ]["common"]
+    )
+
+    badge_value_distributions: dict[str, ValueDistribution] = {}
+
+    for category_name, item_values_per_app_id in item_values_per_category.items():
+        drop_rates_for_category = drop_rate_estimates[category_name][drop_rate_field]
+
+        for app_id, item_values_per_rarity in item_values_per_app_id.items():
+            rarity_probabilities = compute_rarity_probabilities(
+                item_values_per_rarity,
+                drop_rates_for_category,
+                drop_rate_estimates_for_common_rarity,
+            )
+            item_value_distribution = build_item_value_distribution(
+                item_values_per_rarity,
+                rarity_probabilities,
+            )
+
+            badge_value_distributions[app_id] = convolve_distributions(
+                badge_value_distributions.get(app_id, {0: 1.0}),
+                item_value_distribution,
+            )
+
+    return badge_value_distributions
+
+
+def compute_badge_price_in_cents(gem_price_in_euros: float) -> float:
+    return 100 * get_gem_amount_required_to_craft_badge() * gem_price_in_euros
+
+
+def rank_gambles(
+    gem_price_in_euros: float | None = None,
+    num_badges: int = DEFAULT_NUM_BADGES,
+) -> list[dict]:
+    if gem_price_in_euros is None:
+        gem_price_in_euros = get_gem_price()
+
+    def compute_ranking() -> list[dict]:
+        badge_value_distributions = get_value_with_memo(
+            "badge value distributions",
+            lambda: build_badge_value_distributions(load_item_values_per_category()),
+        )
+        badge_price_in_cents = compute_badge_price_in_cents(gem_price_in_euros)
+
+        ranking = [
+            {"app_id": app_id}
+            | summarize_gamble(
+                badge_value_distribution,
+                badge_price_in_cents,
+                num_badges,
+            )
+            for app_id, badge_value_distribution in badge_value_distributions.items()
+        ]
+
+        return sorted(ranking, key=lambda x: x["expected_profit"], reverse=True)
+
+    return get_value_with_memo(
+        f"gamble ranking:{gem_price_in_euros}:{num_badges}",
+        compute_ranking,
+    )
+
+
+def print_ranked_gambles(
+    ranking: list[dict],
+    num_badges: int = DEFAULT_NUM_BADGES,
+    num_gambles_to_display: int = NUM_GAMBLES_TO_DISPLAY,
+) -> None:
+    print(f"\n# Gambles ranked by expected profit after crafting {num_badges} badges\n")
+
+    for rank, gamble in enumerate(ranking[:num_gambles_to_display], start=1):
+        print(
+            "{}) appID {}\t| expected profit: {:.2f}€ | std: {:.2f}€ | P(profit): {:.1%}".format(
+                rank,
+                gamble["app_id"],
+                gamble["expected_profit"] / 100,
+                gamble["variance"] ** 0.5 / 100,
+                gamble["probability_of_profit"],
+            ),
+        )
+
+
+def main(num_badges: int = DEFAULT_NUM_BADGES) -> bool:
+    ranking = rank_gambles(num_badges=num_badges)
+    print_ranked_gambles(ranking, num_badges=num_badges)
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+# Objective: predict the goo value of foil cards offline, so that most queries to ajaxgetgoovalueforitemtype are skipped.
+#
+# Goo values follow a small set of levels, which depend on the number of cards per set. For each set size, the model
+# is the empirical distribution of the goo values which are already known. The prediction is:
+# - the most frequent level, with its frequency as a confidence score,
+# - an upper bound, i.e. a high quantile of the distribution.
+#
+# An appID only needs to be queried if the prediction is unreliable (few known values for this set size), or if its
+# cheapest foil card could be profitable if its goo value were as high as the upper bound.
+#
+# NB: with the goo details shipped in data/, the most frequent level is right for about 30% of appIDs, in line with a
+#     mean confidence of about 31%, whereas the upper bound covers 99% of goo values. So the upper bound is what allows
+#     to skip queries safely. Run this module to measure the accuracy again.
+
+from collections import Counter
+from typing import Final
+
+from src.download_steam_card_exchange import parse_data_from_steam_card_exchange
+from src.json_utils import load_json
+from src.parsing_utils import parse_badge_creation_details
+from src.sack_of_gems import get_num_gems_per_sack_of_gems
+from src.utils import (
+    convert_listing_hash_to_app_id,
+    get_goo_details_file_nam_for_for_foil_cards,
+)
+
+UPPER_BOUND_QUANTILE: Final[float] = 0.95
+MIN_NUM_SAMPLES_FOR_RELIABLE_PREDICTION: Final[int] = 30
+# The crafting cost of a booster pack is 6000/N gems, where N is the number of cards per set.
+GEM_AMOUNT_FOR_A_SET_OF_BOOSTER_PACKS: Final[int] = 6000
+
+
+def load_num_cards_per_set(
+    *,
+    use_steam_card_exchange: bool = False,
+) -> dict[str, int]:
+    # The number of cards per set is inferred from the crafting cost of booster packs for games owned by the user, and
+    # then taken from SteamCardExchange, which covers every game, if allowed.
+    num_cards_per_set = {}
+
+    for from_javascript in [False, True]:
+        badge_creation_details = parse_badge_creation_details(
+            from_javascript=from_javascript,
+        )
+
+        for app_id, details in badge_creation_details.items():
+            num_cards_per_set[app_id] = round(
+                GEM_AMOUNT_FOR_A_SET_OF_BOOSTER_PACKS / details["gem_value"],
+            )
+
+    if use_steam_card_exchange:
+        dico = parse_data_from_steam_card_exchange()
+
+        for app_id, data_from_steam_card_exchange in dico.items():
+            num_cards_per_set[app_id] = data_from_steam_card_exchange[
+                "num_cards_per_set"
+            ]
+
+    return num_cards_per_set
+
+
+def build_goo_value_model(
+    all_goo_details: dict[str, int | None],
+    num_cards_per_set: dict[str, int],
+) -> dict[int, Counter[int]]:
+    model: dict[int, Counter[int]] = {}
+
+    for app_id, goo_value in all_goo_details.items():
+        if goo_value is None or app_id not in num_cards_per_set:
+            continue
+
+        model.setdefault(num_cards_per_set[app_id], Counter())[goo_value] += 1
+
+    return model
+
+
+def compute_quantile(goo_value_counts: Counter[int], quantile: float) -> int:
+    num_samples = goo_value_counts.total()
+    cumulated_count = 0
+
+    for goo_value in sorted(goo_value_counts):
+        cumulated_count += goo_value_counts[goo_value]
+        if cumulated_count >= quantile * num_samples:
+            return goo_value
+
+    return max(goo_value_counts)
+
+
+def predict_goo_value(
+    goo_value_counts: Counter[int] | None,
+) -> dict[str, float | int | None]:
+    if not goo_value_counts:
+        return {
+            "goo_value": None,
+            "upper_bound": None,
+            "confidence": 0.0,
+            "num_samples": 0,
+        }
+
+    goo_value, count = goo_value_counts.most_common(1)[0]
+    num_samples = goo_value_counts.total()
+
+    return {
+        "goo_value": goo_value,
+        "upper_bound": compute_quantile(goo_value_counts, UPPER_BOUND_QUANTILE),
+        "confidence": count / num_samples,
+        "num_samples": num_samples,
+    }
+
+
+def predict_goo_value_for_app_id(
+    app_id: str,
+    model: dict[int, Counter[int]],
+    num_cards_per_set: dict[str, int],
+) -> dict[str, float | int | None]:
+    try:
+        goo_value_counts = model[num_cards_per_set[app_id]]
+    except KeyError:
+        goo_value_counts = None
+
+    return predict_goo_value(goo_value_counts)
+
+
+def is_prediction_reliable(
+    prediction: dict[str, float | int | None],
+    min_num_samples: int = MIN_NUM_SAMPLES_FOR_RELIABLE_PREDICTION,
+) -> bool:
+    return bool(
+        prediction["num_samples"] is not None
+        and prediction["num_samples"] >= min_num_samples,
+    )
+
+
+def convert_goo_value_to_cents(
+    goo_value_in_gems: float,
+    sack_of_gems_price_in_euros: float,
+) -> float:
+    num_gems_per_sack_of_gems = get_num_gems_per_sack_of_gems()
+
+    return (
+        goo_value_in_gems
+        / num_gems_per_sack_of_gems
+        * sack_of_gems_price_in_euros
+        * 100
+    )
+
+
+def select_app_ids_to_query(
+    app_ids: list[str] | set[str],
+    model: dict[int, Counter[int]],
+    num_cards_per_set: dict[str, int],
+    cheapest_ask_in_cents: dict[str, float],
+    sack_of_gems_price_in_euros: float,
+    *,
+    verbose: bool = True,
+) -> list[str]:
+    # Keep appIDs with an unreliable prediction, and appIDs which could be profitable based on the upper bound.
+
+    app_ids_to_query = []
+
+    for app_id in app_ids:
+        prediction = predict_goo_value_for_app_id(app_id, model, num_cards_per_set)
+
+        if (
+            not is_prediction_reliable(prediction)
+            or app_id not in cheapest_ask_in_cents
+        ):
+            app_ids_to_query.append(app_id)
+            continue
+
+        upper_bound_in_cents = convert_goo_value_to_cents(
+            prediction["upper_bound"],
+            sack_of_gems_price_in_euros,
+        )
+
+        if upper_bound_in_cents > cheapest_ask_in_cents[app_id]:
+            app_ids_to_query.append(app_id)
+
+    if verbose:
+        print(
+            f"Goo value predictor: {len(app_ids_to_query)} out of {len(app_ids)} appIDs need to be queried.",
+        )
+
+    return app_ids_to_query
+
+
+def find_app_ids_whose_query_can_be_skipped(
+    app_ids: list[str] | set[str],
+    all_listings: dict[str, dict],
+    cheapest_listing_hashes: list[str],
+    sack_of_gems_price_in_euros: float,
+    goo_details_file_name: str | None = None,
+    *,
+    use_steam_card_exchange: bool = True,
+    verbose: bool = True,
+) -> list[str]:
+    if goo_details_file_name is None:
+        goo_details_file_name = get_goo_details_file_nam_for_for_foil_cards()
+
+    try:
+        all_goo_details = load_json(goo_details_file_name)
+    except FileNotFoundError:
+        all_goo_details = {}
+
+    num_cards_per_set = load_num_cards_per_set(
+        use_steam_card_exchange=use_steam_card_exchange,
+    )
+    model = build_goo_value_model(all_goo_details, num_cards_per_set)
+
+    cheapest_ask_in_cents = {
+        convert_listing_hash_to_app_id(listing_hash): all_listings[listing_hash][
+            "sell_price"
+        ]
+        for listing_hash in cheapest_listing_hashes
+    }
+
+    app_ids_to_query = select_app_ids_to_query(
+        app_ids,
+        model,
+        num_cards_per_set,
+        cheapest_ask_in_cents,
+        sack_of_gems_price_in_euros,
+        verbose=verbose,
+    )
+
+    return sorted(set(app_ids).difference(app_ids_to_query), key=int)
+
+
+def evaluate_goo_value_predictor(
+    all_goo_details: dict[str, int | None],
+    num_cards_per_set: dict[str, int],
+    *,
+    verbose: bool = True,
+) -> dict[str, float]:
+    # Leave-one-out evaluation against the goo values which are already known.
+
+    model = build_goo_value_model(all_goo_details, num_cards_per_set)
+
+    num_predictions = 0
+    num_correct_predictions = 0
+    sum_of_confidence_scores = 0.0
+    num_values_below_upper_bound = 0
+
+    for app_id, goo_value in all_goo_details.items():
+        if goo_value is None or app_id not in num_cards_per_set:
+            continue
+
+        goo_value_counts = model[num_cards_per_set[app_id]].copy()
+        goo_value_counts[goo_value] -= 1
+        prediction = predict_goo_value(+goo_value_counts)
+
+        if not is_prediction_reliable(prediction):
+            continue
+
+        num_predictions += 1
+        num_correct_predictions += bool(prediction["goo_value"] == goo_value)
+        sum_of_confidence_scores += prediction["confidence"]
+        num_values_below_upper_bound += bool(goo_value <= prediction["upper_bound"])
+
+    # NB: for a well-calibrated confidence score, the mean confidence should be close to the accuracy.
+    evaluation = {
+        "num_predictions": num_predictions,
+        "accuracy": num_correct_predictions / max(1, num_predictions),
+        "mean_confidence": sum_of_confidence_scores / max(1, num_predictions),
+        "upper_bound_coverage": num_values_below_upper_bound / max(1, num_predictions),
+    }
+
+    if verbose:
+        print(
+            f"Goo value predictor: {num_predictions} predictions ; accuracy: {evaluation['accuracy']:.1%} ; mean confidence: {evaluation['mean_confidence']:.1%} ; upper bound coverage: {evaluation['upper_bound_coverage']:.1%}",
+        )
+
+    return evaluation
+
+
+def main() -> bool:
+    all_goo_details = load_json(get_goo_details_file_nam_for_for_foil_cards())
+    num_cards_per_set = load_num_cards_per_set()
+
+    evaluate_goo_value_predictor(all_goo_details, num_cards_per_set)
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
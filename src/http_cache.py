@@ -0,0 +1,362 @@
+# Objective: cache HTTP responses on disk, so that re-running a script within a few minutes does not consume the
+# budget of rate-limited queries again.
+#
+# Responses are keyed by method, URL and parameters, and their bodies are stored compressed with gzip. Each kind of
+# query has its own time-to-live:
+# - market orders change all the time, so they are only re-used for a few minutes,
+# - listing pages are scraped for constant fields (item name ID, item type), so they are kept forever. The marketability
+#   status may change, so callers which refresh it bypass the cache,
+# - goo values seldom change, so they are kept for days,
+# - the dump of SteamCardExchange is updated a few times a day, so it is kept for hours.
+#
+# NB: cookies are not part of the key, and only successful responses are cached.
+#
+# Entries are stored in one folder per kind of query. Stale entries are deleted when they are read, and the whole cache
+# is pruned at most once per hour when an entry is written, so that the folder does not grow forever.
+#
+# On a cache miss, concurrent callers of the same request share a single request in flight ("single-flight"), and its
+# result, so that the rate budget is not spent twice for the same resource. Requests in flight are keyed by method, URL,
+# parameters and headers, so that a conditional request is never shared with an unconditional one. Only the request in
+# flight waits for the rate limiter, if any, so that neither cached nor coalesced requests spend the rate budget.
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Final
+
+from src.creation_time_utils import get_current_time, to_timestamp
+from src.rate_limiter import wait_for_rate_limiter
+from src.telemetry_utils import record_cache_lookup
+from src.utils import TIMEOUT_IN_SECONDS, get_http_cache_folder
+
+if TYPE_CHECKING:
+    import requests
+
+# Time-to-live in seconds, or None to keep responses forever.
+CACHE_POLICIES: Final[dict[str, int | None]] = {
+    "market_order": 5 * 60,
+    "market_listing": None,
+    "goo_value": 3 * 24 * 3600,
+    "steam_card_exchange": 6 * 3600,
+}
+
+PRUNING_INTERVAL_IN_SECONDS: Final[int] = 3600
+
+_requests_in_flight: dict[str, Future] = {}
+_requests_in_flight_lock = threading.Lock()
+
+# Per-thread hook called before a request is actually sent, typically to wait for a rate limiter.
+_rate_limiting = threading.local()
+
+_last_pruning_time: float | None = None
+_pruning_lock = threading.Lock()
+
+
+def get_cache_key(
+    method: str,
+    url: str,
+    params: dict[str, str] | None = None,
+) -> str:
+    key = json.dumps([method, url, params or {}], sort_keys=True)
+
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def get_flight_key(
+    url: str,
+    params: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+) -> str:
+    key = json.dumps(
+        [get_cache_key("GET", url, params), headers or {}],
+        sort_keys=True,
+    )
+
+    return hashlib.sha256(key.encode()).hexdigest()
+
+
+def is_request_in_flight(
+    url: str,
+    params: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+) -> bool:
+    with _requests_in_flight_lock:
+        return get_flight_key(url, params, headers) in _requests_in_flight
+
+
+def get_cache_policy_folder(
+    cache_policy: str,
+    http_cache_folder: str | None = None,
+) -> str:
+    if http_cache_folder is None:
+        http_cache_folder = get_http_cache_folder()
+
+    cache_policy_folder = http_cache_folder + f"{cache_policy}/"
+    Path(cache_policy_folder).mkdir(exist_ok=True)
+
+    return cache_policy_folder
+
+
+def get_cache_file_name(cache_key: str, cache_policy: str) -> str:
+    return get_cache_policy_folder(cache_policy) + f"{cache_key}.json.gz"
+
+
+def get_time_to_live(cache_policy: str) -> int | None:
+    return CACHE_POLICIES[cache_policy]
+
+
+def load_cached_entry(cache_file_name: str) -> dict | None:
+    try:
+        with gzip.open(cache_file_name, "rt", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (FileNotFoundError, EOFError, OSError, json.JSONDecodeError):
+        entry = None
+
+    return entry
+
+
+def save_cached_entry(entry: dict, cache_file_name: str) -> None:
+    # NB: the entry is written to a temporary file first, so that a concurrent reader never sees a partial file.
+    temporary_file_name = cache_file_name + ".tmp"
+
+    with gzip.open(temporary_file_name, "wt", encoding="utf-8") as f:
+        json.dump(entry, f)
+
+    Path(temporary_file_name).replace(cache_file_name)
+
+
+def is_entry_fresh(entry: dict, time_to_live: int | None) -> bool:
+    if time_to_live is None:
+        return True
+
+    current_timestamp = to_timestamp(get_current_time())
+
+    return current_timestamp - entry["timestamp"] < time_to_live
+
+
+def convert_entry_to_response(entry: dict) -> "requests.Response":
+    import requests  # noqa: PLC0415
+
+    response = requests.Response()
+    response.url = entry["url"]
+    response.status_code = entry["status_code"]
+    response.reason = "OK"
+    response.headers.update(entry["headers"])
+    response.encoding = entry["encoding"]
+    response._content = entry["body"].encode(entry["encoding"])  # noqa: SLF001
+
+    return response
+
+
+def convert_response_to_entry(response: "requests.Response") -> dict:
+    encoding = response.encoding or "utf-8"
+
+    return {
+        "url": response.url,
+        "status_code": response.status_code,
+        "headers": {
+            field: value
+            for field, value in response.headers.items()
+            if field in ["Content-Type", "ETag", "Last-Modified"]
+        },
+        "encoding": encoding,
+        "body": response.content.decode(encoding, errors="replace"),
+        "timestamp": to_timestamp(get_current_time()),
+    }
+
+
+def load_fresh_response(
+    url: str,
+    params: dict[str, str] | None = None,
+    *,
+    cache_policy: str,
+) -> "requests.Response | None":
+    cache_file_name = get_cache_file_name(
+        get_cache_key("GET", url, params),
+        cache_policy,
+    )
+    entry = load_cached_entry(cache_file_name)
+
+    if entry is None:
+        return None
+
+    if not is_entry_fresh(entry, get_time_to_live(cache_policy)):
+        Path(cache_file_name).unlink(missing_ok=True)
+        return None
+
+    return convert_entry_to_response(entry)
+
+
+@contextmanager
+def rate_limited_requests(
+    rate_limiter: dict,
+    *,
+    wait_fn: Callable[[dict], bool] | None = None,
+    verbose: bool = True,
+) -> Iterator[None]:
+    # Wait for the rate limiter before each request actually sent by cached_get() from this thread, i.e. neither for
+    # cached responses nor for requests coalesced with a request in flight, because they do not count towards rate
+    # limits. By default, wait with wait_for_rate_limiter(). If wait_fn() returns False, the request is not sent, and
+    # cached_get() raises RequestException, as if no response was received.
+    previous_hook = getattr(_rate_limiting, "hook", None)
+
+    def hook() -> bool:
+        if wait_fn is None:
+            wait_for_rate_limiter(rate_limiter, verbose=verbose)
+            return True
+
+        return wait_fn(rate_limiter)
+
+    _rate_limiting.hook = hook
+
+    try:
+        yield
+    finally:
+        _rate_limiting.hook = previous_hook
+
+
+def wait_before_request(url: str) -> None:
+    import requests  # noqa: PLC0415
+
+    hook = getattr(_rate_limiting, "hook", None)
+
+    if hook is not None and not hook():
+        msg = f"The request to {url} was cancelled while waiting for the rate limiter."
+        raise requests.exceptions.RequestException(msg)
+
+
+def cached_get(
+    url: str,
+    params: dict[str, str] | None = None,
+    *,
+    cache_policy: str,
+    cookies: dict[str, str] | None = None,
+    headers: dict[str, str] | None = None,
+    timeout: float = TIMEOUT_IN_SECONDS,
+    use_cache: bool = True,
+) -> "requests.Response":
+    # Drop-in replacement for requests.get(), which may raise the same exceptions on a cache miss. If use_cache is False,
+    # the cached response is ignored, and replaced with the new one.
+    import requests  # noqa: PLC0415
+
+    if use_cache:
+        response = load_fresh_response(url, params, cache_policy=cache_policy)
+        record_cache_lookup(f"http:{cache_policy}", is_hit=response is not None)
+
+        if response is not None:
+            return response
+
+    flight_key = get_flight_key(url, params, headers)
+
+    with _requests_in_flight_lock:
+        flight = _requests_in_flight.get(flight_key)
+        is_leader = flight is None
+
+        if is_leader:
+            flight = Future()
+            _requests_in_flight[flight_key] = flight
+
+    # The share of requests which were coalesced with an identical request in flight.
+    record_cache_lookup(f"single-flight:{cache_policy}", is_hit=not is_leader)
+
+    if not is_leader:
+        # NB: this raises the same exception as the request in flight, if any.
+        return flight.result()
+
+    try:
+        wait_before_request(url)
+
+        response = requests.get(
+            url,
+            params=params,
+            cookies=cookies,
+            headers=headers,
+            timeout=timeout,
+        )
+
+        if response.status_code == requests.codes.ok:
+            save_cached_entry(
+                convert_response_to_entry(response),
+                get_cache_file_name(get_cache_key("GET", url, params), cache_policy),
+            )
+            prune_http_cache_periodically()
+    except Exception as e:
+        flight.set_exception(e)
+        raise
+    else:
+        flight.set_result(response)
+    finally:
+        with _requests_in_flight_lock:
+            del _requests_in_flight[flight_key]
+
+    return response
+
+
+def prune_http_cache(http_cache_folder: str | None = None) -> int:
+    # Delete stale entries, based on the modification time of their file, which is the time when they were written.
+    if http_cache_folder is None:
+        http_cache_folder = get_http_cache_folder()
+
+    current_time = time.time()
+    num_deleted_files = 0
+
+    for cache_policy, time_to_live in CACHE_POLICIES.items():
+        if time_to_live is None:
+            continue
+
+        cache_policy_folder = get_cache_policy_folder(cache_policy, http_cache_folder)
+
+        for cache_file in Path(cache_policy_folder).glob("*.json.gz"):
+            try:
+                modification_time = cache_file.stat().st_mtime
+            except FileNotFoundError:
+                continue
+
+            if current_time - modification_time >= time_to_live:
+                cache_file.unlink(missing_ok=True)
+                num_deleted_files += 1
+
+    return num_deleted_files
+
+
+def prune_http_cache_periodically() -> None:
+    global _last_pruning_time  # noqa: PLW0603
+
+    with _pruning_lock:
+        current_time = time.monotonic()
+
+        if (
+            _last_pruning_time is not None
+            and current_time - _last_pruning_time < PRUNING_INTERVAL_IN_SECONDS
+        ):
+            return
+
+        _last_pruning_time = current_time
+
+    prune_http_cache()
+
+
+def clear_http_cache() -> int:
+    num_deleted_files = 0
+
+    for cache_file in Path(get_http_cache_folder()).rglob("*.json.gz"):
+        cache_file.unlink()
+        num_deleted_files += 1
+
+    return num_deleted_files
+
+
+def main() -> bool:
+    print(f"{clear_http_cache()} cached responses were deleted.")
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
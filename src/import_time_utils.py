@@ -0,0 +1,96 @@
+# Objective: measure the start-up time of the entry scripts, based on `python -X importtime`.
+#
+# Network and HTML-parsing dependencies (requests, bs4, steamspypi) are imported lazily, inside the functions which
+# actually fetch or parse data, so that offline commands which only re-rank cached data start quickly.
+
+import subprocess
+import sys
+from typing import Final
+
+ENTRY_MODULES: Final[list[str]] = [
+    "market_arbitrage",
+    "market_arbitrage_with_foil_cards",
+    "market_buzz_detector",
+    "market_gamble_detector",
+    "market_reports",
+]
+LAZILY_IMPORTED_MODULES: Final[list[str]] = ["requests", "bs4", "steamspypi"]
+NUM_SLOWEST_IMPORTS_TO_DISPLAY: Final[int] = 10
+
+
+def parse_import_time_output(stderr: str) -> dict[str, int]:
+    # Each line is like: "import time:       self [us] |  cumulative | imported package"
+    # Return the cumulative import time in microseconds of each imported module.
+    cumulative_import_times = {}
+
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+
+        tokens = line.removeprefix("import time:").split("|")
+
+        try:
+            cumulative_import_time = int(tokens[1])
+        except ValueError:
+            # Header line
+            continue
+
+        module_name = tokens[2].strip()
+        cumulative_import_times[module_name] = cumulative_import_time
+
+    return cumulative_import_times
+
+
+def measure_import_time(module_name: str) -> dict[str, int]:
+    # NB: a fresh interpreter is required, otherwise modules would already be cached in sys.modules.
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    return parse_import_time_output(result.stderr)
+
+
+def find_eagerly_imported_modules(
+    module_name: str,
+    modules_to_check: list[str] | None = None,
+) -> list[str]:
+    if modules_to_check is None:
+        modules_to_check = LAZILY_IMPORTED_MODULES
+
+    imported_modules = measure_import_time(module_name)
+
+    return [module for module in modules_to_check if module in imported_modules]
+
+
+def print_import_time(
+    module_name: str,
+    cumulative_import_times: dict[str, int],
+    num_slowest_imports: int = NUM_SLOWEST_IMPORTS_TO_DISPLAY,
+) -> None:
+    total_in_ms = cumulative_import_times.get(module_name, 0) / 1000
+
+    print(f"\n# Import time for {module_name}: {total_in_ms:.1f} ms")
+
+    slowest_imports = sorted(
+        cumulative_import_times.items(),
+        key=lambda x: x[1],
+        reverse=True,
+    )
+
+    for imported_module, import_time in slowest_imports[:num_slowest_imports]:
+        print(f"-   {imported_module}: {import_time / 1000:.1f} ms")
+
+
+def main() -> bool:
+    for module_name in ENTRY_MODULES:
+        cumulative_import_times = measure_import_time(module_name)
+        print_import_time(module_name, cumulative_import_times)
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
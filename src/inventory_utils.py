@@ -1,17 +1,21 @@
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
 from http import HTTPStatus
-
-import requests
+from typing import Final
 
 from src.creation_time_utils import (
     get_crafting_cooldown_duration_in_days,
+    get_current_time,
     get_formatted_current_time,
     load_next_creation_time_data,
+    to_timestamp,
 )
 from src.json_utils import load_json, save_json
 from src.personal_info import (
     get_cookie_dict,
     update_and_save_cookie_to_disk_if_values_changed,
 )
+from src.rate_limiter import get_shared_rate_limiter, wait_for_rate_limiter
 from src.utils import (
     TIMEOUT_IN_SECONDS,
     convert_listing_hash_to_app_id,
@@ -21,6 +25,12 @@ from src.utils import (
     get_next_creation_time_file_name,
 )
 
+INVENTORY_PAGE_SIZE: Final[int] = 2000
+DEFAULT_MAX_NUM_WORKERS_FOR_SALES: Final[int] = 4
+# An incremental refresh never removes assets from the inventory index, so the index is fully refreshed once it is older
+# than this.
+INVENTORY_INDEX_TTL_IN_SECONDS: Final[int] = 24 * 60 * 60
+
 
 def get_my_steam_profile_id() -> str:
     return get_cookie_dict()["steamLoginSecure"].split("%7C")[0]
@@ -81,6 +91,8 @@ def download_steam_inventory(
     *,
     save_to_disk: bool = True,
 ) -> dict | None:
+    import requests  # noqa: PLC0415
+
     if profile_id is None:
         profile_id = get_my_steam_profile_id()
 
@@ -117,6 +129,255 @@ def download_steam_inventory(
     return steam_inventory
 
 
+def get_steam_inventory_pages_url(
+    profile_id: str | None = None,
+    app_id: str = "753",
+    context_id: int = 6,
+) -> str:
+    if profile_id is None:
+        profile_id = get_my_steam_profile_id()
+
+    # Contrary to the legacy endpoint used by get_steam_inventory_url(), this endpoint is paginated.
+    return f"https://steamcommunity.com/inventory/{profile_id}/{app_id}/{context_id}"
+
+
+def get_inventory_index_file_name(profile_id: str) -> str:
+    return get_data_folder() + f"inventory_index_{profile_id}.json"
+
+
+def download_steam_inventory_pages(
+    profile_id: str | None = None,
+    page_size: int = INVENTORY_PAGE_SIZE,
+) -> Iterator[dict]:
+    # Yield the pages of the inventory one at a time, so that the whole inventory is never held in memory.
+    # Each page is like: {"assets": [...], "descriptions": [...], "more_items": 1, "last_assetid": "XXX", ...}
+    import requests  # noqa: PLC0415
+
+    if profile_id is None:
+        profile_id = get_my_steam_profile_id()
+
+    cookie = get_cookie_dict()
+    has_secured_cookie = bool(len(cookie) > 0)
+
+    rate_limiter = get_shared_rate_limiter(
+        "inventory",
+        has_secured_cookie=has_secured_cookie,
+    )
+
+    url = get_steam_inventory_pages_url(profile_id=profile_id)
+    req_data = {"l": "english", "count": str(page_size)}
+
+    while True:
+        wait_for_rate_limiter(rate_limiter, verbose=True)
+
+        if has_secured_cookie:
+            resp_data = requests.get(
+                url,
+                params=req_data,
+                cookies=cookie,
+                timeout=TIMEOUT_IN_SECONDS,
+            )
+        else:
+            resp_data = requests.get(url, params=req_data, timeout=TIMEOUT_IN_SECONDS)
+
+        if not resp_data.ok:
+            print(
+                f"Inventory page for profile {profile_id} could not be loaded. Status code {resp_data.status_code} was returned.",
+            )
+            return
+
+        page = resp_data.json()
+
+        if has_secured_cookie:
+            jar = get_jar(resp_data)
+            cookie = update_and_save_cookie_to_disk_if_values_changed(cookie, jar)
+
+        yield page
+
+        if not page.get("more_items"):
+            return
+
+        req_data["start_assetid"] = page["last_assetid"]
+
+
+def add_inventory_page_to_index(
+    inventory_index: dict[str, dict[str, dict]],
+    page: dict,
+    last_known_asset_id: int = 0,
+) -> bool:
+    # Add the assets of a page to an index built by build_inventory_index(). Assets which are not more recent than the
+    # last known asset are skipped. Return whether such an asset was encountered.
+    descriptions = {
+        f"{description['classid']}_{description['instanceid']}": description
+        for description in page.get("descriptions", [])
+    }
+
+    has_reached_known_assets = False
+
+    for asset in page.get("assets", []):
+        if int(asset["assetid"]) <= last_known_asset_id:
+            has_reached_known_assets = True
+            continue
+
+        description_key = f"{asset['classid']}_{asset['instanceid']}"
+
+        try:
+            description = descriptions[description_key]
+        except KeyError:
+            continue
+
+        entries_for_listing_hash = inventory_index.setdefault(
+            description["market_hash_name"],
+            {},
+        )
+
+        if description_key not in entries_for_listing_hash:
+            entries_for_listing_hash[description_key] = {
+                "marketable": bool(description["marketable"] != 0),
+                "asset_ids": [],
+            }
+
+        asset_ids = entries_for_listing_hash[description_key]["asset_ids"]
+
+        # NB: an asset may already be indexed, if the previous refresh was interrupted.
+        if asset["assetid"] not in asset_ids:
+            asset_ids.append(asset["assetid"])
+
+    return has_reached_known_assets
+
+
+def find_last_asset_id(inventory_index: dict[str, dict[str, dict]]) -> int:
+    # NB: asset IDs are assigned in increasing order, so the last asset is the most recent one.
+    return max(
+        (
+            int(asset_id)
+            for entries_for_listing_hash in inventory_index.values()
+            for entry in entries_for_listing_hash.values()
+            for asset_id in entry["asset_ids"]
+        ),
+        default=0,
+    )
+
+
+def load_inventory_index_from_disk(
+    profile_id: str | None = None,
+) -> dict | None:
+    if profile_id is None:
+        profile_id = get_my_steam_profile_id()
+
+    try:
+        inventory_index_data = load_json(get_inventory_index_file_name(profile_id))
+    except FileNotFoundError:
+        inventory_index_data = None
+
+    return inventory_index_data
+
+
+def save_inventory_index_to_disk(
+    inventory_index: dict[str, dict[str, dict]],
+    last_asset_id: int,
+    profile_id: str | None = None,
+    last_full_refresh_timestamp: int | None = None,
+) -> None:
+    # NB: without the timestamp of the last full refresh, the next refresh is a full one.
+    if profile_id is None:
+        profile_id = get_my_steam_profile_id()
+
+    inventory_index_data = {
+        "last_asset_id": str(last_asset_id),
+        "last_full_refresh_timestamp": last_full_refresh_timestamp,
+        "index": inventory_index,
+    }
+
+    save_json(inventory_index_data, get_inventory_index_file_name(profile_id))
+
+
+def is_inventory_index_expired(
+    inventory_index_data: dict,
+    ttl_in_seconds: int = INVENTORY_INDEX_TTL_IN_SECONDS,
+) -> bool:
+    last_full_refresh_timestamp = inventory_index_data.get(
+        "last_full_refresh_timestamp",
+    )
+
+    if last_full_refresh_timestamp is None:
+        return True
+
+    return (
+        to_timestamp(get_current_time()) - last_full_refresh_timestamp > ttl_in_seconds
+    )
+
+
+def refresh_inventory_index(
+    profile_id: str | None = None,
+    *,
+    incremental_refresh: bool = True,
+    verbose: bool = True,
+) -> dict[str, dict[str, dict]]:
+    # An incremental refresh only downloads the pages with assets more recent than the last known asset, e.g. booster
+    # packs which were just created, assuming that the most recent assets are listed first.
+    #
+    # Caveat: assets which left the inventory since the last refresh, e.g. because they were sold on the website, are
+    #         only removed by a full refresh. This is why the refresh is a full one if the index has expired, e.g. after
+    #         a failed sale.
+    if profile_id is None:
+        profile_id = get_my_steam_profile_id()
+
+    inventory_index_data = None
+    if incremental_refresh:
+        inventory_index_data = load_inventory_index_from_disk(profile_id)
+
+    if inventory_index_data is not None and is_inventory_index_expired(
+        inventory_index_data,
+    ):
+        if verbose:
+            print(f"Inventory index for profile {profile_id} expired.")
+        inventory_index_data = None
+
+    if inventory_index_data is None:
+        inventory_index: dict[str, dict[str, dict]] = {}
+        last_known_asset_id = 0
+        last_full_refresh_timestamp = to_timestamp(get_current_time())
+    else:
+        inventory_index = inventory_index_data["index"]
+        last_known_asset_id = int(inventory_index_data["last_asset_id"])
+        last_full_refresh_timestamp = inventory_index_data[
+            "last_full_refresh_timestamp"
+        ]
+
+    is_complete = False
+    num_pages = 0
+
+    for page in download_steam_inventory_pages(profile_id):
+        num_pages += 1
+
+        has_reached_known_assets = add_inventory_page_to_index(
+            inventory_index,
+            page,
+            last_known_asset_id,
+        )
+
+        if has_reached_known_assets or not page.get("more_items"):
+            is_complete = True
+            break
+
+    if verbose:
+        print(
+            f"Inventory index for profile {profile_id} refreshed with {num_pages} pages (complete: {is_complete}).",
+        )
+
+    # NB: an incomplete index is not saved, so that missing assets are downloaded again at the next refresh.
+    if is_complete:
+        save_inventory_index_to_disk(
+            inventory_index,
+            max(last_known_asset_id, find_last_asset_id(inventory_index)),
+            profile_id,
+            last_full_refresh_timestamp,
+        )
+
+    return inventory_index
+
+
 def get_session_id(cookie: dict[str, str] | None = None) -> str:
     if cookie is None:
         cookie = get_cookie_dict()
@@ -152,6 +413,8 @@ def create_booster_pack(
     is_marketable: bool = True,
     verbose: bool = True,
 ) -> dict | None:
+    import requests  # noqa: PLC0415
+
     cookie = get_cookie_dict()
     has_secured_cookie = bool(len(cookie) > 0)
 
@@ -241,6 +504,8 @@ def sell_booster_pack(
     *,
     verbose: bool = True,
 ) -> dict | None:
+    import requests  # noqa: PLC0415
+
     cookie = get_cookie_dict()
     has_secured_cookie = bool(len(cookie) > 0)
 
@@ -298,6 +563,82 @@ def sell_booster_pack(
     return result
 
 
+def build_inventory_index(steam_inventory: dict | None) -> dict[str, dict[str, dict]]:
+    # Index the inventory in a single pass, so that assets are then found in constant time:
+    # market_hash_name -> "classid_instanceid" -> {"marketable": bool, "asset_ids": list of asset IDs}
+    inventory_index: dict[str, dict[str, dict]] = {}
+
+    if not steam_inventory:
+        return inventory_index
+
+    descriptions = steam_inventory["rgDescriptions"]
+    community_inventory = steam_inventory["rgInventory"]
+
+    for element in community_inventory.values():
+        # NB: descriptions are keyed by classid and instanceid, e.g. "1234567890_0".
+        description_key = f"{element['classid']}_{element['instanceid']}"
+
+        try:
+            description = descriptions[description_key]
+        except KeyError:
+            continue
+
+        entries_for_listing_hash = inventory_index.setdefault(
+            description["market_hash_name"],
+            {},
+        )
+
+        if description_key not in entries_for_listing_hash:
+            entries_for_listing_hash[description_key] = {
+                "marketable": bool(description["marketable"] != 0),
+                "asset_ids": [],
+            }
+
+        entries_for_listing_hash[description_key]["asset_ids"].append(element["id"])
+
+    return inventory_index
+
+
+def find_inventory_entry(
+    inventory_index: dict[str, dict[str, dict]],
+    listing_hash: str,
+    *,
+    focus_on_marketable_items: bool = True,
+) -> dict | None:
+    # Return the entry of a classid/instanceid with remaining assets, preferably a marketable one if required.
+    entries_with_assets = [
+        entry
+        for entry in inventory_index.get(listing_hash, {}).values()
+        if entry["asset_ids"]
+    ]
+
+    if focus_on_marketable_items:
+        for entry in entries_with_assets:
+            if entry["marketable"]:
+                return entry
+
+    return entries_with_assets[0] if entries_with_assets else None
+
+
+def pop_asset_id(
+    inventory_index: dict[str, dict[str, dict]],
+    listing_hash: str,
+    *,
+    focus_on_marketable_items: bool = True,
+) -> str | None:
+    # Remove the asset from the index, so that several copies of the same item are matched with distinct assets.
+    entry = find_inventory_entry(
+        inventory_index,
+        listing_hash,
+        focus_on_marketable_items=focus_on_marketable_items,
+    )
+
+    if entry is None:
+        return None
+
+    return entry["asset_ids"].pop()
+
+
 def retrieve_asset_id(
     listing_hash: str,
     steam_inventory: dict | None = None,
@@ -306,61 +647,28 @@ def retrieve_asset_id(
     profile_id: str | None = None,
     verbose: bool = True,
 ) -> str:
+    # Caveat: the inventory is indexed at each call. To match many listing hashes, build the index once with
+    # build_inventory_index(), then call pop_asset_id().
     if steam_inventory is None:
         steam_inventory = load_steam_inventory(profile_id=profile_id)
 
-    descriptions = steam_inventory["rgDescriptions"] if steam_inventory else {}
-
-    matched_element = {}
-
-    for element in descriptions:
-        if descriptions[element]["market_hash_name"] == listing_hash:
-            matched_element["market_hash_name"] = descriptions[element][
-                "market_hash_name"
-            ]
-            matched_element["appid"] = descriptions[element]["appid"]
-            matched_element["classid"] = descriptions[element]["classid"]
-            matched_element["instanceid"] = descriptions[element]["instanceid"]
-            matched_element["type"] = descriptions[element]["type"]
-            matched_element["marketable"] = descriptions[element]["marketable"]
-
-            is_marketable_as_int = matched_element["marketable"]
-            is_marketable = bool(is_marketable_as_int != 0)
-
-            if is_marketable or (not focus_on_marketable_items):
-                if verbose:
-                    print(
-                        "\nItem found without requiring to go through the entire inventory.",
-                    )
-                break
-
-    has_been_matched = bool(len(matched_element) > 0)
-
-    if has_been_matched:
-        community_inventory = steam_inventory["rgInventory"] if steam_inventory else {}
+    inventory_index = build_inventory_index(steam_inventory)
 
-        for element in community_inventory:
-            if (
-                community_inventory[element]["classid"] == matched_element["classid"]
-                and community_inventory[element]["instanceid"]
-                == matched_element["instanceid"]
-            ):
-                matched_element["id"] = community_inventory[element]["id"]
-                matched_element["amount"] = community_inventory[element]["amount"]
-                matched_element["pos"] = community_inventory[element]["pos"]
-                break
+    entry = find_inventory_entry(
+        inventory_index,
+        listing_hash,
+        focus_on_marketable_items=focus_on_marketable_items,
+    )
 
+    if entry is not None:
         print(f"\nItem matched in the inventory for {listing_hash}.")
+        asset_id = entry["asset_ids"][0]
     else:
         print(f"\nNo matched item in the inventory for {listing_hash}.")
+        asset_id = None
 
     if verbose:
-        print(matched_element)
-
-    try:
-        asset_id = matched_element["id"]
-    except KeyError:
-        asset_id = None
+        print(entry)
 
     return asset_id
 
@@ -377,53 +685,208 @@ def create_booster_packs_for_batch(listing_hashes: list[str]) -> dict[str, dict
     return results
 
 
+def is_sale_successful(sale_result: dict | None) -> bool:
+    return sale_result is not None and bool(sale_result.get("success"))
+
+
+def sell_assets_from_inventory_index(
+    inventory_index: dict[str, dict[str, dict]],
+    price_dict_for_listing_hashes: dict[str, int],
+    sell_fn: Callable[..., dict | None] = sell_booster_pack,
+    *,
+    focus_on_marketable_items: bool = True,
+    num_copies_per_listing_hash: dict[str, int] | None = None,
+) -> dict[str, dict | None]:
+    # Assets are removed from the index once they are put on sale. An asset whose sale failed is removed too, because it
+    # may have left the inventory, e.g. if it was sold on the website. If not, the next full refresh adds it again.
+    if num_copies_per_listing_hash is None:
+        num_copies_per_listing_hash = {}
+
+    results = {}
+
+    for listing_hash, price_in_cents in price_dict_for_listing_hashes.items():
+        for _ in range(num_copies_per_listing_hash.get(listing_hash, 1)):
+            entry = find_inventory_entry(
+                inventory_index,
+                listing_hash,
+                focus_on_marketable_items=focus_on_marketable_items,
+            )
+
+            if entry is None:
+                print(f"\nNo matched item in the inventory for {listing_hash}.")
+                break
+
+            asset_id = entry["asset_ids"].pop()
+
+            result = sell_fn(asset_id=asset_id, price_in_cents=price_in_cents)
+
+            results[listing_hash] = result
+
+            if not is_sale_successful(result):
+                break
+
+    return results
+
+
 def sell_booster_packs_for_batch(
     price_dict_for_listing_hashes: dict[str, int],
     *,
     update_steam_inventory: bool = True,
     focus_on_marketable_items: bool = True,
     profile_id: str | None = None,
+    num_copies_per_listing_hash: dict[str, int] | None = None,
+    incremental_refresh: bool = True,
 ) -> dict[str, dict | None]:
-    results = {}
+    # NB: if several copies of a listing hash are sold, the result of the last sale is returned for this listing hash.
+    if num_copies_per_listing_hash is None:
+        num_copies_per_listing_hash = {}
 
-    steam_inventory = load_steam_inventory(
-        profile_id=profile_id,
-        update_steam_inventory=update_steam_inventory,
-    )
+    if profile_id is None:
+        profile_id = get_my_steam_profile_id()
 
-    for listing_hash, price_in_cents in price_dict_for_listing_hashes.items():
-        asset_id = retrieve_asset_id(
-            listing_hash=listing_hash,
-            steam_inventory=steam_inventory,
-            focus_on_marketable_items=focus_on_marketable_items,
-            profile_id=profile_id,
+    inventory_index_data = None
+    if not update_steam_inventory:
+        inventory_index_data = load_inventory_index_from_disk(profile_id)
+
+    if inventory_index_data is None:
+        inventory_index = refresh_inventory_index(
+            profile_id,
+            incremental_refresh=incremental_refresh,
         )
+    else:
+        inventory_index = inventory_index_data["index"]
 
-        if asset_id is not None:
-            result = sell_booster_pack(asset_id=asset_id, price_in_cents=price_in_cents)
+    results = sell_assets_from_inventory_index(
+        inventory_index,
+        price_dict_for_listing_hashes,
+        focus_on_marketable_items=focus_on_marketable_items,
+        num_copies_per_listing_hash=num_copies_per_listing_hash,
+    )
 
-            results[listing_hash] = result
+    # Save the index without the assets which were put on sale, so that they are not matched again. After a failed
+    # sale, the index is saved as expired, so that the next refresh is a full one.
+    inventory_index_data = load_inventory_index_from_disk(profile_id)
+    if inventory_index_data is not None:
+        has_failed_sale = not all(map(is_sale_successful, results.values()))
+        save_inventory_index_to_disk(
+            inventory_index,
+            int(inventory_index_data["last_asset_id"]),
+            profile_id,
+            None
+            if has_failed_sale
+            else inventory_index_data.get("last_full_refresh_timestamp"),
+        )
 
     return results
 
 
+def get_asset_id_of_created_booster_pack(creation_result: dict | None) -> str | None:
+    # The asset ID of the new booster pack is returned by ajaxcreatebooster, as "communityitemid".
+    try:
+        asset_id = creation_result["purchase_result"]["communityitemid"]
+    except (KeyError, TypeError):
+        asset_id = None
+
+    return asset_id
+
+
+def sell_booster_pack_within_rate_limit(
+    asset_id: str,
+    price_in_cents: int,
+    rate_limiter: dict,
+) -> dict | None:
+    wait_for_rate_limiter(rate_limiter, verbose=True)
+
+    return sell_booster_pack(asset_id=asset_id, price_in_cents=price_in_cents)
+
+
+def create_then_sell_booster_packs_in_pipeline(
+    price_dict_for_listing_hashes: dict[str, int],
+    *,
+    update_steam_inventory: bool = True,
+    focus_on_marketable_items: bool = True,
+    profile_id: str | None = None,
+    max_num_workers: int = DEFAULT_MAX_NUM_WORKERS_FOR_SALES,
+) -> tuple[dict[str, dict | None], dict[str, dict | None]]:
+    # Each booster pack is put on sale as soon as it is created, by a pool of threads sharing the budget of sales,
+    # while the next booster packs are being created. The inventory is only refreshed for packs whose asset ID was not
+    # returned at creation, unless update_steam_inventory is False, in which case the index on disk is used.
+
+    cookie = get_cookie_dict()
+    rate_limiter = get_shared_rate_limiter(
+        "market_sell",
+        has_secured_cookie=bool(len(cookie) > 0),
+    )
+
+    creation_results = {}
+    sale_futures: dict[str, Future] = {}
+    listing_hashes_without_asset_id = {}
+
+    with ThreadPoolExecutor(max_workers=max_num_workers) as executor:
+        for listing_hash, price_in_cents in price_dict_for_listing_hashes.items():
+            app_id = convert_listing_hash_to_app_id(listing_hash)
+            creation_result = create_booster_pack(app_id=app_id)
+
+            creation_results[listing_hash] = creation_result
+
+            if creation_result is None:
+                continue
+
+            asset_id = get_asset_id_of_created_booster_pack(creation_result)
+
+            if asset_id is None:
+                listing_hashes_without_asset_id[listing_hash] = price_in_cents
+                continue
+
+            sale_futures[listing_hash] = executor.submit(
+                sell_booster_pack_within_rate_limit,
+                asset_id,
+                price_in_cents,
+                rate_limiter,
+            )
+
+    sale_results = {
+        listing_hash: future.result() for listing_hash, future in sale_futures.items()
+    }
+
+    if listing_hashes_without_asset_id:
+        sale_results |= sell_booster_packs_for_batch(
+            listing_hashes_without_asset_id,
+            update_steam_inventory=update_steam_inventory,
+            focus_on_marketable_items=focus_on_marketable_items,
+            profile_id=profile_id,
+        )
+
+    return creation_results, sale_results
+
+
 def create_then_sell_booster_packs_for_batch(
     price_dict_for_listing_hashes: dict[str, int],
     *,
     update_steam_inventory: bool = True,
     focus_on_marketable_items: bool = True,
     profile_id: str | None = None,
+    use_pipeline: bool = True,
 ) -> tuple[dict[str, dict | None], dict[str, dict | None]]:
-    listing_hashes = list(price_dict_for_listing_hashes.keys())
+    if use_pipeline:
+        creation_results, sale_results = create_then_sell_booster_packs_in_pipeline(
+            price_dict_for_listing_hashes,
+            update_steam_inventory=update_steam_inventory,
+            focus_on_marketable_items=focus_on_marketable_items,
+            profile_id=profile_id,
+        )
+
+    else:
+        listing_hashes = list(price_dict_for_listing_hashes.keys())
 
-    creation_results = create_booster_packs_for_batch(listing_hashes)
+        creation_results = create_booster_packs_for_batch(listing_hashes)
 
-    sale_results = sell_booster_packs_for_batch(
-        price_dict_for_listing_hashes,
-        update_steam_inventory=update_steam_inventory,
-        focus_on_marketable_items=focus_on_marketable_items,
-        profile_id=profile_id,
-    )
+        sale_results = sell_booster_packs_for_batch(
+            price_dict_for_listing_hashes,
+            update_steam_inventory=update_steam_inventory,
+            focus_on_marketable_items=focus_on_marketable_items,
+            profile_id=profile_id,
+        )
 
     update_and_save_next_creation_times(creation_results)
 
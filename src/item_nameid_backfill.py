@@ -0,0 +1,219 @@
+# Objective: backfill missing item name IDs in the background, with the budget of market_listing queries which is left
+# idle by the foreground work, so that downloads of market orders almost never have to wait for a listing page.
+#
+# Listing hashes are backfilled in order of priority:
+# - first, booster packs of games found in booster_game_creator*.txt whose market orders were never downloaded,
+# - then, booster packs of other games found in booster_game_creator*.txt, the highest sell price per gem first, as they
+#   are the most likely to become arbitrage candidates,
+# - finally, every other listing of booster packs.
+#
+# The backfill gives way to the foreground: it only sends a query if the rate limiter allows it right away, without
+# drawing from a few queries reserved for the foreground, and never while a foreground thread waits for a cooldown.
+
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from http import HTTPStatus
+from typing import Final
+
+from src.http_cache import rate_limited_requests
+from src.market_listing import (
+    get_listing_details,
+    load_all_listing_details,
+    save_listing_details,
+)
+from src.market_order import load_market_order_data_from_disk
+from src.market_search import load_all_listings
+from src.market_utils import match_badges_with_listing_hashes
+from src.parsing_utils import parse_badge_creation_details
+from src.personal_info import get_cookie_dict
+from src.rate_limiter import (
+    get_shared_rate_limiter,
+    pause_rate_limiter,
+    try_to_acquire_rate_limiter,
+)
+from src.utils import get_listing_details_output_file_name
+
+NUM_QUERIES_RESERVED_FOR_FOREGROUND: Final[int] = 5
+POLLING_INTERVAL_IN_SECONDS: Final[float] = 1.0
+NUM_ITEMS_BETWEEN_SAVES: Final[int] = 10
+
+
+def compute_sell_price_per_gem(listing: dict, gem_amount: int) -> float:
+    # NB: the gem price is the same for every game, so the ratio is enough to rank games by profitability.
+    return listing["sell_price"] / max(1, gem_amount)
+
+
+def prioritize_listing_hashes_for_backfill(
+    badge_creation_details: dict[str, dict],
+    all_listings: dict[str, dict],
+    listing_details: dict[str, dict],
+    market_order_dict: dict[str, dict],
+) -> list[str]:
+    badge_matches = match_badges_with_listing_hashes(
+        badge_creation_details,
+        all_listings,
+        verbose=False,
+    )
+
+    sell_prices_per_gem = {
+        listing_hash: compute_sell_price_per_gem(
+            all_listings[listing_hash],
+            badge_creation_details[app_id]["gem_value"],
+        )
+        for app_id, listing_hash in badge_matches.items()
+        if listing_hash is not None and listing_hash not in listing_details
+    }
+
+    prioritized_listing_hashes = sorted(
+        sell_prices_per_gem,
+        key=lambda x: (x in market_order_dict, -sell_prices_per_gem[x]),
+    )
+
+    other_listing_hashes = sorted(
+        (
+            listing_hash
+            for listing_hash in all_listings
+            if listing_hash not in listing_details
+            and listing_hash not in sell_prices_per_gem
+        ),
+        key=lambda x: all_listings[x]["sell_price"],
+        reverse=True,
+    )
+
+    return prioritized_listing_hashes + other_listing_hashes
+
+
+def backfill_item_nameids(
+    listing_hashes: list[str],
+    stop_event: threading.Event | None = None,
+    listing_details_output_file_name: str | None = None,
+    num_reserved_queries: int = NUM_QUERIES_RESERVED_FOR_FOREGROUND,
+    *,
+    verbose: bool = False,
+) -> dict[str, dict]:
+    if stop_event is None:
+        stop_event = threading.Event()
+
+    if listing_details_output_file_name is None:
+        listing_details_output_file_name = get_listing_details_output_file_name()
+
+    cookie = get_cookie_dict()
+    rate_limiter = get_shared_rate_limiter(
+        "market_listing",
+        has_secured_cookie=bool(len(cookie) > 0),
+    )
+
+    new_listing_details: dict[str, dict] = {}
+    num_unsaved_items = 0
+
+    def wait_for_idle_budget(rate_limiter: dict) -> bool:
+        # NB: if the backfill is stopped while waiting, the query is cancelled, without drawing on the budget.
+        while not stop_event.is_set():
+            if try_to_acquire_rate_limiter(rate_limiter, num_reserved_queries):
+                return True
+
+            stop_event.wait(POLLING_INTERVAL_IN_SECONDS)
+
+        return False
+
+    with rate_limited_requests(rate_limiter, wait_fn=wait_for_idle_budget):
+        for listing_hash in listing_hashes:
+            if stop_event.is_set():
+                break
+
+            listing_details, status_code = get_listing_details(
+                listing_hash=listing_hash,
+                cookie=cookie,
+            )
+
+            if status_code == HTTPStatus.TOO_MANY_REQUESTS:
+                pause_rate_limiter(rate_limiter)
+
+            if status_code == HTTPStatus.OK:
+                new_listing_details.update(listing_details)
+                num_unsaved_items += 1
+
+                if verbose:
+                    print(f"[backfill] Item name ID found for {listing_hash}.")
+
+            if num_unsaved_items >= NUM_ITEMS_BETWEEN_SAVES:
+                save_listing_details(
+                    new_listing_details,
+                    listing_details_output_file_name,
+                )
+                num_unsaved_items = 0
+
+    if num_unsaved_items > 0:
+        save_listing_details(new_listing_details, listing_details_output_file_name)
+
+    if verbose:
+        print(f"[backfill] {len(new_listing_details)} item name IDs were backfilled.")
+
+    return new_listing_details
+
+
+def get_listing_hashes_to_backfill(
+    listing_details_output_file_name: str | None = None,
+    *,
+    from_javascript: bool = False,
+) -> list[str]:
+    try:
+        listing_details = load_all_listing_details(listing_details_output_file_name)
+    except FileNotFoundError:
+        listing_details = {}
+
+    return prioritize_listing_hashes_for_backfill(
+        parse_badge_creation_details(from_javascript=from_javascript),
+        load_all_listings(),
+        listing_details,
+        load_market_order_data_from_disk(),
+    )
+
+
+@contextmanager
+def background_item_nameid_backfill(
+    listing_details_output_file_name: str | None = None,
+    *,
+    from_javascript: bool = False,
+    verbose: bool = False,
+) -> Iterator[threading.Thread]:
+    # Backfill item name IDs in a background thread, which is stopped when the context is exited.
+    listing_hashes = get_listing_hashes_to_backfill(
+        listing_details_output_file_name,
+        from_javascript=from_javascript,
+    )
+
+    if verbose:
+        print(f"[backfill] {len(listing_hashes)} item name IDs are missing.")
+
+    stop_event = threading.Event()
+    backfill_thread = threading.Thread(
+        target=backfill_item_nameids,
+        args=(listing_hashes, stop_event, listing_details_output_file_name),
+        kwargs={"verbose": verbose},
+        name="item_nameid_backfill",
+        daemon=True,
+    )
+    backfill_thread.start()
+
+    try:
+        yield backfill_thread
+    finally:
+        stop_event.set()
+        backfill_thread.join()
+
+
+def main() -> bool:
+    # Foreground backfill, without any query reserved for other work.
+    backfill_item_nameids(
+        get_listing_hashes_to_backfill(),
+        num_reserved_queries=0,
+        verbose=True,
+    )
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
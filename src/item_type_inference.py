@@ -0,0 +1,285 @@
+# Objective: infer the item type of foil cards offline, so that most listing pages do not have to be fetched.
+#
+# The item type is required to query goo values, and it is otherwise scraped from the listing page of a card, with a
+# budget of 25 pages per 3 minutes. All the cards of an appID share the same goo value, so the item type of ANY card of
+# the appID is suitable. The inference is:
+# - the item type of another card of the same appID, if it is already known, which is certain,
+# - otherwise, the default item type (2), with a confidence score equal to the share of known item types which are
+#   consistent with cards numbered from 2 to N+1, where N is the number of cards per set.
+#
+# Only confident inferences skip the listing page. As of 2024, the default item type is consistent with about 70% of the
+# known item types, which is an upper bound of its accuracy, so it stays below the confidence threshold, and appIDs
+# without any known item type are still resolved with their listing page.
+#
+# Inferred item types are validated afterwards: listing pages are fetched for appIDs whose goo value is 0, unknown, or
+# not one of the goo values observed for their set size, and for a random sample of the other ones.
+#
+# NB: the lexicographical order of card names does not help: for appIDs with several known item types, it agrees with
+#     the order of item types for only 58% of the pairs of cards. Run this module to measure the statistics again.
+
+import random
+from collections import Counter
+from typing import Final
+
+from src.goo_value_predictor import (
+    MIN_NUM_SAMPLES_FOR_RELIABLE_PREDICTION,
+    build_goo_value_model,
+    load_num_cards_per_set,
+)
+from src.json_utils import load_json
+from src.utils import (
+    convert_listing_hash_to_app_id,
+    get_goo_details_file_nam_for_for_foil_cards,
+    get_listing_details_output_file_name_for_foil_cards,
+)
+
+DEFAULT_ITEM_TYPE_NO: Final[int] = 2
+MIN_CONFIDENCE_FOR_INFERRED_ITEM_TYPE: Final[float] = 0.95
+VALIDATION_SAMPLE_RATE: Final[float] = 0.05
+
+
+def group_known_item_types_by_app_id(
+    all_listing_details: dict[str, dict],
+) -> dict[str, dict[str, int]]:
+    known_item_types_by_app_id: dict[str, dict[str, int]] = {}
+
+    for listing_hash, listing_details in all_listing_details.items():
+        item_type = listing_details.get("item_type_no")
+        if item_type is None:
+            continue
+
+        app_id = convert_listing_hash_to_app_id(listing_hash)
+        known_item_types_by_app_id.setdefault(app_id, {})[listing_hash] = item_type
+
+    return known_item_types_by_app_id
+
+
+def estimate_default_item_type_confidence(
+    known_item_types_by_app_id: dict[str, dict[str, int]],
+    num_cards_per_set: dict[str, int],
+) -> float:
+    # NB: this is an upper bound of the probability that the default item type is a card, because a known item type
+    #     within the range of the default numbering does not prove that the numbering starts at the default item type.
+    num_item_types = 0
+    num_consistent_item_types = 0
+
+    for app_id, known_item_types in known_item_types_by_app_id.items():
+        if app_id not in num_cards_per_set:
+            continue
+
+        last_item_type_no = DEFAULT_ITEM_TYPE_NO + num_cards_per_set[app_id] - 1
+
+        for item_type in known_item_types.values():
+            num_item_types += 1
+            num_consistent_item_types += bool(
+                DEFAULT_ITEM_TYPE_NO <= item_type <= last_item_type_no,
+            )
+
+    return num_consistent_item_types / max(1, num_item_types)
+
+
+def infer_item_type_for_app_id(
+    app_id: str,
+    known_item_types_by_app_id: dict[str, dict[str, int]],
+    default_confidence: float,
+) -> dict[str, float | int | str]:
+    known_item_types = known_item_types_by_app_id.get(app_id)
+
+    if known_item_types:
+        item_type = Counter(known_item_types.values()).most_common(1)[0][0]
+
+        return {
+            "item_type": item_type,
+            "confidence": 1.0,
+            "source": "same appID",
+        }
+
+    return {
+        "item_type": DEFAULT_ITEM_TYPE_NO,
+        "confidence": default_confidence,
+        "source": "default",
+    }
+
+
+def infer_item_types(
+    app_ids: list[str] | set[str],
+    all_listing_details: dict[str, dict],
+    num_cards_per_set: dict[str, int] | None = None,
+    min_confidence: float = MIN_CONFIDENCE_FOR_INFERRED_ITEM_TYPE,
+    *,
+    verbose: bool = True,
+) -> dict[str, dict[str, float | int | str]]:
+    # Return the inferred item types which are confident enough, indexed by appID.
+
+    if num_cards_per_set is None:
+        num_cards_per_set = load_num_cards_per_set()
+
+    known_item_types_by_app_id = group_known_item_types_by_app_id(all_listing_details)
+    default_confidence = estimate_default_item_type_confidence(
+        known_item_types_by_app_id,
+        num_cards_per_set,
+    )
+
+    inferred_item_types = {}
+
+    for app_id in app_ids:
+        inference = infer_item_type_for_app_id(
+            app_id,
+            known_item_types_by_app_id,
+            default_confidence,
+        )
+
+        if inference["confidence"] >= min_confidence:
+            inferred_item_types[app_id] = inference
+
+    if verbose:
+        print(
+            f"Item type inference: {len(inferred_item_types)} out of {len(app_ids)} appIDs with a confident item type (default confidence: {default_confidence:.1%}).",
+        )
+
+    return inferred_item_types
+
+
+def is_goo_value_plausible(
+    goo_value: int | None,
+    goo_value_counts: Counter[int] | None,
+) -> bool:
+    # A wrong item type, e.g. an emoticon or a profile background, may lead to a goo value which is not 0.
+    if not goo_value:
+        return False
+
+    if (
+        not goo_value_counts
+        or goo_value_counts.total() < MIN_NUM_SAMPLES_FOR_RELIABLE_PREDICTION
+    ):
+        return True
+
+    return goo_value in goo_value_counts
+
+
+def select_app_ids_to_validate(
+    inferred_app_ids: list[str],
+    all_goo_details: dict[str, int | None],
+    num_cards_per_set: dict[str, int] | None = None,
+    sample_rate: float = VALIDATION_SAMPLE_RATE,
+    *,
+    verbose: bool = True,
+) -> list[str]:
+    # Keep appIDs with an implausible goo value, and a random sample of the other appIDs.
+
+    if num_cards_per_set is None:
+        num_cards_per_set = load_num_cards_per_set()
+
+    # NB: the model is built with the goo values of appIDs whose item type was not inferred.
+    inferred_app_ids_as_a_set = set(inferred_app_ids)
+    model = build_goo_value_model(
+        {
+            app_id: goo_value
+            for app_id, goo_value in all_goo_details.items()
+            if app_id not in inferred_app_ids_as_a_set
+        },
+        num_cards_per_set,
+    )
+
+    app_ids_with_implausible_goo_value = []
+    other_app_ids = []
+
+    for app_id in inferred_app_ids:
+        goo_value_counts = model.get(num_cards_per_set.get(app_id))
+
+        if is_goo_value_plausible(all_goo_details.get(app_id), goo_value_counts):
+            other_app_ids.append(app_id)
+        else:
+            app_ids_with_implausible_goo_value.append(app_id)
+
+    num_samples = round(sample_rate * len(other_app_ids))
+    sampled_app_ids = random.sample(other_app_ids, num_samples)
+
+    if verbose:
+        print(
+            f"Item type inference: {len(app_ids_with_implausible_goo_value)} implausible goo values, and {len(sampled_app_ids)} random samples to validate.",
+        )
+
+    return sorted(app_ids_with_implausible_goo_value + sampled_app_ids, key=int)
+
+
+def compute_name_order_agreement(
+    known_item_types_by_app_id: dict[str, dict[str, int]],
+) -> float:
+    # Share of the pairs of cards of the same appID for which the lexicographical order of listing hashes agrees with
+    # the order of item types.
+    num_pairs = 0
+    num_agreeing_pairs = 0
+
+    for known_item_types in known_item_types_by_app_id.values():
+        sorted_item_types = [
+            known_item_types[listing_hash] for listing_hash in sorted(known_item_types)
+        ]
+
+        for i, item_type in enumerate(sorted_item_types):
+            for other_item_type in sorted_item_types[i + 1 :]:
+                num_pairs += 1
+                num_agreeing_pairs += bool(item_type < other_item_type)
+
+    return num_agreeing_pairs / max(1, num_pairs)
+
+
+def evaluate_item_type_inference(
+    all_listing_details: dict[str, dict],
+    all_goo_details: dict[str, int | None],
+    num_cards_per_set: dict[str, int],
+    *,
+    verbose: bool = True,
+) -> dict[str, float]:
+    known_item_types_by_app_id = group_known_item_types_by_app_id(all_listing_details)
+
+    app_ids_with_unknown_item_type = [
+        app_id for app_id in all_goo_details if app_id not in known_item_types_by_app_id
+    ]
+
+    inferred_item_types = infer_item_types(
+        app_ids_with_unknown_item_type,
+        all_listing_details,
+        num_cards_per_set,
+        verbose=False,
+    )
+
+    evaluation = {
+        "num_app_ids_with_known_item_type": len(known_item_types_by_app_id),
+        "default_confidence": estimate_default_item_type_confidence(
+            known_item_types_by_app_id,
+            num_cards_per_set,
+        ),
+        "coverage": len(inferred_item_types)
+        / max(1, len(app_ids_with_unknown_item_type)),
+        "name_order_agreement": compute_name_order_agreement(
+            known_item_types_by_app_id,
+        ),
+    }
+
+    if verbose:
+        print(
+            f"Item type inference: {evaluation['num_app_ids_with_known_item_type']} appIDs with a known item type ; default confidence: {evaluation['default_confidence']:.1%} ; coverage of the other appIDs: {evaluation['coverage']:.1%} ; name order agreement: {evaluation['name_order_agreement']:.1%}",
+        )
+
+    return evaluation
+
+
+def main() -> bool:
+    all_listing_details = load_json(
+        get_listing_details_output_file_name_for_foil_cards(),
+    )
+    all_goo_details = load_json(get_goo_details_file_nam_for_for_foil_cards())
+    num_cards_per_set = load_num_cards_per_set()
+
+    evaluate_item_type_inference(
+        all_listing_details,
+        all_goo_details,
+        num_cards_per_set,
+    )
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
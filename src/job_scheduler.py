@@ -0,0 +1,86 @@
+# Objective: interleave work queued for different Steam endpoints, so that the cooldown of one endpoint is spent on the
+# queries of another endpoint, instead of sleeping.
+#
+# Each endpoint class (see get_rate_limits()) has its own queue of jobs, processed in order by its own worker thread.
+# Jobs of the same class run one after the other, and draw from the budget of the shared rate limiter in turn, whereas
+# jobs of different classes overlap. A combined crawl thus takes about as long as its slowest endpoint, instead of the
+# sum of all the endpoints.
+#
+# Usage:
+#   with shared_job_scheduler():
+#       future = submit_job("market_search", crawl_listings)
+#       fetch_listing_pages()  # while the search pages are being crawled
+#       future.result()
+#
+# NB: outside of a shared job scheduler, jobs are run immediately, so that standalone scripts behave as before.
+
+import threading
+from collections.abc import Callable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+_scheduler: dict | None = None
+_scheduler_depth = 0
+_scheduler_lock = threading.Lock()
+
+
+def shutdown_job_scheduler(job_scheduler: dict) -> None:
+    # Wait for the jobs which are still queued, e.g. crawls which run in the background.
+    for executor in job_scheduler["executors"].values():
+        executor.shutdown(wait=True)
+
+
+@contextmanager
+def shared_job_scheduler() -> Iterator[dict]:
+    # The scheduler is reentrant: nested schedulers share the queues of the outermost one.
+    global _scheduler, _scheduler_depth  # noqa: PLW0603
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = {"executors": {}}
+        _scheduler_depth += 1
+        job_scheduler = _scheduler
+
+    try:
+        yield job_scheduler
+    finally:
+        with _scheduler_lock:
+            _scheduler_depth -= 1
+            is_outermost = _scheduler_depth == 0
+            if is_outermost:
+                _scheduler = None
+
+        if is_outermost:
+            shutdown_job_scheduler(job_scheduler)
+
+
+def get_executor(job_scheduler: dict, api_type: str) -> ThreadPoolExecutor:
+    # One worker per endpoint class, so that the jobs of this class are processed in order.
+    with _scheduler_lock:
+        if api_type not in job_scheduler["executors"]:
+            job_scheduler["executors"][api_type] = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix=api_type,
+            )
+
+        return job_scheduler["executors"][api_type]
+
+
+def submit_job[T](
+    api_type: str,
+    job_fn: Callable[..., T],
+    /,
+    *args: object,
+    **kwargs: object,
+) -> Future[T]:
+    if _scheduler is None:
+        future: Future[T] = Future()
+
+        try:
+            future.set_result(job_fn(*args, **kwargs))
+        except Exception as e:  # noqa: BLE001
+            future.set_exception(e)
+
+        return future
+
+    return get_executor(_scheduler, api_type).submit(job_fn, *args, **kwargs)
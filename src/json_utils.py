@@ -1,12 +1,19 @@
 import json
 from pathlib import Path
 
+from src.data_context import load_file_with_memo, update_file_memo
 
-def load_json(fname: str) -> dict:
+
+def read_json(fname: str) -> dict:
     with Path(fname).open(encoding="utf8") as f:
         return json.load(f)
 
 
+def load_json(fname: str) -> dict:
+    # NB: within a shared data context, each file is only parsed once, unless it is modified on disk.
+    return load_file_with_memo(fname, read_json)
+
+
 def save_json(
     data: dict,
     fname: str,
@@ -19,3 +26,5 @@ def save_json(
             json.dump(data, f, indent=indent)
         else:
             json.dump(data, f)
+
+    update_file_memo(fname, data)
@@ -3,11 +3,11 @@
 # - the sell price (without the Steam Market fee) is higher than the cost to craft a Booster Pack.
 
 from src.creation_time_utils import load_next_creation_time_data
+from src.listing_index import get_listing_hashes_for_app_id
 from src.market_search import load_all_listings
 from src.parsing_utils import parse_badge_creation_details
 from src.sack_of_gems import get_num_gems_per_sack_of_gems, load_sack_of_gems_price
 from src.transaction_fee import compute_sell_price_without_fee
-from src.utils import convert_listing_hash_to_app_id
 
 
 def get_app_ids_of_interest() -> list[str]:
@@ -28,15 +28,14 @@ def get_sell_prices_without_fee(
     # This is a security: if the price offset is positive (>0), then we know that we can under-cut the lowest sell order
     # and still be able to make a profit if someone agrees to buy from us.
 
-    data = load_all_listings()
+    listing_index = load_all_listings(with_index=True)
 
     sell_prices = {}
 
-    for listing_hash in data:
-        app_id = convert_listing_hash_to_app_id(listing_hash)
-
-        if app_id in app_ids:
-            current_data = data[listing_hash]
+    for app_id in app_ids:
+        # NB: if several listings match an appID, the last one is kept.
+        for listing_hash in get_listing_hashes_for_app_id(listing_index, app_id):
+            current_data = listing_index["listings"][listing_hash]
 
             sell_price_in_cents = current_data["sell_price"]
             sell_price_in_euros = int(sell_price_in_cents) / 100
@@ -0,0 +1,105 @@
+# Objective: index listings by sell price and by appID, so that reports do not sort or re-group every listing again.
+#
+# A listing index is a dictionary with:
+# - "listings": the listings, as returned by load_all_listings(),
+# - "price_index": a list of pairs (sell price, listing hash), sorted by sell price, for range queries,
+# - "app_id_index": a dictionary which maps each appID to its listing hashes, in the order of the listings.
+#
+# Both indexes are updated incrementally when a listing is upserted.
+#
+# NB: within a shared data context, the index is built once per file, then updated when the listings are saved, and its
+# rows are shared by every report, so reports must not alter them. The lists of the appID index are replaced rather than
+# mutated, so that the memoized index is not altered by the upserts of a report.
+
+import bisect
+
+from src.utils import convert_listing_hash_to_app_id
+
+
+def group_listing_hashes_per_app_id(listing_hashes: list[str]) -> dict[str, list[str]]:
+    listing_hashes_per_app_id: dict[str, list[str]] = {}
+
+    for listing_hash in listing_hashes:
+        app_id = convert_listing_hash_to_app_id(listing_hash)
+        listing_hashes_per_app_id.setdefault(app_id, []).append(listing_hash)
+
+    return listing_hashes_per_app_id
+
+
+def build_listing_index(all_listings: dict[str, dict]) -> dict:
+    return {
+        "listings": dict(all_listings),
+        "price_index": sorted(
+            (listing["sell_price"], listing_hash)
+            for listing_hash, listing in all_listings.items()
+        ),
+        "app_id_index": group_listing_hashes_per_app_id(list(all_listings)),
+    }
+
+
+def get_sell_price(price_entry: tuple[int, str]) -> int:
+    return price_entry[0]
+
+
+def upsert_listing(listing_index: dict, listing_hash: str, listing: dict) -> None:
+    listings = listing_index["listings"]
+    price_index = listing_index["price_index"]
+
+    previous_listing = listings.get(listing_hash)
+
+    if previous_listing is None:
+        app_id = convert_listing_hash_to_app_id(listing_hash)
+        app_id_index = listing_index["app_id_index"]
+        app_id_index[app_id] = [*app_id_index.get(app_id, []), listing_hash]
+    else:
+        del price_index[
+            bisect.bisect_left(
+                price_index,
+                (previous_listing["sell_price"], listing_hash),
+            )
+        ]
+
+    bisect.insort(price_index, (listing["sell_price"], listing_hash))
+    listings[listing_hash] = listing
+
+
+def upsert_listings(listing_index: dict, new_listings: dict[str, dict]) -> None:
+    # NB: listings which are unchanged are skipped, so that a crawl which only adds a few listings is cheap to index.
+    listings = listing_index["listings"]
+
+    for listing_hash, listing in new_listings.items():
+        if listings.get(listing_hash) != listing:
+            upsert_listing(listing_index, listing_hash, listing)
+
+
+def get_listing_hashes_in_price_range(
+    listing_index: dict,
+    min_sell_price: int | None = None,  # in cents, included
+    max_sell_price: int | None = None,  # in cents, included
+    *,
+    reverse: bool = False,
+) -> list[str]:
+    # Listing hashes sorted by sell price, the lowest first, unless reversed.
+    price_index = listing_index["price_index"]
+
+    start = (
+        0
+        if min_sell_price is None
+        else bisect.bisect_left(price_index, min_sell_price, key=get_sell_price)
+    )
+    end = (
+        len(price_index)
+        if max_sell_price is None
+        else bisect.bisect_right(price_index, max_sell_price, key=get_sell_price)
+    )
+
+    listing_hashes = [listing_hash for _, listing_hash in price_index[start:end]]
+
+    if reverse:
+        listing_hashes.reverse()
+
+    return listing_hashes
+
+
+def get_listing_hashes_for_app_id(listing_index: dict, app_id: str) -> list[str]:
+    return listing_index["app_id_index"].get(app_id, [])
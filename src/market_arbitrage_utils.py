@@ -6,6 +6,7 @@ from src.creation_time_utils import (
 from src.market_listing import get_steam_market_listing_url
 from src.market_order import load_market_order_data
 from src.market_utils import load_aggregated_badge_data
+from src.telemetry_utils import set_num_items_out, track_stage
 from src.transaction_fee import compute_sell_price_without_fee
 from src.utils import (
     convert_listing_hash_to_app_id,
@@ -383,20 +384,38 @@ def get_filtered_badge_data(
         from_javascript=from_javascript,
     )
 
-    aggregated_badge_data = fill_in_badges_with_next_creation_times_loaded_from_disk(
-        aggregated_badge_data,
-    )
+    with track_stage("fill in next creation times"):
+        aggregated_badge_data = (
+            fill_in_badges_with_next_creation_times_loaded_from_disk(
+                aggregated_badge_data,
+            )
+        )
 
     if check_ask_price:
-        filtered_badge_data = filter_out_badges_with_low_sell_price(
+        with track_stage(
+            "filter out badges with low sell price",
             aggregated_badge_data,
-        )
+        ) as stage:
+            filtered_badge_data = filter_out_badges_with_low_sell_price(
+                aggregated_badge_data,
+            )
+            set_num_items_out(stage, filtered_badge_data)
     else:
         filtered_badge_data = aggregated_badge_data
 
-    filtered_badge_data = filter_out_badges_recently_crafted(filtered_badge_data)
+    with track_stage(
+        "filter out badges recently crafted",
+        filtered_badge_data,
+    ) as stage:
+        filtered_badge_data = filter_out_badges_recently_crafted(filtered_badge_data)
+        set_num_items_out(stage, filtered_badge_data)
 
     if quick_check_with_tracked_booster_packs:
-        filtered_badge_data = filter_out_badges_never_crafted(filtered_badge_data)
+        with track_stage(
+            "filter out badges never crafted",
+            filtered_badge_data,
+        ) as stage:
+            filtered_badge_data = filter_out_badges_never_crafted(filtered_badge_data)
+            set_num_items_out(stage, filtered_badge_data)
 
     return filtered_badge_data
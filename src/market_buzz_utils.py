@@ -1,4 +1,5 @@
 from src.download_steam_card_exchange import parse_data_from_steam_card_exchange
+from src.listing_index import build_listing_index, get_listing_hashes_in_price_range
 from src.market_listing import get_steam_market_listing_url
 from src.market_search import load_all_listings
 from src.sack_of_gems import get_gem_price
@@ -19,28 +20,30 @@ def filter_listings(
     *,
     verbose: bool = True,
 ) -> list[str]:
+    # NB: without listings, the memoized index of the listings on disk is used. Otherwise, the listings which are
+    # provided, e.g. after filtering out dubious listing hashes, are indexed.
     if all_listings is None:
-        all_listings = load_all_listings()
+        listing_index = load_all_listings(with_index=True)
+    else:
+        listing_index = build_listing_index(all_listings)
 
-    # Sort listing hashes with respect to the ask
+    all_listings = listing_index["listings"]
 
-    sorted_listing_hashes = sorted(
-        all_listings,
+    # Listing hashes with a high enough ask, sorted with respect to the ask
+
+    sorted_listing_hashes = get_listing_hashes_in_price_range(
+        listing_index,
+        min_sell_price=min_sell_price,
         reverse=True,
-        key=lambda x: all_listings[x]["sell_price"],
     )
 
     # *Heuristic* filtering of listing hashes
 
-    filtered_listing_hashes = list(
-        filter(
-            lambda x: (
-                all_listings[x]["sell_price"] >= min_sell_price
-                and all_listings[x]["sell_listings"] >= min_num_listings
-            ),
-            sorted_listing_hashes,
-        ),
-    )
+    filtered_listing_hashes = [
+        listing_hash
+        for listing_hash in sorted_listing_hashes
+        if all_listings[listing_hash]["sell_listings"] >= min_num_listings
+    ]
 
     if verbose:
         print(f"{len(filtered_listing_hashes)} hashes found.\n")
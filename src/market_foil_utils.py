@@ -1,5 +1,9 @@
-import requests
+from collections.abc import Iterable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Final
 
+from src.http_cache import cached_get, rate_limited_requests
+from src.item_type_inference import select_app_ids_to_validate
 from src.json_utils import load_json, save_json
 from src.market_gamble_utils import update_all_listings_for_foil_cards
 from src.market_listing import (
@@ -12,7 +16,17 @@ from src.personal_info import (
     get_cookie_dict,
     update_and_save_cookie_to_disk_if_values_changed,
 )
+from src.rate_limiter import (
+    get_shared_rate_limiter,
+    pause_rate_limiter,
+)
+from src.retry_utils import (
+    DEFAULT_MAX_NUM_ATTEMPTS,
+    create_retry_budget,
+    request_with_retries,
+)
 from src.sack_of_gems import get_num_gems_per_sack_of_gems, load_sack_of_gems_price
+from src.telemetry_utils import record_cache_lookup
 from src.utils import (
     TIMEOUT_IN_SECONDS,
     convert_listing_hash_to_app_id,
@@ -23,6 +37,9 @@ from src.utils import (
     get_listing_output_file_name_for_foil_cards,
 )
 
+DEFAULT_MAX_NUM_WORKERS_FOR_GOO_VALUES: Final[int] = 4
+DEFAULT_MAX_NUM_PASSES_FOR_GOO_VALUES: Final[int] = 2
+
 
 def get_steam_goo_value_url() -> str:
     return "https://steamcommunity.com/auction/ajaxgetgoovalueforitemtype/"
@@ -145,6 +162,24 @@ def query_goo_value(
     verbose: bool = True,
 ) -> int | None:
     cookie = get_cookie_dict()
+
+    goo_value, _status_code = request_with_retries(
+        lambda: request_goo_value(app_id, item_type, cookie, verbose=verbose),
+    )
+
+    return goo_value
+
+
+def request_goo_value(
+    app_id: str,
+    item_type: int | None,
+    cookie: dict[str, str],
+    *,
+    verbose: bool = True,
+) -> tuple[int | None, int | None]:
+    # Return the goo value, and the status code, which is None if no response was received.
+    import requests  # noqa: PLC0415
+
     has_secured_cookie = bool(len(cookie) > 0)
 
     url = get_steam_goo_value_url()
@@ -152,24 +187,28 @@ def query_goo_value(
     req_data = get_steam_goo_value_parameters(
         app_id=app_id,
         item_type=item_type,
+        verbose=verbose,
     )
 
-    if has_secured_cookie:
-        resp_data = requests.get(
+    try:
+        resp_data = cached_get(
             url,
             params=req_data,
-            cookies=cookie,
+            cache_policy="goo_value",
+            cookies=cookie if has_secured_cookie else None,
             timeout=TIMEOUT_IN_SECONDS,
         )
-    else:
-        resp_data = requests.get(url, params=req_data, timeout=TIMEOUT_IN_SECONDS)
+    except requests.exceptions.RequestException:
+        if verbose:
+            print(f"[WARNING] No response for the goo value of appID = {app_id}.")
+        return None, None
 
     if resp_data.ok:
         result = resp_data.json()
 
         if has_secured_cookie:
             jar = get_jar(resp_data)
-            cookie = update_and_save_cookie_to_disk_if_values_changed(cookie, jar)
+            update_and_save_cookie_to_disk_if_values_changed(cookie, jar)
 
         goo_value = int(result["goo_value"])
 
@@ -180,43 +219,150 @@ def query_goo_value(
     else:
         goo_value = None
 
+    return goo_value, resp_data.status_code
+
+
+def query_goo_value_with_retries(
+    app_id: str,
+    item_type: int | None,
+    cookie: dict[str, str],
+    rate_limiter: dict,
+    max_num_attempts: int = DEFAULT_MAX_NUM_ATTEMPTS,
+    retry_budget: dict[str, int] | None = None,
+    *,
+    verbose: bool = True,
+) -> int | None:
+    def request_fn() -> tuple[int | None, int | None]:
+        return request_goo_value(app_id, item_type, cookie, verbose=verbose)
+
+    def on_rate_limited() -> None:
+        print(
+            f"You have been rate-limited. Pausing queries of goo values for {rate_limiter['cooldown']} seconds.",
+        )
+        pause_rate_limiter(rate_limiter)
+
+    # NB: cached goo values do not wait for the rate limiter. Failed responses are not cached, so retries always wait.
+    with rate_limited_requests(rate_limiter, verbose=verbose):
+        goo_value, _status_code = request_with_retries(
+            request_fn,
+            max_num_attempts,
+            retry_budget,
+            on_rate_limited=on_rate_limited,
+        )
+
     return goo_value
 
 
+def download_goo_values_concurrently(
+    app_ids_to_process: Iterable[str],
+    item_types: dict[str, int | None],
+    all_goo_details: dict[str, int | None],
+    goo_details_file_name_for_for_foil_cards: str | None = None,
+    num_queries_between_save: int = 100,
+    max_num_workers: int = DEFAULT_MAX_NUM_WORKERS_FOR_GOO_VALUES,
+    max_num_passes: int = DEFAULT_MAX_NUM_PASSES_FOR_GOO_VALUES,
+    *,
+    verbose: bool = True,
+) -> dict[str, int | None]:
+    # Queries run concurrently, within the budget of the rate limiter shared by every query of goo values. Results are
+    # written to all_goo_details and saved to disk by the calling thread only. AppIDs whose goo value is still unknown
+    # at the end of a pass are automatically queued again for the next pass.
+
+    cookie = get_cookie_dict()
+    has_secured_cookie = bool(len(cookie) > 0)
+
+    rate_limiter = get_shared_rate_limiter(
+        "goo_value",
+        has_secured_cookie=has_secured_cookie,
+    )
+
+    app_ids_to_query = list(app_ids_to_process)
+    query_count = 0
+
+    # NB: the retry budget is shared by every pass and every thread.
+    retry_budget = create_retry_budget()
+
+    for pass_no in range(max_num_passes):
+        if not app_ids_to_query:
+            break
+
+        if pass_no > 0:
+            print(
+                f"Pass n°{pass_no + 1}: querying again {len(app_ids_to_query)} unknown goo values.",
+            )
+
+        with ThreadPoolExecutor(max_workers=max_num_workers) as executor:
+            futures = {
+                executor.submit(
+                    query_goo_value_with_retries,
+                    app_id,
+                    item_types.get(app_id),
+                    cookie,
+                    rate_limiter,
+                    retry_budget=retry_budget,
+                    verbose=verbose,
+                ): app_id
+                for app_id in app_ids_to_query
+            }
+
+            for future in as_completed(futures):
+                app_id = futures[future]
+                all_goo_details[app_id] = future.result()
+                query_count += 1
+
+                if query_count % num_queries_between_save == 0:
+                    print(f"Saving after {query_count} queries.")
+                    save_all_goo_details(
+                        all_goo_details,
+                        goo_details_file_name_for_for_foil_cards,
+                    )
+
+        app_ids_to_query = [
+            app_id for app_id in app_ids_to_query if all_goo_details[app_id] is None
+        ]
+
+    # Final save
+
+    if query_count > 0:
+        print(f"Final save after {query_count} queries.")
+        save_all_goo_details(
+            all_goo_details,
+            goo_details_file_name_for_for_foil_cards,
+        )
+
+    return all_goo_details
+
+
 def get_listings_for_foil_cards(
     *,
     retrieve_listings_from_scratch: bool,
     listing_output_file_name: str | None = None,
     start_index: int = 0,
+    with_index: bool = False,
     verbose: bool = True,
-) -> dict[str, dict]:
+) -> dict:
     if retrieve_listings_from_scratch:
         update_all_listings_for_foil_cards(start_index=start_index)
 
     if listing_output_file_name is None:
         listing_output_file_name = get_listing_output_file_name_for_foil_cards()
 
-    all_listings = load_all_listings(listing_output_file_name)
+    all_listings = load_all_listings(listing_output_file_name, with_index=with_index)
 
     if verbose:
-        print(f"#listings = {len(all_listings)}")
+        num_listings = len(all_listings["listings"] if with_index else all_listings)
+        print(f"#listings = {num_listings}")
 
     return all_listings
 
 
 def group_listing_hashes_by_app_id(
-    all_listings: dict[str, dict],
+    listing_index: dict,
     *,
     verbose: bool = True,
 ) -> dict[str, list[str]]:
-    groups_by_app_id: dict[str, list[str]] = {}
-    for listing_hash in all_listings:
-        app_id = convert_listing_hash_to_app_id(listing_hash)
-
-        try:
-            groups_by_app_id[app_id].append(listing_hash)
-        except KeyError:
-            groups_by_app_id[app_id] = [listing_hash]
+    # NB: the groups are read from the appID index, instead of parsing every listing hash again.
+    groups_by_app_id = listing_index["app_id_index"]
 
     if verbose:
         print(f"#app_ids = {len(groups_by_app_id)}")
@@ -370,7 +516,7 @@ def filter_out_listing_hashes_if_goo_details_are_already_known_for_app_id(
         verbose=verbose,
     )
 
-    app_ids_with_previously_downloaded_goo_details = list(
+    app_ids_with_previously_downloaded_goo_details = set(
         previously_downloaded_all_goo_details.keys(),
     )
 
@@ -386,10 +532,10 @@ def propagate_filter_to_representative_listing_hashes(
     listing_hashes_to_propagate_to: list[str],
     listing_hashes_to_propagate_from: list[str],
 ) -> list[str]:
-    filtered_app_ids_based_on_price_threshold = [
+    filtered_app_ids_based_on_price_threshold = {
         convert_listing_hash_to_app_id(listing_hash)
         for listing_hash in listing_hashes_to_propagate_from
-    ]
+    }
 
     return [
         listing_hash
@@ -404,11 +550,12 @@ def try_again_to_download_item_type(
     filtered_representative_listing_hashes: list[str],
     listing_details_output_file_name: str,
 ) -> None:
+    app_ids_to_process = set(app_ids_with_unreliable_goo_details)
+
     listing_hashes_to_process = [
         listing_hash
         for listing_hash in filtered_representative_listing_hashes
-        if convert_listing_hash_to_app_id(listing_hash)
-        in app_ids_with_unreliable_goo_details
+        if convert_listing_hash_to_app_id(listing_hash) in app_ids_to_process
     ]
 
     update_all_listing_details(
@@ -486,8 +633,8 @@ def discard_necessarily_unrewarding_app_ids(
     if app_ids_with_unknown_goo_value is None:
         app_ids_with_unknown_goo_value = []
 
-    app_ids_to_omit = (
-        app_ids_with_unreliable_goo_details + app_ids_with_unknown_goo_value
+    app_ids_to_omit = set(app_ids_with_unreliable_goo_details).union(
+        app_ids_with_unknown_goo_value,
     )
 
     unrewarding_threshold_in_gems = compute_unrewarding_threshold_in_gems(
@@ -541,10 +688,12 @@ def find_listing_hashes_with_unknown_goo_value(
 ) -> list[str]:
     app_ids_with_unknown_goo_value = []
 
+    app_ids_to_skip = set(app_ids_with_unreliable_goo_details)
+
     for listing_hash in listing_candidates:
         app_id = convert_listing_hash_to_app_id(listing_hash)
 
-        if app_id in app_ids_with_unreliable_goo_details:
+        if app_id in app_ids_to_skip:
             continue
 
         goo_value_in_gems = safe_read_from_dict(
@@ -596,6 +745,9 @@ def determine_whether_an_arbitrage_might_exist_for_foil_cards(
     if app_ids_with_unknown_goo_value is None:
         app_ids_with_unknown_goo_value = []
 
+    app_ids_to_skip_because_unreliable = set(app_ids_with_unreliable_goo_details)
+    app_ids_to_skip_because_unknown = set(app_ids_with_unknown_goo_value)
+
     num_gems_per_sack_of_gems = get_num_gems_per_sack_of_gems()
 
     sack_of_gems_price_in_cents = 100 * sack_of_gems_price_in_euros
@@ -605,7 +757,7 @@ def determine_whether_an_arbitrage_might_exist_for_foil_cards(
     for listing_hash in eligible_listing_hashes:
         app_id = convert_listing_hash_to_app_id(listing_hash)
 
-        if app_id in app_ids_with_unreliable_goo_details:
+        if app_id in app_ids_to_skip_because_unreliable:
             # NB: This is for goo details which were retrieved with the default item type n° (=2), which can be wrong.
             if verbose:
                 print(f"[X]\tUnreliable goo details for {listing_hash}")
@@ -616,7 +768,7 @@ def determine_whether_an_arbitrage_might_exist_for_foil_cards(
             input_key=app_id,
         )
 
-        if app_id in app_ids_with_unknown_goo_value or goo_value_in_gems is None:
+        if app_id in app_ids_to_skip_because_unknown or goo_value_in_gems is None:
             # NB: This is when the goo value is unknown, despite a correct item type n° used to download goo details.
             if verbose:
                 print(f"[?]\tUnknown goo value for {listing_hash}")
@@ -706,29 +858,22 @@ def find_app_ids_with_unknown_item_type_for_their_representatives(
     listing_candidates: list[str],
     all_listing_details: dict[str, dict] | None = None,
     listing_details_output_file_name: str | None = None,
+    dictionary_of_representative_listing_hashes: dict[str, list[str]] | None = None,
     *,
     verbose: bool = True,
 ) -> list[str]:
-    dictionary_of_representative_listing_hashes = (
-        build_dictionary_of_representative_listing_hashes(
-            all_listing_details,
-            listing_details_output_file_name,
-        )
+    item_types = build_item_type_index(
+        groups_by_app_id,
+        groups_by_app_id=groups_by_app_id,
+        listing_candidates=listing_candidates,
+        all_listing_details=all_listing_details,
+        listing_details_output_file_name=listing_details_output_file_name,
+        dictionary_of_representative_listing_hashes=dictionary_of_representative_listing_hashes,
     )
 
-    app_ids_with_unreliable_goo_details = []
-
-    for app_id in groups_by_app_id:
-        item_type = find_item_type_for_app_id(
-            app_id,
-            groups_by_app_id=groups_by_app_id,
-            listing_candidates=listing_candidates,
-            all_listing_details=all_listing_details,
-            listing_details_output_file_name=listing_details_output_file_name,
-            dictionary_of_representative_listing_hashes=dictionary_of_representative_listing_hashes,
-        )
-        if item_type is None:
-            app_ids_with_unreliable_goo_details.append(app_id)
+    app_ids_with_unreliable_goo_details = [
+        app_id for app_id, item_type in item_types.items() if item_type is None
+    ]
 
     if verbose:
         print(
@@ -746,6 +891,10 @@ def download_missing_goo_details(
     goo_details_file_name_for_for_foil_cards: str | None = None,
     enforced_app_ids_to_process: list[str] | None = None,
     num_queries_between_save: int = 100,
+    dictionary_of_representative_listing_hashes: dict[str, list[str]] | None = None,
+    app_ids_to_skip: list[str] | None = None,
+    max_num_workers: int = DEFAULT_MAX_NUM_WORKERS_FOR_GOO_VALUES,
+    inferred_item_types: dict[str, dict] | None = None,
     *,
     verbose: bool = True,
 ) -> dict[str, int | None]:
@@ -757,22 +906,17 @@ def download_missing_goo_details(
     if enforced_app_ids_to_process is None:
         enforced_app_ids_to_process = []
 
-    dictionary_of_representative_listing_hashes = (
-        build_dictionary_of_representative_listing_hashes(
-            all_listing_details,
-            listing_details_output_file_name,
-        )
-    )
-
     all_goo_details: dict[str, int | None] = load_all_goo_details(
         goo_details_file_name_for_for_foil_cards,
         verbose=verbose,
     )
 
     all_app_ids = set(groups_by_app_id)
-    app_ids_with_unknown_goo_details = all_app_ids.difference(
-        all_goo_details,
-    )
+
+    # NB: unknown goo values (None) are queried again, instead of being skipped forever.
+    app_ids_with_unknown_goo_details = {
+        app_id for app_id in all_app_ids if all_goo_details.get(app_id) is None
+    }
 
     eligible_enforced_app_ids_to_process = all_app_ids.intersection(
         enforced_app_ids_to_process,
@@ -782,36 +926,117 @@ def download_missing_goo_details(
         eligible_enforced_app_ids_to_process,
     )
 
-    query_count = 0
+    if app_ids_to_skip is not None:
+        # e.g. appIDs which cannot be profitable according to the goo value predictor
+        app_ids_to_process = app_ids_to_process.difference(app_ids_to_skip)
 
-    for app_id in app_ids_to_process:
-        goo_value = download_goo_value_for_app_id(
-            app_id=app_id,
-            groups_by_app_id=groups_by_app_id,
-            listing_candidates=listing_candidates,
-            all_listing_details=all_listing_details,
+    for app_id in all_app_ids:
+        record_cache_lookup("goo details", is_hit=app_id not in app_ids_to_process)
+
+    item_types = build_item_type_index(
+        app_ids_to_process,
+        groups_by_app_id=groups_by_app_id,
+        listing_candidates=listing_candidates,
+        all_listing_details=all_listing_details,
+        listing_details_output_file_name=listing_details_output_file_name,
+        dictionary_of_representative_listing_hashes=dictionary_of_representative_listing_hashes,
+    )
+
+    # Fall back on inferred item types, instead of fetching the listing pages of representatives.
+    inferred_app_ids = []
+
+    if inferred_item_types is not None:
+        for app_id, item_type in item_types.items():
+            if item_type is None and app_id in inferred_item_types:
+                item_types[app_id] = inferred_item_types[app_id]["item_type"]
+                inferred_app_ids.append(app_id)
+
+    all_goo_details = download_goo_values_concurrently(
+        app_ids_to_process,
+        item_types,
+        all_goo_details,
+        goo_details_file_name_for_for_foil_cards,
+        num_queries_between_save=num_queries_between_save,
+        max_num_workers=max_num_workers,
+        verbose=verbose,
+    )
+
+    if len(inferred_app_ids) > 0:
+        app_ids_to_validate = select_app_ids_to_validate(
+            inferred_app_ids,
+            all_goo_details,
+            verbose=verbose,
+        )
+
+        all_goo_details = validate_inferred_item_types(
+            app_ids_to_validate,
+            groups_by_app_id,
+            all_goo_details,
+            goo_details_file_name_for_for_foil_cards,
             listing_details_output_file_name=listing_details_output_file_name,
-            dictionary_of_representative_listing_hashes=dictionary_of_representative_listing_hashes,
+            max_num_workers=max_num_workers,
             verbose=verbose,
         )
-        query_count += 1
 
-        all_goo_details[app_id] = goo_value
+    return all_goo_details
 
-        if query_count % num_queries_between_save == 0:
-            print(f"Saving after {query_count} queries.")
-            save_all_goo_details(
-                all_goo_details,
-                goo_details_file_name_for_for_foil_cards,
-            )
 
-    # Final save
+def validate_inferred_item_types(
+    app_ids_to_validate: list[str],
+    groups_by_app_id: dict[str, list[str]],
+    all_goo_details: dict[str, int | None],
+    goo_details_file_name: str,
+    listing_details_output_file_name: str | None = None,
+    max_num_workers: int = DEFAULT_MAX_NUM_WORKERS_FOR_GOO_VALUES,
+    *,
+    verbose: bool = True,
+) -> dict[str, int | None]:
+    # Fetch the listing page of one card per appID, then query the goo value again with the scraped item type.
+    # NB: the scraped item type may differ from the inferred one, and still be right, if it belongs to another card.
 
-    if query_count > 0:
-        print(f"Final save after {query_count} queries.")
-        save_all_goo_details(
-            all_goo_details,
-            goo_details_file_name_for_for_foil_cards,
+    if listing_details_output_file_name is None:
+        listing_details_output_file_name = (
+            get_listing_details_output_file_name_for_foil_cards()
+        )
+
+    listing_hashes_to_fetch = {
+        app_id: min(groups_by_app_id[app_id]) for app_id in app_ids_to_validate
+    }
+
+    updated_all_listing_details = update_all_listing_details(
+        listing_hashes=list(listing_hashes_to_fetch.values()),
+        listing_details_output_file_name=listing_details_output_file_name,
+    )
+
+    scraped_item_types = {}
+
+    for app_id, listing_hash in listing_hashes_to_fetch.items():
+        item_type = updated_all_listing_details.get(listing_hash, {}).get(
+            "item_type_no",
+        )
+        if item_type is not None:
+            scraped_item_types[app_id] = item_type
+
+    inferred_goo_values = {
+        app_id: all_goo_details.get(app_id) for app_id in scraped_item_types
+    }
+
+    all_goo_details = download_goo_values_concurrently(
+        list(scraped_item_types),
+        scraped_item_types,
+        all_goo_details,
+        goo_details_file_name,
+        max_num_workers=max_num_workers,
+        verbose=verbose,
+    )
+
+    if verbose:
+        num_confirmed_goo_values = sum(
+            bool(all_goo_details.get(app_id) == goo_value)
+            for app_id, goo_value in inferred_goo_values.items()
+        )
+        print(
+            f"Item type inference: {num_confirmed_goo_values} out of {len(inferred_goo_values)} goo values confirmed with scraped item types.",
         )
 
     return all_goo_details
@@ -820,7 +1045,7 @@ def download_missing_goo_details(
 def find_representative_listing_hash_for_app_id(
     app_id: str,
     groups_by_app_id: dict[str, list[str]],
-    listing_candidates: list[str] | None = None,
+    listing_candidates: list[str] | set[str] | None = None,
     dictionary_of_representative_listing_hashes: dict[str, list[str]] | None = None,
 ) -> str:
     if listing_candidates is None:
@@ -840,10 +1065,16 @@ def find_representative_listing_hash_for_app_id(
     else:
         previously_used_listing_hashes_for_app_id = None
 
+    # NB: in a loop over appIDs, provide listing candidates as a set, so that the cost is linear in the group size.
+    if not isinstance(listing_candidates, set):
+        listing_candidates = set(listing_candidates)
+
     listing_hashes_for_app_id = groups_by_app_id[app_id]
-    representative_listing_hash_for_app_id_as_a_set = set(
-        listing_hashes_for_app_id,
-    ).intersection(listing_candidates)
+    representative_listing_hash_for_app_id_as_a_set = {
+        listing_hash
+        for listing_hash in listing_hashes_for_app_id
+        if listing_hash in listing_candidates
+    }
 
     if (
         previously_used_listing_hashes_for_app_id is not None
@@ -870,7 +1101,7 @@ def find_representative_listing_hash_for_app_id(
 def find_item_type_for_app_id(
     app_id: str,
     groups_by_app_id: dict[str, list[str]],
-    listing_candidates: list[str],
+    listing_candidates: list[str] | set[str],
     all_listing_details: dict[str, dict] | None = None,
     listing_details_output_file_name: str | None = None,
     dictionary_of_representative_listing_hashes: dict[str, list[str]] | None = None,
@@ -908,10 +1139,51 @@ def find_item_type_for_app_id(
     return listing_details["item_type_no"]
 
 
+def build_item_type_index(
+    app_ids: Iterable[str],
+    groups_by_app_id: dict[str, list[str]],
+    listing_candidates: list[str],
+    all_listing_details: dict[str, dict] | None = None,
+    listing_details_output_file_name: str | None = None,
+    dictionary_of_representative_listing_hashes: dict[str, list[str]] | None = None,
+) -> dict[str, int | None]:
+    # Resolve the item type of every appID in a single pass: listing details are loaded, and the set of listing
+    # candidates and the dictionary of representative listing hashes are built, only once for all the appIDs.
+
+    if listing_details_output_file_name is None:
+        listing_details_output_file_name = (
+            get_listing_details_output_file_name_for_foil_cards()
+        )
+
+    if all_listing_details is None:
+        all_listing_details = load_all_listing_details(
+            listing_details_output_file_name=listing_details_output_file_name,
+        )
+
+    if dictionary_of_representative_listing_hashes is None:
+        dictionary_of_representative_listing_hashes = (
+            build_dictionary_of_representative_listing_hashes(all_listing_details)
+        )
+
+    listing_candidates_as_a_set = set(listing_candidates)
+
+    return {
+        app_id: find_item_type_for_app_id(
+            app_id,
+            groups_by_app_id=groups_by_app_id,
+            listing_candidates=listing_candidates_as_a_set,
+            all_listing_details=all_listing_details,
+            listing_details_output_file_name=listing_details_output_file_name,
+            dictionary_of_representative_listing_hashes=dictionary_of_representative_listing_hashes,
+        )
+        for app_id in app_ids
+    }
+
+
 def download_goo_value_for_app_id(
     app_id: str,
     groups_by_app_id: dict[str, list[str]],
-    listing_candidates: list[str],
+    listing_candidates: list[str] | set[str],
     all_listing_details: dict[str, dict] | None = None,
     listing_details_output_file_name: str | None = None,
     dictionary_of_representative_listing_hashes: dict[str, list[str]] | None = None,
@@ -1,12 +1,13 @@
-import time
+from concurrent.futures import Future
 
-from src.api_utils import get_rate_limits
 from src.drop_rate_estimates import (
     clamp_proportion,
+    get_drop_rate_estimates,
     get_drop_rate_estimates_based_on_item_rarity_pattern,
     get_drop_rate_field,
     get_rarity_fields,
 )
+from src.job_scheduler import submit_job
 from src.market_arbitrage_utils import filter_out_badges_with_low_sell_price
 from src.market_order import (
     download_market_order_data_batch,
@@ -19,7 +20,6 @@ from src.market_search import (
     load_all_listings,
     update_all_listings,
 )
-from src.personal_info import get_cookie_dict
 from src.sack_of_gems import get_gem_amount_required_to_craft_badge, get_gem_price
 from src.utils import (
     convert_listing_hash_to_app_id,
@@ -84,48 +84,47 @@ def update_all_listings_for_emoticons(
 def update_all_listings_for_items_other_than_cards(
     tag_drop_rate_str: str | None = None,
     rarity: str | None = None,
-) -> None:
-    # Profile Backgrounds
-
-    update_all_listings_for_profile_backgrounds(
-        tag_drop_rate_str=tag_drop_rate_str,
-        rarity=rarity,
-    )
-
-    # Forced cooldown
-
-    cookie = get_cookie_dict()
-    has_secured_cookie = bool(len(cookie) > 0)
-
-    rate_limits = get_rate_limits(
-        "market_search",
-        has_secured_cookie=has_secured_cookie,
-    )
-
-    cooldown_duration = rate_limits["cooldown"]
-    print(
-        f"Forced cooldown between profile backgrounds and emoticons. Cooldown: {cooldown_duration} seconds",
-    )
-    time.sleep(cooldown_duration)
-
-    # Emoticons
-
-    update_all_listings_for_emoticons(
-        tag_drop_rate_str=tag_drop_rate_str,
-        rarity=rarity,
-    )
+) -> dict[str, Future[None]]:
+    # Queue the crawls of profile backgrounds and of emoticons, and return them per listing output file name.
+    #
+    # NB: both crawls draw from the budget of the shared rate limiter, so there is no need for a forced cooldown between
+    # them. Within a shared job scheduler, they run in the background, so that the caller may wait for one crawl only.
+    return {
+        get_listing_output_file_name_for_profile_backgrounds(
+            tag_drop_rate_str=tag_drop_rate_str,
+            rarity=rarity,
+        ): submit_job(
+            "market_search",
+            update_all_listings_for_profile_backgrounds,
+            tag_drop_rate_str=tag_drop_rate_str,
+            rarity=rarity,
+        ),
+        get_listing_output_file_name_for_emoticons(
+            tag_drop_rate_str=tag_drop_rate_str,
+            rarity=rarity,
+        ): submit_job(
+            "market_search",
+            update_all_listings_for_emoticons,
+            tag_drop_rate_str=tag_drop_rate_str,
+            rarity=rarity,
+        ),
+    }
 
 
 def get_listings(
     listing_output_file_name: str,
     *,
     retrieve_listings_from_scratch: bool = False,
-) -> dict[str, dict]:
+    with_index: bool = False,
+) -> dict:
     if retrieve_listings_from_scratch:
         # Caveat: this update is only for items of Common rarity!
-        update_all_listings_for_items_other_than_cards(rarity="common")
+        crawls = update_all_listings_for_items_other_than_cards(rarity="common")
+
+        # NB: the crawl of the other category may still be running in the background.
+        crawls[listing_output_file_name].result()
 
-    return load_all_listings(listing_output_file_name)
+    return load_all_listings(listing_output_file_name, with_index=with_index)
 
 
 def filter_out_candidates_whose_ask_price_is_below_threshold(
@@ -141,6 +140,20 @@ def filter_out_candidates_whose_ask_price_is_below_threshold(
     if gem_price_in_euros is None:
         gem_price_in_euros = get_gem_price()
 
+    drop_rate_field = get_drop_rate_field()
+    rarity_field = "common"
+
+    if (
+        category_name is not None
+        and category_name != get_category_name_for_booster_packs()
+    ):
+        # Drop-rate for item rarity patterns which have never been observed.
+        default_drop_rate_for_common_rarity = get_drop_rate_estimates(verbose=False)[
+            category_name
+        ][drop_rate_field][rarity_field]
+    else:
+        default_drop_rate_for_common_rarity = 1  # Here, 1 would represent 100% chance to receive an item of common rarity.
+
     if drop_rate_estimates_for_common_rarity is None:
         if (
             category_name is not None
@@ -149,8 +162,6 @@ def filter_out_candidates_whose_ask_price_is_below_threshold(
             drop_rate_estimates = get_drop_rate_estimates_based_on_item_rarity_pattern(
                 verbose=verbose,
             )
-            drop_rate_field = get_drop_rate_field()
-            rarity_field = "common"
             drop_rate_estimates_for_common_rarity = drop_rate_estimates[
                 drop_rate_field
             ][rarity_field]
@@ -184,7 +195,7 @@ def filter_out_candidates_whose_ask_price_is_below_threshold(
                 item_rarity_pattern_as_tuple
             ]
         except KeyError:
-            drop_rate_for_common_rarity = 1  # Here, 1 would represent 100% chance to receive an item of common rarity.
+            drop_rate_for_common_rarity = default_drop_rate_for_common_rarity
 
         drop_rate_for_common_rarity = clamp_proportion(drop_rate_for_common_rarity)
 
@@ -277,63 +288,78 @@ def get_market_orders(
     return market_order_dict
 
 
-def count_listing_hashes_per_app_id(all_listings: dict[str, dict]) -> dict[str, int]:
+def count_listing_hashes_per_app_id(listing_index: dict) -> dict[str, int]:
     # For each appID, count the number of known listing hashes.
     #
     # Caveat: this piece of information relies on the downloaded listings, it is NOT NECESSARILY accurate!
     #         Errors can happen, so manually double-check any information before using it for critical usage!
     #
-    # If 'all_listings' is constrained to items of 'Common' rarity, then this is the number of **different** items of
+    # If the listing index is constrained to items of 'Common' rarity, then this is the number of **different** items of
     # such rarity. This information is useful to know whether a gamble is worth a try: the more items of Common rarity,
     # the harder it is to receive the item which you are specifically after, by crafting a badge.
 
-    listing_hashes_per_app_id: dict[str, int] = {}
-
-    for listing_hash in all_listings:
-        app_id = convert_listing_hash_to_app_id(listing_hash)
-        try:
-            listing_hashes_per_app_id[app_id] += 1
-        except KeyError:
-            listing_hashes_per_app_id[app_id] = 1
-
-    return listing_hashes_per_app_id
+    return {
+        app_id: len(listing_hashes)
+        for app_id, listing_hashes in listing_index["app_id_index"].items()
+    }
 
 
-def get_listings_with_other_rarity_tags(
+def get_listing_indexes_with_other_rarity_tags(
     *,
     look_for_profile_backgrounds: bool,
     retrieve_listings_with_another_rarity_tag_from_scratch: bool = False,
-) -> tuple[dict[str, dict], dict[str, dict]]:
+) -> tuple[dict, dict]:
     if retrieve_listings_with_another_rarity_tag_from_scratch:
         other_rarity_fields = set(get_rarity_fields()).difference({"common"})
+        crawls = {}
+        for rarity_tag in other_rarity_fields:
+            crawls.update(
+                update_all_listings_for_items_other_than_cards(rarity=rarity_tag),
+            )
+
+        # NB: only wait for the crawls of the category of interest.
         for rarity_tag in other_rarity_fields:
-            update_all_listings_for_items_other_than_cards(rarity=rarity_tag)
+            if look_for_profile_backgrounds:
+                listing_output_file_name = (
+                    get_listing_output_file_name_for_profile_backgrounds(
+                        rarity=rarity_tag,
+                    )
+                )
+            else:
+                listing_output_file_name = get_listing_output_file_name_for_emoticons(
+                    rarity=rarity_tag,
+                )
+            crawls[listing_output_file_name].result()
 
     if look_for_profile_backgrounds:
-        all_listings_for_uncommon = load_all_listings(
+        listing_index_for_uncommon = load_all_listings(
             listing_output_file_name=get_listing_output_file_name_for_profile_backgrounds(
                 rarity="uncommon",
             ),
+            with_index=True,
         )
-        all_listings_for_rare = load_all_listings(
+        listing_index_for_rare = load_all_listings(
             listing_output_file_name=get_listing_output_file_name_for_profile_backgrounds(
                 rarity="rare",
             ),
+            with_index=True,
         )
 
     else:
-        all_listings_for_uncommon = load_all_listings(
+        listing_index_for_uncommon = load_all_listings(
             listing_output_file_name=get_listing_output_file_name_for_emoticons(
                 rarity="uncommon",
             ),
+            with_index=True,
         )
-        all_listings_for_rare = load_all_listings(
+        listing_index_for_rare = load_all_listings(
             listing_output_file_name=get_listing_output_file_name_for_emoticons(
                 rarity="rare",
             ),
+            with_index=True,
         )
 
-    return all_listings_for_uncommon, all_listings_for_rare
+    return listing_index_for_uncommon, listing_index_for_rare
 
 
 def enumerate_item_rarity_patterns(
@@ -1,24 +1,36 @@
 # Objective: retrieve i) the item name id of a listing, and ii) whether a *crafted* item would really be marketable.
 import ast
-import time
+import threading
+from collections.abc import Callable
 from http import HTTPStatus
 
-import requests
-from bs4 import BeautifulSoup
-
-from src.api_utils import get_rate_limits
+from src.http_cache import cached_get, rate_limited_requests
 from src.json_utils import load_json, save_json
 from src.market_search import load_all_listings
 from src.personal_info import (
     get_cookie_dict,
     update_and_save_cookie_to_disk_if_values_changed,
 )
+from src.rate_limiter import (
+    get_shared_rate_limiter,
+    is_rate_limiter_exhausted,
+    pause_rate_limiter,
+    wait_for_rate_limiter,
+)
+from src.retry_utils import (
+    create_retry_budget,
+    is_retryable_status_code,
+    process_retry_queue,
+)
+from src.telemetry_utils import record_cache_lookup
 from src.utils import (
     LISTING_TIMEOUT_IN_SECONDS,
     get_jar,
     get_listing_details_output_file_name,
 )
 
+_listing_details_lock = threading.Lock()
+
 
 def get_steam_market_listing_url(
     app_id: str | None = None,
@@ -231,6 +243,8 @@ def parse_item_name_id_from_script(last_script: str) -> int | None:
 
 
 def parse_item_name_id(html_doc: str) -> tuple[int | None, bool | None, int | None]:
+    from bs4 import BeautifulSoup  # noqa: PLC0415
+
     soup = BeautifulSoup(html_doc, "html.parser")
 
     last_script = str(soup.find_all("script")[-1])
@@ -249,7 +263,12 @@ def get_listing_details(
     cookie: dict[str, str] | None = None,
     *,
     render_as_json: bool = False,
-) -> tuple[dict[str, dict], int]:
+    use_cache: bool = True,
+) -> tuple[dict[str, dict], int | None]:
+    # NB: the status code is None if no response was received. Listing pages are cached forever, so use_cache is set to
+    # False to refresh the marketability status.
+    from requests.exceptions import RequestException  # noqa: PLC0415
+
     listing_details: dict[str, dict] = {}
 
     url = get_steam_market_listing_url(
@@ -263,19 +282,18 @@ def get_listing_details(
 
     has_secured_cookie = bool(len(cookie) > 0)
 
-    if has_secured_cookie:
-        resp_data = requests.get(
-            url,
-            params=req_data,
-            cookies=cookie,
-            timeout=LISTING_TIMEOUT_IN_SECONDS,
-        )
-    else:
-        resp_data = requests.get(
+    try:
+        resp_data = cached_get(
             url,
             params=req_data,
+            cache_policy="market_listing",
+            cookies=cookie if has_secured_cookie else None,
             timeout=LISTING_TIMEOUT_IN_SECONDS,
+            use_cache=use_cache,
         )
+    except RequestException:
+        print(f"[WARNING] No response for the listing of {listing_hash}.")
+        return listing_details, None
 
     if resp_data.ok:
         html_doc = resp_data.text
@@ -305,20 +323,46 @@ def get_listing_details(
     return listing_details, status_code
 
 
+def save_listing_details(
+    listing_details: dict[str, dict],
+    listing_details_output_file_name: str | None = None,
+) -> dict[str, dict]:
+    # Merge with the listing details on disk, under a lock, so that a foreground batch and the background backfill of
+    # item name IDs do not erase the data of each other.
+    if listing_details_output_file_name is None:
+        listing_details_output_file_name = get_listing_details_output_file_name()
+
+    with _listing_details_lock:
+        try:
+            all_listing_details = load_json(listing_details_output_file_name)
+        except FileNotFoundError:
+            all_listing_details = {}
+
+        all_listing_details.update(listing_details)
+        save_json(all_listing_details, listing_details_output_file_name)
+
+    return all_listing_details
+
+
 def get_listing_details_batch(
     listing_hashes: list[str] | dict[str, dict],
     all_listing_details: dict[str, dict] | None = None,
     *,
     save_to_disk: bool = True,
     listing_details_output_file_name: str | None = None,
+    on_listing_details: Callable[[str, dict], None] | None = None,
+    use_cache: bool = True,
 ) -> dict[str, dict]:
+    # The callback is called with each listing hash and its details as soon as they are downloaded, e.g. to hand item
+    # name IDs over to the next stage of a pipeline.
+
     if listing_details_output_file_name is None:
         listing_details_output_file_name = get_listing_details_output_file_name()
 
     cookie = get_cookie_dict()
     has_secured_cookie = bool(len(cookie) > 0)
 
-    rate_limits = get_rate_limits(
+    rate_limiter = get_shared_rate_limiter(
         "market_listing",
         has_secured_cookie=has_secured_cookie,
     )
@@ -329,39 +373,76 @@ def get_listing_details_batch(
     num_listings = len(listing_hashes)
 
     query_count = 0
+    retry_queue: list[str] = []
+
+    def wait_for_listing_page(rate_limiter: dict) -> bool:
+        nonlocal query_count
+
+        if save_to_disk and is_rate_limiter_exhausted(rate_limiter):
+            save_listing_details(
+                all_listing_details,
+                listing_details_output_file_name,
+            )
 
-    for count, listing_hash in enumerate(listing_hashes):
-        if (count + 1) % 100 == 0:
-            print(f"[{count + 1}/{num_listings}]")
+        wait_for_rate_limiter(rate_limiter, verbose=True)
+        query_count += 1
+
+        return True
 
+    def retry_listing_details(listing_hash: str) -> bool:
         listing_details, status_code = get_listing_details(
             listing_hash=listing_hash,
             cookie=cookie,
+            use_cache=use_cache,
         )
-
-        query_count += 1
+        all_listing_details.update(listing_details)
 
         if status_code != HTTPStatus.OK:
-            print(
-                f"Wrong status code ({status_code}) for {listing_hash} after {query_count} queries.",
-            )
-            break
+            return False
+
+        if on_listing_details is not None and listing_hash in listing_details:
+            on_listing_details(listing_hash, listing_details[listing_hash])
 
-        if query_count >= rate_limits["max_num_queries"]:
-            if save_to_disk:
-                save_json(all_listing_details, listing_details_output_file_name)
+        return True
 
-            cooldown_duration = rate_limits["cooldown"]
-            print(
-                f"Number of queries {query_count} reached. Cooldown: {cooldown_duration} seconds",
+    # NB: cached listing pages do not wait for the rate limiter, and do not count as queries.
+    with rate_limited_requests(rate_limiter, wait_fn=wait_for_listing_page):
+        for count, listing_hash in enumerate(listing_hashes):
+            if (count + 1) % 100 == 0:
+                print(f"[{count + 1}/{num_listings}]")
+
+            listing_details, status_code = get_listing_details(
+                listing_hash=listing_hash,
+                cookie=cookie,
+                use_cache=use_cache,
             )
-            time.sleep(cooldown_duration)
-            query_count = 0
 
-        all_listing_details.update(listing_details)
+            if status_code != HTTPStatus.OK:
+                print(
+                    f"Wrong status code ({status_code}) for {listing_hash} after {query_count} queries.",
+                )
+
+                # NB: a failed item does not abort the batch. It is retried at the end of the batch if the failure is
+                # transient, and skipped otherwise.
+                if is_retryable_status_code(status_code):
+                    retry_queue.append(listing_hash)
+
+                if status_code == HTTPStatus.TOO_MANY_REQUESTS:
+                    pause_rate_limiter(rate_limiter)
+
+            elif on_listing_details is not None and listing_hash in listing_details:
+                on_listing_details(listing_hash, listing_details[listing_hash])
+
+            all_listing_details.update(listing_details)
+
+        process_retry_queue(
+            retry_queue,
+            retry_listing_details,
+            retry_budget=create_retry_budget(),
+        )
 
     if save_to_disk:
-        save_json(all_listing_details, listing_details_output_file_name)
+        save_listing_details(all_listing_details, listing_details_output_file_name)
 
     return all_listing_details
 
@@ -369,6 +450,9 @@ def get_listing_details_batch(
 def update_all_listing_details(
     listing_hashes: list[str] | dict[str, dict] | None = None,
     listing_details_output_file_name: str | None = None,
+    on_listing_details: Callable[[str, dict], None] | None = None,
+    *,
+    use_cache: bool = True,
 ) -> dict[str, dict]:
     # Caveat: this is mostly useful if download_all_listing_details() failed in the middle of the process, and you want
     # to restart the process without risking losing anything, in case the process fails again.
@@ -392,6 +476,8 @@ def update_all_listing_details(
         all_listing_details,
         save_to_disk=True,
         listing_details_output_file_name=listing_details_output_file_name,
+        on_listing_details=on_listing_details,
+        use_cache=use_cache,
     )
 
 
@@ -432,11 +518,29 @@ def get_item_nameid(
     return item_nameid
 
 
+def is_item_nameid_known(listing_details: dict[str, dict], listing_hash: str) -> bool:
+    return (
+        "item_nameid" in listing_details.get(listing_hash, {})
+        and "is_marketable" in listing_details[listing_hash]
+    )
+
+
+def get_item_nameid_data(listing_details: dict) -> dict:
+    return {
+        "item_nameid": listing_details["item_nameid"],
+        "is_marketable": listing_details["is_marketable"],
+    }
+
+
 def get_item_nameid_batch(
     listing_hashes: list[str] | dict[str, dict],
     listing_details_output_file_name: str | None = None,
     listing_hashes_to_forcefully_process: list[str] | None = None,
+    on_listing_details: Callable[[str, dict], None] | None = None,
 ) -> dict[str, dict]:
+    # The callback is called for each listing hash as soon as its item name ID is known: at once if it is found on
+    # disk, otherwise once its listing page is downloaded.
+
     if listing_hashes_to_forcefully_process is None:
         listing_hashes_to_forcefully_process = []
 
@@ -445,57 +549,55 @@ def get_item_nameid_batch(
 
     try:
         listing_details = load_json(listing_details_output_file_name)
-
-        item_nameids: dict[str, dict] = {}
-        listing_hashes_to_process = []
-        for listing_hash in listing_hashes:
-            item_nameids[listing_hash] = {}
-            try:
-                item_nameid = listing_details[listing_hash]["item_nameid"]
-                is_marketable = listing_details[listing_hash]["is_marketable"]
-
-                item_nameids[listing_hash]["item_nameid"] = item_nameid
-                item_nameids[listing_hash]["is_marketable"] = is_marketable
-            except KeyError:
-                listing_hashes_to_process.append(listing_hash)
-
-        listing_hashes_to_process += listing_hashes_to_forcefully_process
-        listing_hashes_to_process = list(set(listing_hashes_to_process))
-
-        if listing_hashes_to_process:
-            listing_details = update_all_listing_details(
-                listing_hashes=listing_hashes_to_process.copy(),
-                listing_details_output_file_name=listing_details_output_file_name,
+    except FileNotFoundError:
+        listing_details = {}
+
+    item_nameids: dict[str, dict] = {}
+    listing_hashes_to_process = []
+    for listing_hash in listing_hashes:
+        if is_item_nameid_known(listing_details, listing_hash):
+            item_nameids[listing_hash] = get_item_nameid_data(
+                listing_details[listing_hash],
             )
+            record_cache_lookup("item name ids", is_hit=True)
 
-            for listing_hash in listing_hashes_to_process:
-                if listing_hash not in item_nameids:
-                    # This happens if the listing hash is:
-                    # - fed through 'listing_hashes_to_forcefully_process'
-                    # - yet not fed through 'listing_hashes'
-                    item_nameids[listing_hash] = {}
+            if on_listing_details is not None:
+                on_listing_details(listing_hash, listing_details[listing_hash])
+        else:
+            listing_hashes_to_process.append(listing_hash)
+            record_cache_lookup("item name ids", is_hit=False)
 
-                item_nameid = listing_details[listing_hash]["item_nameid"]
-                is_marketable = listing_details[listing_hash]["is_marketable"]
+    listing_hashes_to_forcefully_process = list(
+        set(listing_hashes_to_forcefully_process),
+    )
+    listing_hashes_to_process = [
+        listing_hash
+        for listing_hash in set(listing_hashes_to_process)
+        if listing_hash not in listing_hashes_to_forcefully_process
+    ]
 
-                item_nameids[listing_hash]["item_nameid"] = item_nameid
-                item_nameids[listing_hash]["is_marketable"] = is_marketable
+    # NB: listing pages are cached forever for their item name ID, so the cache is bypassed for listing hashes which are
+    # forcefully processed, e.g. to update their marketability status.
+    for listing_hashes_batch, use_cache in [
+        (listing_hashes_to_process, True),
+        (listing_hashes_to_forcefully_process, False),
+    ]:
+        if not listing_hashes_batch:
+            continue
 
-    except FileNotFoundError:
         listing_details = update_all_listing_details(
-            listing_hashes=listing_hashes,
+            listing_hashes=listing_hashes_batch.copy(),
             listing_details_output_file_name=listing_details_output_file_name,
+            on_listing_details=on_listing_details,
+            use_cache=use_cache,
         )
 
-        item_nameids = {}
-        for listing_hash in listing_hashes:
-            item_nameids[listing_hash] = {}
-
-            item_nameid = listing_details[listing_hash]["item_nameid"]
-            is_marketable = listing_details[listing_hash]["is_marketable"]
-
-            item_nameids[listing_hash]["item_nameid"] = item_nameid
-            item_nameids[listing_hash]["is_marketable"] = is_marketable
+        # NB: listing hashes whose listing page could not be downloaded, e.g. after a 404, are left out.
+        for listing_hash in listing_hashes_batch:
+            if is_item_nameid_known(listing_details, listing_hash):
+                item_nameids[listing_hash] = get_item_nameid_data(
+                    listing_details[listing_hash],
+                )
 
     return item_nameids
 
@@ -1,29 +1,64 @@
 # Objective: retrieve the ask and bid for Booster Packs.
 
-import time
+import queue
+import threading
+from collections.abc import Callable
 from contextlib import suppress
 from datetime import timedelta
 from http import HTTPStatus
-from typing import Final
+from typing import TYPE_CHECKING, Final
 
-import requests
-from requests.exceptions import ConnectionError, ReadTimeout
-
-from src.api_utils import INTER_REQUEST_COOLDOWN_FIELD, get_rate_limits
 from src.cookie_utils import force_update_sessionid
 from src.creation_time_utils import get_current_time, to_timestamp
+from src.data_context import start_background_thread
+from src.http_cache import cached_get, rate_limited_requests
+from src.job_scheduler import shared_job_scheduler, submit_job
 from src.json_utils import load_json, save_json
 from src.market_listing import get_item_nameid, get_item_nameid_batch
 from src.personal_info import (
     get_cookie_dict,
     update_and_save_cookie_to_disk_if_values_changed,
 )
+from src.rate_limiter import (
+    get_shared_rate_limiter,
+    is_rate_limiter_exhausted,
+    wait_for_rate_limiter,
+)
+from src.retry_utils import (
+    create_retry_budget,
+    is_retryable_status_code,
+    is_successful_status_code,
+    process_retry_queue,
+)
+from src.telemetry_utils import record_cache_lookup
+from src.transaction_fee import compute_sell_price_without_fee
 from src.utils import TIMEOUT_IN_SECONDS, get_jar, get_market_order_file_name
 
+if TYPE_CHECKING:
+    import requests
+
 type MarketOrderData = dict[str, float | int | bool]
 
+# Bid, ask, bid volume, and ask volume, if market orders could not be downloaded.
+DUMMY_MARKET_ORDERS: Final[tuple[float, float, int, int]] = (-1, -1, -1, -1)
+
 UPDATE_COOLDOWN_FIELD: Final[str] = "update_timestamp"
 UPDATE_COOLDOWN_IN_HOURS: Final[int] = 72
+# Ask and number of sell listings shown on search pages when market orders were last downloaded.
+LISTING_SELL_PRICE_FIELD: Final[str] = "listing_sell_price"
+LISTING_SELL_LISTINGS_FIELD: Final[str] = "listing_sell_listings"
+# Market orders are always refreshed if the bid, without fee, is within this margin of the crafting cost.
+PROFITABILITY_MARGIN: Final[float] = 0.1
+# Validators of the last market orders of an item, for conditional requests.
+ETAG_FIELD: Final[str] = "etag"
+LAST_MODIFIED_FIELD: Final[str] = "last_modified"
+# Age of market orders loaded from disk, in stale-while-revalidate mode. It is never saved to disk.
+AGE_FIELD: Final[str] = "age_in_seconds"
+# Number of listings whose market orders are revalidated in the background, in stale-while-revalidate mode.
+DEFAULT_NUM_LISTINGS_TO_REVALIDATE: Final[int] = 50
+
+# Market orders may be saved by a foreground batch and by a background revalidation at the same time.
+_market_order_data_lock = threading.Lock()
 
 
 def get_steam_market_order_url() -> str:
@@ -40,14 +75,23 @@ def get_market_order_parameters(item_nameid: str) -> dict[str, str]:
     }
 
 
-def get_market_order_headers() -> dict[str, str]:
-    return {
+def get_market_order_headers(
+    validators: dict[str, str] | None = None,
+) -> dict[str, str]:
+    # Conditional request if validators were received with the last market orders of this item.
+    conditional_headers = {}
+    if validators:
+        if ETAG_FIELD in validators:
+            conditional_headers["If-None-Match"] = validators[ETAG_FIELD]
+        if LAST_MODIFIED_FIELD in validators:
+            conditional_headers["If-Modified-Since"] = validators[LAST_MODIFIED_FIELD]
+
+    return conditional_headers | {
         "Accept": "*/*",
         "Accept-Encoding": "gzip, deflate, br",
         "Accept-Language": "fr,fr-FR;q=0.8,en-US;q=0.5,en;q=0.3",
         "Connection": "keep-alive",
         "Host": "steamcommunity.com",
-        "If-Modified-Since": "Tue, 01 Nov 2022 00:00:00 GMT",
         "Referer": "https://steamcommunity.com/market/listings/753/753-Sack%20of%20Gems",
         "Sec-Fetch-Dest": "empty",
         "Sec-Fetch-Mode": "cors",
@@ -57,6 +101,23 @@ def get_market_order_headers() -> dict[str, str]:
     }
 
 
+def get_validators(market_order_data: MarketOrderData) -> dict[str, str]:
+    return {
+        field: market_order_data[field]
+        for field in [ETAG_FIELD, LAST_MODIFIED_FIELD]
+        if market_order_data.get(field)
+    }
+
+
+def get_validators_from_response(resp_data: "requests.Response") -> dict[str, str]:
+    validators = {
+        ETAG_FIELD: resp_data.headers.get("ETag"),
+        LAST_MODIFIED_FIELD: resp_data.headers.get("Last-Modified"),
+    }
+
+    return {field: value for field, value in validators.items() if value}
+
+
 def download_market_order_data(
     listing_hash: str,
     item_nameid: str | None = None,
@@ -64,6 +125,35 @@ def download_market_order_data(
     verbose: bool = False,
     listing_details_output_file_name: str | None = None,
 ) -> tuple[float, float, int, int]:
+    # NB: without any validator, the request is not conditional, so market orders are always returned.
+    market_orders, _validators, _status_code = (
+        download_market_order_data_with_validators(
+            listing_hash,
+            item_nameid,
+            verbose=verbose,
+            listing_details_output_file_name=listing_details_output_file_name,
+        )
+    )
+
+    if market_orders is None:
+        msg = f"Market orders of {listing_hash} were reported as not modified, despite an unconditional request."
+        raise RuntimeError(msg)
+
+    return market_orders
+
+
+def download_market_order_data_with_validators(
+    listing_hash: str,
+    item_nameid: str | None = None,
+    validators: dict[str, str] | None = None,
+    *,
+    verbose: bool = False,
+    listing_details_output_file_name: str | None = None,
+) -> tuple[tuple[float, float, int, int] | None, dict[str, str], int | None]:
+    # Return None instead of market orders if they were not modified since the validators were received. The status
+    # code is None if no response was received.
+    from requests.exceptions import ConnectionError, ReadTimeout  # noqa: PLC0415
+
     cookie = get_cookie_dict()
     has_secured_cookie = bool(len(cookie) > 0)
 
@@ -78,21 +168,14 @@ def download_market_order_data(
         req_data = get_market_order_parameters(item_nameid=item_nameid)
 
         try:
-            if has_secured_cookie:
-                resp_data = requests.get(
-                    url,
-                    params=req_data,
-                    cookies=cookie,
-                    headers=get_market_order_headers(),
-                    timeout=TIMEOUT_IN_SECONDS,
-                )
-            else:
-                resp_data = requests.get(
-                    url,
-                    params=req_data,
-                    headers=get_market_order_headers(),
-                    timeout=TIMEOUT_IN_SECONDS,
-                )
+            resp_data = cached_get(
+                url,
+                params=req_data,
+                cache_policy="market_order",
+                cookies=cookie if has_secured_cookie else None,
+                headers=get_market_order_headers(validators),
+                timeout=TIMEOUT_IN_SECONDS,
+            )
         except ReadTimeout:
             print(f"[WARNING] Request timeout for {listing_hash}.")
             resp_data = None
@@ -106,6 +189,16 @@ def download_market_order_data(
 
         resp_data = None
 
+    if (
+        validators
+        and resp_data is not None
+        and resp_data.status_code == HTTPStatus.NOT_MODIFIED
+    ):
+        if verbose:
+            print(f"Listing: {listing_hash} ; item id: {item_nameid} ; not modified")
+
+        return None, validators, resp_data.status_code
+
     if resp_data and resp_data.ok:
         result = resp_data.json()
 
@@ -113,6 +206,8 @@ def download_market_order_data(
             jar = get_jar(resp_data)
             cookie = update_and_save_cookie_to_disk_if_values_changed(cookie, jar)
 
+        validators = get_validators_from_response(resp_data)
+
         try:
             buy_order_graph = result["buy_order_graph"]
 
@@ -159,13 +254,42 @@ def download_market_order_data(
         bid_volume = -1
         ask_price = -1
         ask_volume = -1
+        validators = {}
 
     if verbose:
         print(
             f"Listing: {listing_hash} ; item id: {item_nameid} ; ask: {ask_price:.2f}€ ({ask_volume}) ; bid: {bid_price:.2f}€ ({bid_volume})",
         )
 
-    return bid_price, ask_price, bid_volume, ask_volume
+    status_code = resp_data.status_code if resp_data is not None else None
+
+    return (bid_price, ask_price, bid_volume, ask_volume), validators, status_code
+
+
+def store_market_orders(
+    market_order_dict: dict[str, dict],
+    listing_hash: str,
+    market_orders: tuple[float, float, int, int] | None,
+    validators: dict[str, str],
+    update_timestamp: int,
+    *,
+    is_marketable: bool | None,
+    badge_data: dict,
+) -> None:
+    if market_orders is not None:
+        bid_price, ask_price, bid_volume, ask_volume = market_orders
+
+        market_order_dict[listing_hash] = {}
+        market_order_dict[listing_hash]["bid"] = bid_price
+        market_order_dict[listing_hash]["ask"] = ask_price
+        market_order_dict[listing_hash]["bid_volume"] = bid_volume
+        market_order_dict[listing_hash]["ask_volume"] = ask_volume
+        market_order_dict[listing_hash]["is_marketable"] = is_marketable
+        market_order_dict[listing_hash].update(validators)
+
+    # NB: if market orders were not modified, only the timestamp and the snapshot of the listing are updated.
+    market_order_dict[listing_hash][UPDATE_COOLDOWN_FIELD] = update_timestamp
+    market_order_dict[listing_hash].update(get_listing_snapshot(badge_data))
 
 
 def is_dummy_market_order_data(
@@ -188,6 +312,84 @@ def has_a_recent_timestamp(
     return threshold_timestamp < last_update_timestamp
 
 
+def get_listing_snapshot(badge_data: dict) -> MarketOrderData:
+    # NB: search pages return 100 listings per query, so they are a cheap way to detect changes on the market.
+    return {
+        LISTING_SELL_PRICE_FIELD: badge_data.get("sell_price"),
+        LISTING_SELL_LISTINGS_FIELD: badge_data.get("sell_listings"),
+    }
+
+
+def has_listing_changed(
+    market_order_data: MarketOrderData,
+    badge_data: dict,
+) -> bool:
+    return any(
+        value is None or market_order_data.get(field) != value
+        for field, value in get_listing_snapshot(badge_data).items()
+    )
+
+
+def is_close_to_profitability(
+    market_order_data: MarketOrderData,
+    badge_data: dict,
+    margin: float = PROFITABILITY_MARGIN,
+) -> bool:
+    try:
+        gem_price_with_fee = badge_data["gem_price"]
+    except KeyError:
+        return True
+
+    bid_price = market_order_data["bid"]
+
+    if bid_price <= 0:
+        return False
+
+    return bool(
+        compute_sell_price_without_fee(bid_price) >= (1 - margin) * gem_price_with_fee,
+    )
+
+
+def can_skip_unchanged_listing(
+    market_order_data: MarketOrderData,
+    badge_data: dict,
+) -> bool:
+    return not (
+        is_dummy_market_order_data(market_order_data)
+        or has_listing_changed(market_order_data, badge_data)
+        or is_close_to_profitability(market_order_data, badge_data)
+    )
+
+
+def get_update_timestamp(market_order_data: MarketOrderData) -> int:
+    return market_order_data.get(UPDATE_COOLDOWN_FIELD, 0)
+
+
+def save_market_order_data(
+    market_order_dict: dict[str, dict],
+    market_order_output_file_name: str | None = None,
+) -> dict[str, dict]:
+    # Merge with the market orders on disk, under a lock, and keep the most recent row of each listing, so that a
+    # foreground batch and a background revalidation do not erase the data of each other.
+    if market_order_output_file_name is None:
+        market_order_output_file_name = get_market_order_file_name()
+
+    with _market_order_data_lock:
+        all_market_order_data = load_market_order_data_from_disk(
+            market_order_output_file_name,
+        )
+
+        for listing_hash, market_order_data in market_order_dict.items():
+            if listing_hash not in all_market_order_data or get_update_timestamp(
+                market_order_data,
+            ) >= get_update_timestamp(all_market_order_data[listing_hash]):
+                all_market_order_data[listing_hash] = market_order_data
+
+        save_json(all_market_order_data, market_order_output_file_name)
+
+    return all_market_order_data
+
+
 def download_market_order_data_batch(
     badge_data: dict[str, dict],
     market_order_dict: dict[str, dict] | None = None,
@@ -198,18 +400,38 @@ def download_market_order_data_batch(
     listing_details_output_file_name: str | None = None,
     enforce_cooldown: bool = True,
     allow_to_skip_dummy_data: bool = False,
+    refresh_only_changed_listings: bool = False,
 ) -> dict[str, dict]:
+    # If refresh_only_changed_listings is True, market orders are only downloaded for listings whose ask or number of
+    # sell listings has changed on search pages since the last download, and for listings close to profitability.
+
     if market_order_output_file_name is None:
         market_order_output_file_name = get_market_order_file_name()
 
-    # Pre-retrieval of item name ids
+    # Pre-retrieval of item name ids, in the queue of listing pages of the shared job scheduler. Each item name ID is
+    # handed over to the retrieval of market orders as soon as it is known, so that both stages proceed at the pace of
+    # their own rate limits.
 
     listing_hashes = [badge_data[app_id]["listing_hash"] for app_id in badge_data]
+    badge_data_per_listing_hash = {
+        individual_badge_data["listing_hash"]: individual_badge_data
+        for individual_badge_data in badge_data.values()
+    }
 
-    item_nameids = get_item_nameid_batch(
-        listing_hashes,
-        listing_details_output_file_name=listing_details_output_file_name,
-    )
+    item_nameid_queue: queue.Queue[tuple[str, dict] | None] = queue.Queue()
+
+    def produce_item_nameids() -> dict[str, dict]:
+        try:
+            return get_item_nameid_batch(
+                listing_hashes,
+                listing_details_output_file_name=listing_details_output_file_name,
+                on_listing_details=lambda listing_hash, listing_details: (
+                    item_nameid_queue.put((listing_hash, listing_details))
+                ),
+            )
+        finally:
+            # Sentinel to signal the end of the stream.
+            item_nameid_queue.put(None)
 
     # Retrieval of market orders (bid, ask)
 
@@ -217,12 +439,15 @@ def download_market_order_data_batch(
     cookie = force_update_sessionid(cookie)
     has_secured_cookie = bool(len(cookie) > 0)
 
-    rate_limits = get_rate_limits("market_order", has_secured_cookie=has_secured_cookie)
+    rate_limiter = get_shared_rate_limiter(
+        "market_order",
+        has_secured_cookie=has_secured_cookie,
+    )
 
     if market_order_dict is None:
         market_order_dict = {}
 
-    query_count = 0
+    retry_queue: list[dict] = []
 
     current_time = get_current_time()
     update_timestamp = to_timestamp(current_time)
@@ -230,8 +455,18 @@ def download_market_order_data_batch(
         current_time - timedelta(hours=UPDATE_COOLDOWN_IN_HOURS),
     )
 
-    for app_id in badge_data:
-        listing_hash = badge_data[app_id]["listing_hash"]
+    item_nameids: dict[str, dict] = {}
+
+    def wait_for_market_orders(rate_limiter: dict) -> bool:
+        if save_to_disk and is_rate_limiter_exhausted(rate_limiter):
+            save_market_order_data(market_order_dict, market_order_output_file_name)
+
+        wait_for_rate_limiter(rate_limiter, verbose=True)
+
+        return True
+
+    def download_market_orders_for_badge(individual_badge_data: dict) -> None:
+        listing_hash = individual_badge_data["listing_hash"]
 
         with suppress(KeyError):
             last_update_timestamp = market_order_dict[listing_hash][
@@ -252,59 +487,262 @@ def download_market_order_data_batch(
                     print(
                         f"Skipping download of orders for {listing_hash} (last updated: {last_update_timestamp}).",
                     )
-                continue
+                record_cache_lookup("market orders", is_hit=True)
+                return
+
+        if (
+            refresh_only_changed_listings
+            and listing_hash in market_order_dict
+            and can_skip_unchanged_listing(
+                market_order_dict[listing_hash],
+                individual_badge_data,
+            )
+        ):
+            if verbose:
+                print(
+                    f"Skipping download of orders for {listing_hash} (unchanged listing).",
+                )
+            record_cache_lookup("market orders", is_hit=True)
+            return
 
-        bid_price, ask_price, bid_volume, ask_volume = download_market_order_data(
-            listing_hash,
-            verbose=verbose,
-            listing_details_output_file_name=listing_details_output_file_name,
-        )
+        record_cache_lookup("market orders", is_hit=False)
 
-        market_order_dict[listing_hash] = {}
-        market_order_dict[listing_hash]["bid"] = bid_price
-        market_order_dict[listing_hash]["ask"] = ask_price
-        market_order_dict[listing_hash]["bid_volume"] = bid_volume
-        market_order_dict[listing_hash]["ask_volume"] = ask_volume
-        market_order_dict[listing_hash]["is_marketable"] = item_nameids[listing_hash][
-            "is_marketable"
-        ]
-        market_order_dict[listing_hash][UPDATE_COOLDOWN_FIELD] = update_timestamp
+        request_validators = get_validators(market_order_dict.get(listing_hash, {}))
 
-        if query_count >= rate_limits["max_num_queries"]:
-            if save_to_disk:
-                save_json(market_order_dict, market_order_output_file_name)
+        item_nameid = item_nameids[listing_hash]["item_nameid"]
 
-            cooldown_duration = rate_limits["cooldown"]
+        if item_nameid is None:
+            # NB: the listing page was already downloaded, so the item name ID is not looked for again.
             print(
-                f"Number of queries {query_count} reached. Cooldown: {cooldown_duration} seconds",
+                f"No query to download market orders for {listing_hash}, because item name ID is unknown.",
+            )
+            market_orders, validators, status_code = DUMMY_MARKET_ORDERS, {}, None
+        else:
+            market_orders, validators, status_code = (
+                download_market_order_data_with_validators(
+                    listing_hash,
+                    item_nameid,
+                    validators=request_validators,
+                    verbose=verbose,
+                )
             )
-            time.sleep(cooldown_duration)
-            query_count = 0
 
-        time.sleep(rate_limits[INTER_REQUEST_COOLDOWN_FIELD])
-        query_count += 1
+        if item_nameid is not None and request_validators:
+            # The share of "304 Not Modified" among conditional requests.
+            record_cache_lookup(
+                "conditional market orders",
+                is_hit=market_orders is None,
+            )
+
+        if (
+            item_nameid is not None
+            and not is_successful_status_code(status_code)
+            and is_retryable_status_code(status_code)
+        ):
+            # NB: transient failures are retried at the end of the batch, instead of being stored as dummy data.
+            retry_queue.append(individual_badge_data)
+        else:
+            store_market_orders(
+                market_order_dict,
+                listing_hash,
+                market_orders,
+                validators,
+                update_timestamp,
+                is_marketable=item_nameids[listing_hash]["is_marketable"],
+                badge_data=individual_badge_data,
+            )
+
+    def retry_market_orders(individual_badge_data: dict) -> bool:
+        listing_hash = individual_badge_data["listing_hash"]
+
+        market_orders, validators, status_code = (
+            download_market_order_data_with_validators(
+                listing_hash,
+                item_nameids[listing_hash]["item_nameid"],
+                validators=get_validators(market_order_dict.get(listing_hash, {})),
+                verbose=verbose,
+            )
+        )
+
+        if not is_successful_status_code(status_code):
+            return False
 
-    if save_to_disk:
-        save_json(market_order_dict, market_order_output_file_name)
+        store_market_orders(
+            market_order_dict,
+            listing_hash,
+            market_orders,
+            validators,
+            update_timestamp,
+            is_marketable=item_nameids[listing_hash]["is_marketable"],
+            badge_data=individual_badge_data,
+        )
+
+        return True
+
+    # NB: the market orders downloaded so far are saved even if the batch fails in the middle of the process. Cached
+    # market orders do not wait for the rate limiter.
+    try:
+        with rate_limited_requests(rate_limiter, wait_fn=wait_for_market_orders):
+            # NB: listing pages are queued for their own endpoint class, so that they overlap with market orders.
+            with shared_job_scheduler():
+                producer = submit_job("market_listing", produce_item_nameids)
+
+                while (item := item_nameid_queue.get()) is not None:
+                    listing_hash, listing_details = item
+
+                    if (
+                        listing_hash in item_nameids
+                        or listing_hash not in badge_data_per_listing_hash
+                    ):
+                        continue
+
+                    item_nameids[listing_hash] = {
+                        "item_nameid": listing_details["item_nameid"],
+                        "is_marketable": listing_details["is_marketable"],
+                    }
+                    download_market_orders_for_badge(
+                        badge_data_per_listing_hash[listing_hash],
+                    )
+
+                # Listing hashes which were not streamed. NB: listing pages which could not be downloaded are left out.
+                for listing_hash, item_nameid_data in producer.result().items():
+                    if listing_hash not in item_nameids:
+                        item_nameids[listing_hash] = item_nameid_data
+                        download_market_orders_for_badge(
+                            badge_data_per_listing_hash[listing_hash],
+                        )
+
+            process_retry_queue(
+                retry_queue,
+                retry_market_orders,
+                retry_budget=create_retry_budget(),
+                verbose=verbose,
+            )
+    finally:
+        if save_to_disk:
+            save_market_order_data(market_order_dict, market_order_output_file_name)
 
     return market_order_dict
 
 
+def annotate_market_order_data_with_age(
+    market_order_dict: dict[str, dict],
+) -> dict[str, dict]:
+    current_timestamp = to_timestamp(get_current_time())
+
+    return {
+        listing_hash: market_order_data
+        | {AGE_FIELD: current_timestamp - get_update_timestamp(market_order_data)}
+        for listing_hash, market_order_data in market_order_dict.items()
+    }
+
+
+def estimate_profit(market_order_data: MarketOrderData, badge_data: dict) -> float:
+    # Profit in euros if a booster pack was crafted then sold at the bid.
+    return compute_sell_price_without_fee(market_order_data["bid"]) - badge_data.get(
+        "gem_price",
+        0,
+    )
+
+
+def select_badge_data_to_revalidate(
+    badge_data: dict[str, dict],
+    market_order_dict: dict[str, dict],
+    max_num_listings: int = DEFAULT_NUM_LISTINGS_TO_REVALIDATE,
+) -> dict[str, dict]:
+    # The most relevant rows are the missing ones, then the ones with the highest estimated profit, i.e. the ones at the
+    # top of the ranking of arbitrages.
+    def get_relevance(app_id: str) -> tuple[bool, float]:
+        listing_hash = badge_data[app_id]["listing_hash"]
+
+        if listing_hash not in market_order_dict:
+            return True, 0.0
+
+        return False, estimate_profit(
+            market_order_dict[listing_hash],
+            badge_data[app_id],
+        )
+
+    selected_app_ids = sorted(badge_data, key=get_relevance, reverse=True)[
+        :max_num_listings
+    ]
+
+    return {app_id: badge_data[app_id] for app_id in selected_app_ids}
+
+
+def revalidate_market_order_data(
+    badge_data: dict[str, dict],
+    market_order_dict: dict[str, dict],
+    on_revalidated: Callable[[dict[str, dict]], None] | None = None,
+    max_num_listings: int = DEFAULT_NUM_LISTINGS_TO_REVALIDATE,
+    *,
+    trim_output: bool = False,
+    verbose: bool = False,
+) -> threading.Thread:
+    # Download the market orders of the most relevant listings in a background thread, then call the callback with the
+    # updated market orders, e.g. to print an updated ranking.
+    #
+    # NB: the thread is joined before the shared data context, and the run of the workflow, are torn down.
+    selected_badge_data = select_badge_data_to_revalidate(
+        badge_data,
+        market_order_dict,
+        max_num_listings,
+    )
+
+    def revalidate() -> None:
+        download_market_order_data_batch(
+            selected_badge_data,
+            market_order_dict=load_market_order_data_from_disk(),
+            enforce_cooldown=False,
+            verbose=verbose,
+        )
+
+        if on_revalidated is not None:
+            updated_market_order_dict = load_market_order_data(
+                badge_data,
+                trim_output=trim_output,
+                retrieve_market_orders_online=False,
+            )
+            on_revalidated(
+                annotate_market_order_data_with_age(updated_market_order_dict),
+            )
+
+    return start_background_thread(revalidate, name="market_order_revalidation")
+
+
 def load_market_order_data(
     badge_data: dict[str, dict],
     *,
     trim_output: bool = False,
     retrieve_market_orders_online: bool = True,
+    refresh_only_changed_listings: bool = False,
+    stale_while_revalidate: bool = False,
+    on_revalidated: Callable[[dict[str, dict]], None] | None = None,
     verbose: bool = False,
 ) -> dict[str, dict]:
+    # If stale_while_revalidate is True, market orders are loaded from disk and returned at once, annotated with their
+    # age, while the most relevant ones are revalidated in the background. The callback is then called with the updated
+    # market orders.
     market_order_dict = load_market_order_data_from_disk()
 
-    if retrieve_market_orders_online:
+    if stale_while_revalidate:
+        revalidate_market_order_data(
+            badge_data,
+            market_order_dict,
+            on_revalidated,
+            trim_output=trim_output,
+            verbose=verbose,
+        )
+
+        market_order_dict = annotate_market_order_data_with_age(market_order_dict)
+
+    elif retrieve_market_orders_online:
         market_order_dict = download_market_order_data_batch(
             badge_data,
             save_to_disk=True,
             market_order_dict=market_order_dict,
             verbose=verbose,
+            refresh_only_changed_listings=refresh_only_changed_listings,
         )
 
     if trim_output:
@@ -313,8 +751,15 @@ def load_market_order_data(
             market_order_dict,
         )
 
-        if retrieve_market_orders_online and app_ids_with_missing_data:
-            raise AssertionError
+        if (
+            retrieve_market_orders_online
+            and not stale_while_revalidate
+            and app_ids_with_missing_data
+        ):
+            # NB: items which still failed after all the retries are not stored as dummy data anymore.
+            print(
+                f"[WARNING] Market orders could not be downloaded for {len(app_ids_with_missing_data)} appIDs.",
+            )
 
     else:
         trimmed_market_order_dict = market_order_dict
@@ -1,21 +1,40 @@
 # Objective: retrieve all the listings of 'Booster Packs' on the Steam Market,
 #            along with the sell price, and the volume available at this price.
 
-import time
 from pathlib import Path
-
-import requests
-from requests.exceptions import ConnectionError
-
-from src.api_utils import get_rate_limits
+from typing import TYPE_CHECKING
+
+from src.data_context import (
+    copy_data,
+    get_file_modification_time,
+    get_value_with_memo,
+    load_derived_data_with_memo,
+    update_derived_data_memo,
+)
 from src.json_utils import load_json, save_json
+from src.listing_index import build_listing_index, upsert_listings
 from src.personal_info import (
     get_cookie_dict,
     update_and_save_cookie_to_disk_if_values_changed,
 )
+from src.rate_limiter import (
+    get_shared_rate_limiter,
+    is_rate_limiter_exhausted,
+    pause_rate_limiter,
+    wait_for_rate_limiter,
+)
+from src.retry_utils import (
+    create_retry_budget,
+    is_retryable_status_code,
+    process_retry_queue,
+    request_with_retries,
+)
 from src.tag_utils import get_tag_drop_rate_str
 from src.utils import SEARCH_TIMEOUT_IN_SECONDS, get_jar, get_listing_output_file_name
 
+if TYPE_CHECKING:
+    import requests
+
 
 def get_steam_market_search_url() -> str:
     return "https://steamcommunity.com/market/search/render/"
@@ -43,6 +62,7 @@ def get_search_parameters(
     tag_item_class_no: int | None = None,
     tag_drop_rate_str: str | None = None,
     rarity: str | None = None,
+    tag_app_id: str | None = None,
     *,
     is_foil_trading_card: bool = True,
 ) -> dict[str, str]:
@@ -63,9 +83,12 @@ def get_search_parameters(
     column_to_sort_by = "name"
     sort_direction = "asc"
 
+    # NB: listings can be restricted to the items of a single game, e.g. to count its items of each rarity.
+    tag_game = "any" if tag_app_id is None else f"tag_app_{tag_app_id}"
+
     params = {
         "norender": "1",
-        "category_753_Game[]": "any",
+        "category_753_Game[]": tag_game,
         "category_753_droprate[]": tag_drop_rate_str,
         "category_753_item_class[]": f"tag_item_class_{tag_item_class_no}",
         "appid": "753",
@@ -83,6 +106,41 @@ def get_search_parameters(
     return params
 
 
+def request_search_page(
+    url: str,
+    req_data: dict,
+    cookie: dict[str, str] | None = None,
+) -> tuple["requests.Response | None", int | None]:
+    # NB: the status code is None if no response was received.
+    import requests  # noqa: PLC0415
+
+    try:
+        resp_data = requests.get(
+            url,
+            params=req_data,
+            cookies=cookie,
+            timeout=SEARCH_TIMEOUT_IN_SECONDS,
+        )
+    except requests.exceptions.RequestException:
+        return None, None
+
+    return resp_data, resp_data.status_code
+
+
+def parse_search_results(result: dict) -> dict[str, dict]:
+    listings: dict[str, dict] = {}
+
+    for listing in result["results"]:
+        listing_hash = listing["hash_name"]
+        listings[listing_hash] = {
+            "sell_listings": listing["sell_listings"],
+            "sell_price": listing["sell_price"],
+            "sell_price_text": listing["sell_price_text"],
+        }
+
+    return listings
+
+
 def get_all_listings(
     all_listings: dict[str, dict] | None = None,
     url: str | None = None,
@@ -91,6 +149,7 @@ def get_all_listings(
     rarity: str | None = None,
     start_index: int = 0,
     listing_output_file_name: str | None = None,
+    tag_app_id: str | None = None,
 ) -> dict[str, dict]:
     if url is None:
         url = get_steam_market_search_url()
@@ -98,7 +157,8 @@ def get_all_listings(
     cookie = get_cookie_dict()
     has_secured_cookie = bool(len(cookie) > 0)
 
-    rate_limits = get_rate_limits(
+    # NB: the budget is shared with other crawls, so that consecutive crawls do not need any forced cooldown.
+    rate_limiter = get_shared_rate_limiter(
         "market_search",
         has_secured_cookie=has_secured_cookie,
     )
@@ -111,47 +171,54 @@ def get_all_listings(
     query_count = 0
     delta_index = 100
 
-    while (num_listings is None) or (start_index < num_listings):
-        if num_listings is not None:
-            print(f"[{start_index}/{num_listings}]")
+    retry_budget = create_retry_budget()
+    retry_queue: list[int] = []
 
-        req_data = get_search_parameters(
-            start_index=start_index,
+    def get_page_parameters(page_start_index: int) -> dict:
+        return get_search_parameters(
+            start_index=page_start_index,
             delta_index=delta_index,
             tag_item_class_no=tag_item_class_no,
             tag_drop_rate_str=tag_drop_rate_str,
             rarity=rarity,
+            tag_app_id=tag_app_id,
         )
 
-        if query_count >= rate_limits["max_num_queries"]:
-            if listing_output_file_name:
-                print(f"Saving temporary data to {listing_output_file_name}.")
-                save_json(all_listings, listing_output_file_name)
+    while (num_listings is None) or (start_index < num_listings):
+        if num_listings is not None:
+            print(f"[{start_index}/{num_listings}]")
+
+        req_data = get_page_parameters(start_index)
+
+        if listing_output_file_name and is_rate_limiter_exhausted(rate_limiter):
+            print(f"Saving temporary data to {listing_output_file_name}.")
+            save_all_listings(all_listings, listing_output_file_name)
+
+        def request_fn(
+            req_data: dict = req_data,
+            cookie: dict[str, str] = cookie,
+        ) -> tuple["requests.Response | None", int | None]:
+            wait_for_rate_limiter(rate_limiter, verbose=True)
 
-            cooldown_duration = rate_limits["cooldown"]
+            return request_search_page(
+                url,
+                req_data,
+                cookie if has_secured_cookie else None,
+            )
+
+        def on_rate_limited() -> None:
             print(
-                f"Number of queries {query_count} reached. Cooldown: {cooldown_duration} seconds",
+                f"You have been rate-limited. Pausing queries of search pages for {rate_limiter['cooldown']} seconds.",
             )
-            time.sleep(cooldown_duration)
-            query_count = 0
+            pause_rate_limiter(rate_limiter)
 
-        try:
-            if has_secured_cookie:
-                resp_data = requests.get(
-                    url,
-                    params=req_data,
-                    cookies=cookie,
-                    timeout=SEARCH_TIMEOUT_IN_SECONDS,
-                )
-            else:
-                resp_data = requests.get(
-                    url,
-                    params=req_data,
-                    timeout=SEARCH_TIMEOUT_IN_SECONDS,
-                )
-        except ConnectionError:
-            resp_data = None
+        resp_data, status_code = request_with_retries(
+            request_fn,
+            retry_budget=retry_budget,
+            on_rate_limited=on_rate_limited,
+        )
 
+        page_start_index = start_index
         start_index += delta_index
         query_count += 1
 
@@ -172,27 +239,39 @@ def get_all_listings(
             else:
                 num_listings = num_listings_based_on_latest_query
 
-            listings: dict[str, dict] = {}
-            for listing in result["results"]:
-                listing_hash = listing["hash_name"]
-                listings[listing_hash] = {
-                    "sell_listings": listing["sell_listings"],
-                    "sell_price": listing["sell_price"],
-                    "sell_price_text": listing["sell_price_text"],
-                }
+            listings = parse_search_results(result)
 
         else:
-            status_code = resp_data.status_code if resp_data else None
             print(
-                f"Wrong status code ({status_code}) for start_index = {start_index} after {query_count} queries.",
+                f"Wrong status code ({status_code}) for start_index = {page_start_index} after {query_count} queries.",
             )
-            if status_code is None:
+
+            # NB: a page which failed because of a transient error is retried at the end, instead of being skipped.
+            if num_listings is not None and is_retryable_status_code(status_code):
+                retry_queue.append(page_start_index)
                 continue
 
             break
 
         all_listings.update(listings)
 
+    def retry_search_page(page_start_index: int) -> bool:
+        wait_for_rate_limiter(rate_limiter, verbose=True)
+
+        resp_data, _status_code = request_search_page(
+            url,
+            get_page_parameters(page_start_index),
+            cookie if has_secured_cookie else None,
+        )
+
+        if resp_data and resp_data.ok:
+            all_listings.update(parse_search_results(resp_data.json()))
+            return True
+
+        return False
+
+    process_retry_queue(retry_queue, retry_search_page, retry_budget=retry_budget)
+
     return all_listings
 
 
@@ -212,7 +291,7 @@ def download_all_listings(
             start_index=start_index,
         )
 
-        save_json(all_listings, listing_output_file_name)
+        save_all_listings(all_listings, listing_output_file_name)
 
     return True
 
@@ -231,6 +310,28 @@ def update_all_listings(
     if listing_output_file_name is None:
         listing_output_file_name = get_listing_output_file_name()
 
+    # NB: within a shared data context, each kind of listings is only crawled once per run.
+    return get_value_with_memo(
+        f"listings:{listing_output_file_name}:{url}:{tag_item_class_no}:{tag_drop_rate_str}:{rarity}",
+        lambda: crawl_all_listings(
+            listing_output_file_name,
+            url=url,
+            tag_item_class_no=tag_item_class_no,
+            tag_drop_rate_str=tag_drop_rate_str,
+            rarity=rarity,
+            start_index=start_index,
+        ),
+    )
+
+
+def crawl_all_listings(
+    listing_output_file_name: str,
+    url: str | None = None,
+    tag_item_class_no: int | None = None,
+    tag_drop_rate_str: str | None = None,
+    rarity: str | None = None,
+    start_index: int = 0,
+) -> bool:
     try:
         all_listings = load_all_listings(
             listing_output_file_name=listing_output_file_name,
@@ -250,16 +351,49 @@ def update_all_listings(
         listing_output_file_name=listing_output_file_name,
     )
 
-    save_json(all_listings, listing_output_file_name)
+    save_all_listings(all_listings, listing_output_file_name)
 
     return True
 
 
-def load_all_listings(listing_output_file_name: str | None = None) -> dict[str, dict]:
+def save_all_listings(
+    all_listings: dict[str, dict],
+    listing_output_file_name: str,
+) -> None:
+    # NB: within a shared data context, the memoized index of the listings is updated incrementally, cf. listing_index.py.
+    try:
+        previous_modification_time = get_file_modification_time(
+            listing_output_file_name,
+        )
+    except FileNotFoundError:
+        previous_modification_time = None
+
+    save_json(all_listings, listing_output_file_name)
+
+    update_derived_data_memo(
+        listing_output_file_name,
+        lambda listing_index: upsert_listings(listing_index, copy_data(all_listings)),
+        previous_modification_time,
+    )
+
+
+def load_all_listings(
+    listing_output_file_name: str | None = None,
+    *,
+    with_index: bool = False,
+) -> dict:
+    # With an index, the listings are returned along with their indexes by sell price and by appID, cf. listing_index.py.
+    # Within a shared data context, the indexes are only built once per file, then updated when the listings are saved.
     if listing_output_file_name is None:
         listing_output_file_name = get_listing_output_file_name()
 
     try:
+        if with_index:
+            return load_derived_data_with_memo(
+                listing_output_file_name,
+                lambda: build_listing_index(load_json(listing_output_file_name)),
+            )
+
         all_listings = load_json(listing_output_file_name)
     except FileNotFoundError:
         print(
@@ -267,7 +401,7 @@ def load_all_listings(listing_output_file_name: str | None = None) -> dict[str,
         )
         all_listings = {}
 
-    return all_listings
+    return build_listing_index(all_listings) if with_index else all_listings
 
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ from src.market_listing import get_item_nameid_batch
 from src.market_search import load_all_listings, update_all_listings
 from src.parsing_utils import parse_badge_creation_details
 from src.sack_of_gems import get_gem_price
+from src.telemetry_utils import set_num_items_out, track_stage
 from src.utils import convert_listing_hash_to_app_id, convert_listing_hash_to_app_name
 
 
@@ -166,6 +167,9 @@ def aggregate_badge_data(
             gem_amount_required_to_craft_booster_pack * gem_price
         )
         aggregated_badge_data[app_id]["sell_price"] = sell_price_in_euros
+        aggregated_badge_data[app_id]["sell_listings"] = all_listings[listing_hash].get(
+            "sell_listings",
+        )
         aggregated_badge_data[app_id]["next_creation_time"] = next_creation_time
 
     return aggregated_badge_data
@@ -178,32 +182,44 @@ def load_aggregated_badge_data(
     minimum_allowed_sack_of_gems_price: float | None = None,
     from_javascript: bool = False,
 ) -> dict[str, dict]:
-    badge_creation_details = parse_badge_creation_details(
-        from_javascript=from_javascript,
-    )
+    with track_stage("parse badge creation details") as stage:
+        badge_creation_details = parse_badge_creation_details(
+            from_javascript=from_javascript,
+        )
+        set_num_items_out(stage, badge_creation_details)
 
     if retrieve_listings_from_scratch:
-        update_all_listings()
+        with track_stage("download listings"):
+            update_all_listings()
 
-    all_listings = load_all_listings()
+    with track_stage("load listings") as stage:
+        all_listings = load_all_listings()
+        set_num_items_out(stage, all_listings)
 
-    all_listings = filter_out_dubious_listing_hashes(all_listings)
+    with track_stage("filter out dubious listing hashes", all_listings) as stage:
+        all_listings = filter_out_dubious_listing_hashes(all_listings)
+        set_num_items_out(stage, all_listings)
 
-    badge_matches = match_badges_with_listing_hashes(
-        badge_creation_details,
-        all_listings,
-    )
+    with track_stage("match badges with listing hashes", badge_creation_details):
+        badge_matches = match_badges_with_listing_hashes(
+            badge_creation_details,
+            all_listings,
+        )
 
     retrieve_gem_price_from_scratch = bool(enforced_sack_of_gems_price is None)
 
-    return aggregate_badge_data(
-        badge_creation_details,
-        badge_matches,
-        all_listings=all_listings,
-        enforced_sack_of_gems_price=enforced_sack_of_gems_price,
-        minimum_allowed_sack_of_gems_price=minimum_allowed_sack_of_gems_price,
-        retrieve_gem_price_from_scratch=retrieve_gem_price_from_scratch,
-    )
+    with track_stage("aggregate badge data", badge_matches) as stage:
+        aggregated_badge_data = aggregate_badge_data(
+            badge_creation_details,
+            badge_matches,
+            all_listings=all_listings,
+            enforced_sack_of_gems_price=enforced_sack_of_gems_price,
+            minimum_allowed_sack_of_gems_price=minimum_allowed_sack_of_gems_price,
+            retrieve_gem_price_from_scratch=retrieve_gem_price_from_scratch,
+        )
+        set_num_items_out(stage, aggregated_badge_data)
+
+    return aggregated_badge_data
 
 
 def populate_random_samples_of_badge_data(
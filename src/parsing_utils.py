@@ -7,6 +7,7 @@
 import json
 from pathlib import Path
 
+from src.data_context import load_file_with_memo
 from src.market_listing import fix_app_name_for_url_query
 from src.utils import get_badge_creation_file_name
 
@@ -91,6 +92,18 @@ def parse_badge_creation_details(
                 from_javascript=not from_javascript,
             )
 
+    # NB: within a shared data context, the file is only parsed once per run.
+    return load_file_with_memo(
+        badge_creation_file_name,
+        lambda fname: parse_badge_creation_file(fname, verbose=verbose),
+    )
+
+
+def parse_badge_creation_file(
+    badge_creation_file_name: str,
+    *,
+    verbose: bool = False,
+) -> dict[str, dict]:
     with Path(badge_creation_file_name).open(encoding="utf-8") as f:
         lines = [line.strip() for line in f if line[0] != "#"]
 
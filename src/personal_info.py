@@ -1,7 +1,12 @@
 # Reference: https://www.blakeporterneuro.com/learning-python-project-3-scrapping-data-from-steams-community-market/
 
+import threading
+
 from src.json_utils import load_json, save_json
 
+# Threads which receive cookies at the same time, e.g. concurrent sales or goo queries, share the same cookie file.
+_cookie_lock = threading.Lock()
+
 
 def get_steam_cookie_file_name() -> str:
     return "personal_info.json"
@@ -84,27 +89,28 @@ def update_and_save_cookie_to_disk_if_values_changed(
     if fields is None:
         fields = ["steamLoginSecure", "sessionid", "steamDidLoginRefresh"]
 
-    relevant_fields = set(fields)
-    relevant_fields = relevant_fields.intersection(cookie.keys())
-    relevant_fields = relevant_fields.intersection(dict_with_new_values.keys())
+    with _cookie_lock:
+        relevant_fields = set(fields)
+        relevant_fields = relevant_fields.intersection(cookie.keys())
+        relevant_fields = relevant_fields.intersection(dict_with_new_values.keys())
 
-    is_cookie_to_be_updated = any(
-        dict_with_new_values[field] != cookie[field] for field in relevant_fields
-    )
-
-    if is_cookie_to_be_updated:
-        cookie = update_cookie_dict(
-            original_cookie=cookie,
-            dict_with_new_values=dict_with_new_values,
-            verbose=verbose,
+        is_cookie_to_be_updated = any(
+            dict_with_new_values[field] != cookie[field] for field in relevant_fields
         )
 
-        save_steam_cookie_to_disk(
-            cookie=cookie,
-            file_name_with_personal_info=file_name_with_personal_info,
-        )
+        if is_cookie_to_be_updated:
+            cookie = update_cookie_dict(
+                original_cookie=cookie,
+                dict_with_new_values=dict_with_new_values,
+                verbose=verbose,
+            )
 
-    return cookie
+            save_steam_cookie_to_disk(
+                cookie=cookie,
+                file_name_with_personal_info=file_name_with_personal_info,
+            )
+
+        return cookie
 
 
 def main() -> None:
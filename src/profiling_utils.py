@@ -0,0 +1,190 @@
+# Objective: profile long crawls, either for the whole run, or on demand from a running process.
+#
+# Usage:
+#   - run an entry script with `--profile` to save a cProfile of the whole run to data/profiles/,
+#   - send SIGUSR1 to a running entry script (`kill -USR1 <pid>`) to dump a sampled stack profile and a tracemalloc
+#     top-N snapshot to data/profiles/, e.g. when a crawl slows down after a few hours.
+#
+# NB: when idle, the only cost is a signal handler: nothing is traced until a signal is received.
+
+import cProfile
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from types import FrameType
+from typing import Final
+
+from src.creation_time_utils import get_current_time
+from src.utils import get_profile_folder
+
+PROFILE_FLAG: Final[str] = "--profile"
+SAMPLING_DURATION_IN_SECONDS: Final[float] = 30.0
+SAMPLING_INTERVAL_IN_SECONDS: Final[float] = 0.01
+NUM_FRAMES_FOR_MEMORY_TRACES: Final[int] = 10
+TOP_N_FOR_MEMORY_SNAPSHOT: Final[int] = 25
+
+_sampling_lock = threading.Lock()
+
+
+def is_profiling_requested(argv: list[str] | None = None) -> bool:
+    if argv is None:
+        argv = sys.argv
+
+    return PROFILE_FLAG in argv[1:]
+
+
+def get_profile_file_name(script_name: str, suffix: str) -> str:
+    time_str = get_current_time().strftime("%Y%m%d_%H%M%S")
+
+    return get_profile_folder() + f"{script_name}_{time_str}{suffix}"
+
+
+def format_stack(frame: FrameType | None) -> str:
+    # Collapsed stack, from the outermost call to the innermost, as expected by flame graph tools.
+    function_names = []
+
+    while frame is not None:
+        code = frame.f_code
+        function_names.append(
+            f"{Path(code.co_filename).name}:{code.co_name}:{frame.f_lineno}",
+        )
+        frame = frame.f_back
+
+    return ";".join(reversed(function_names))
+
+
+def sample_stacks(
+    duration_in_seconds: float = SAMPLING_DURATION_IN_SECONDS,
+    interval_in_seconds: float = SAMPLING_INTERVAL_IN_SECONDS,
+) -> Counter[str]:
+    sampler_thread_id = threading.get_ident()
+    stack_counts: Counter[str] = Counter()
+
+    end_time = time.monotonic() + duration_in_seconds
+    while time.monotonic() < end_time:
+        for thread_id, frame in sys._current_frames().items():  # noqa: SLF001
+            if thread_id != sampler_thread_id:
+                stack_counts[format_stack(frame)] += 1
+        time.sleep(interval_in_seconds)
+
+    return stack_counts
+
+
+def save_stack_samples(stack_counts: Counter[str], output_file_name: str) -> None:
+    with Path(output_file_name).open("w", encoding="utf8") as f:
+        f.writelines(
+            f"{stack} {count}\n" for stack, count in stack_counts.most_common()
+        )
+
+
+def save_memory_snapshot(
+    snapshot: tracemalloc.Snapshot,
+    output_file_name: str,
+    top_n: int = TOP_N_FOR_MEMORY_SNAPSHOT,
+) -> None:
+    top_stats = snapshot.statistics("traceback")
+
+    with Path(output_file_name).open("w", encoding="utf8") as f:
+        for stat in top_stats[:top_n]:
+            f.write(f"{stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+            f.writelines(f"    {line}\n" for line in stat.traceback.format())
+
+
+def dump_on_demand_profile(
+    script_name: str,
+    duration_in_seconds: float = SAMPLING_DURATION_IN_SECONDS,
+) -> None:
+    if not _sampling_lock.acquire(blocking=False):
+        print("[profiling] A profile is already being sampled. Signal ignored.")
+        return
+
+    try:
+        # Allocations are only traced during the sampling window, so that there is no overhead the rest of the time.
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start(NUM_FRAMES_FOR_MEMORY_TRACES)
+
+        stack_counts = sample_stacks(duration_in_seconds)
+        snapshot = tracemalloc.take_snapshot()
+
+        if not was_tracing:
+            tracemalloc.stop()
+
+        stack_file_name = get_profile_file_name(script_name, "_stacks.txt")
+        memory_file_name = get_profile_file_name(script_name, "_memory.txt")
+
+        save_stack_samples(stack_counts, stack_file_name)
+        save_memory_snapshot(snapshot, memory_file_name)
+
+        print(f"[profiling] Profiles saved to {stack_file_name} and {memory_file_name}")
+    finally:
+        _sampling_lock.release()
+
+
+def install_signal_handler(script_name: str) -> bool:
+    # SIGUSR1 is not available on Windows.
+    signal_number = getattr(signal, "SIGUSR1", None)
+
+    if (
+        signal_number is None
+        or threading.current_thread() is not threading.main_thread()
+    ):
+        return False
+
+    def handler(_signum: int, _frame: FrameType | None) -> None:
+        # Sampling happens in a background thread, so that the main thread keeps crawling meanwhile.
+        threading.Thread(
+            target=dump_on_demand_profile,
+            args=(script_name,),
+            daemon=True,
+        ).start()
+
+    signal.signal(signal_number, handler)
+
+    return True
+
+
+@contextmanager
+def profiling_hook(
+    script_name: str,
+    *,
+    profile_whole_run: bool | None = None,
+) -> Iterator[None]:
+    if profile_whole_run is None:
+        profile_whole_run = is_profiling_requested()
+
+    install_signal_handler(script_name)
+
+    if not profile_whole_run:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    try:
+        yield
+    finally:
+        profiler.disable()
+
+        output_file_name = get_profile_file_name(script_name, ".prof")
+        profiler.dump_stats(output_file_name)
+        print(
+            f"[profiling] Profile saved to {output_file_name}. Inspect it with: python -m pstats {output_file_name}",
+        )
+
+
+def main() -> bool:
+    dump_on_demand_profile("profiling_utils", duration_in_seconds=0.1)
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
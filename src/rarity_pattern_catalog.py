@@ -0,0 +1,171 @@
+# Objective: maintain a catalog of item rarity patterns C/UC/R per appID, for profile backgrounds and for emoticons, so
+# that routine gamble runs only need to crawl listings of Common rarity.
+#
+# The number of items of each rarity almost never changes once a game is published. The catalog is initialized with
+# the listings of Uncommon and Rare rarities which are stored on disk, then an appID is only refreshed if it is new, or
+# if its number of items of Common rarity has changed. A refresh costs two small searches restricted to the appID.
+
+from src.json_utils import load_json, save_json
+from src.market_gamble_utils import (
+    count_listing_hashes_per_app_id,
+    enumerate_item_rarity_patterns,
+    get_listing_indexes_with_other_rarity_tags,
+)
+from src.market_search import (
+    get_all_listings,
+    get_tag_item_class_no_for_emoticons,
+    get_tag_item_class_no_for_profile_backgrounds,
+)
+from src.utils import (
+    get_category_name_for_emoticons,
+    get_category_name_for_profile_backgrounds,
+    get_rarity_pattern_catalog_file_name,
+)
+
+
+def load_rarity_pattern_catalog(
+    catalog_file_name: str | None = None,
+) -> dict[str, dict[str, dict]]:
+    if catalog_file_name is None:
+        catalog_file_name = get_rarity_pattern_catalog_file_name()
+
+    try:
+        catalog = load_json(catalog_file_name)
+    except FileNotFoundError:
+        catalog = {}
+
+    return catalog
+
+
+def save_rarity_pattern_catalog(
+    catalog: dict[str, dict[str, dict]],
+    catalog_file_name: str | None = None,
+) -> None:
+    if catalog_file_name is None:
+        catalog_file_name = get_rarity_pattern_catalog_file_name()
+
+    save_json(catalog, catalog_file_name)
+
+
+def build_rarity_patterns_from_listings_on_disk(
+    listing_hashes_per_app_id_for_common: dict[str, int],
+    *,
+    look_for_profile_backgrounds: bool,
+) -> dict[str, dict]:
+    (
+        listing_index_for_uncommon,
+        listing_index_for_rare,
+    ) = get_listing_indexes_with_other_rarity_tags(
+        look_for_profile_backgrounds=look_for_profile_backgrounds,
+    )
+
+    return enumerate_item_rarity_patterns(
+        listing_hashes_per_app_id_for_common,
+        count_listing_hashes_per_app_id(listing_index_for_uncommon),
+        count_listing_hashes_per_app_id(listing_index_for_rare),
+    )
+
+
+def find_app_ids_to_refresh(
+    rarity_patterns: dict[str, dict],
+    listing_hashes_per_app_id_for_common: dict[str, int],
+) -> list[str]:
+    # New appIDs, and appIDs whose number of items of Common rarity has changed.
+    app_ids_to_refresh = [
+        app_id
+        for app_id, num_common in listing_hashes_per_app_id_for_common.items()
+        if app_id not in rarity_patterns
+        or rarity_patterns[app_id]["common"] != num_common
+    ]
+
+    return sorted(app_ids_to_refresh, key=int)
+
+
+def download_rarity_pattern_for_app_id(
+    app_id: str,
+    num_common: int,
+    *,
+    look_for_profile_backgrounds: bool,
+) -> dict[str, int | None]:
+    if look_for_profile_backgrounds:
+        tag_item_class_no = get_tag_item_class_no_for_profile_backgrounds()
+    else:
+        tag_item_class_no = get_tag_item_class_no_for_emoticons()
+
+    rarity_pattern: dict[str, int | None] = {"common": num_common}
+
+    # NB: get_all_listings() waits for the shared rate limiter of search pages itself.
+    for rarity in ["uncommon", "rare"]:
+        listings = get_all_listings(
+            tag_item_class_no=tag_item_class_no,
+            rarity=rarity,
+            tag_app_id=app_id,
+        )
+
+        # NB: the number is unknown, rather than zero, if there is no listing, as for enumerate_item_rarity_patterns().
+        rarity_pattern[rarity] = len(listings) if listings else None
+
+    return rarity_pattern
+
+
+def get_item_rarity_patterns_per_app_id(
+    listing_hashes_per_app_id_for_common: dict[str, int],
+    catalog_file_name: str | None = None,
+    *,
+    look_for_profile_backgrounds: bool,
+    retrieve_missing_rarity_patterns: bool = True,
+    verbose: bool = True,
+) -> dict[str, dict]:
+    if look_for_profile_backgrounds:
+        category_name = get_category_name_for_profile_backgrounds()
+    else:
+        category_name = get_category_name_for_emoticons()
+
+    catalog = load_rarity_pattern_catalog(catalog_file_name)
+
+    if category_name not in catalog:
+        print(f"Initializing the catalog of rarity patterns for {category_name}.")
+        catalog[category_name] = build_rarity_patterns_from_listings_on_disk(
+            listing_hashes_per_app_id_for_common,
+            look_for_profile_backgrounds=look_for_profile_backgrounds,
+        )
+        save_rarity_pattern_catalog(catalog, catalog_file_name)
+
+    rarity_patterns = catalog[category_name]
+
+    app_ids_to_refresh = find_app_ids_to_refresh(
+        rarity_patterns,
+        listing_hashes_per_app_id_for_common,
+    )
+
+    if verbose:
+        print(
+            f"Catalog of rarity patterns for {category_name}: {len(app_ids_to_refresh)} out of {len(listing_hashes_per_app_id_for_common)} appIDs to refresh.",
+        )
+
+    if retrieve_missing_rarity_patterns and app_ids_to_refresh:
+        for app_id in app_ids_to_refresh:
+            rarity_patterns[app_id] = download_rarity_pattern_for_app_id(
+                app_id,
+                listing_hashes_per_app_id_for_common[app_id],
+                look_for_profile_backgrounds=look_for_profile_backgrounds,
+            )
+
+        save_rarity_pattern_catalog(catalog, catalog_file_name)
+
+    item_rarity_patterns_per_app_id = {}
+
+    for app_id, num_common in listing_hashes_per_app_id_for_common.items():
+        if app_id in rarity_patterns:
+            item_rarity_patterns_per_app_id[app_id] = rarity_patterns[app_id] | {
+                "common": num_common,
+            }
+        else:
+            # Unknown numbers of items of Uncommon and Rare rarities, until the appID is refreshed.
+            item_rarity_patterns_per_app_id[app_id] = {
+                "common": num_common,
+                "uncommon": None,
+                "rare": None,
+            }
+
+    return item_rarity_patterns_per_app_id
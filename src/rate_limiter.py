@@ -0,0 +1,147 @@
+# Objective: share a query budget between the threads which query the same Steam endpoint.
+#
+# A rate limiter allows at most `max_num_queries` queries during any window of `cooldown` seconds, with a minimal delay
+# between two consecutive queries. The budgets are taken from get_rate_limits(), and shared per endpoint.
+
+import threading
+import time
+from collections import deque
+
+from src.api_utils import INTER_REQUEST_COOLDOWN_FIELD, get_rate_limits
+
+_shared_rate_limiters: dict[str, dict] = {}
+_shared_rate_limiters_lock = threading.Lock()
+
+
+def create_rate_limiter(
+    api_type: str,
+    *,
+    has_secured_cookie: bool = False,
+) -> dict:
+    rate_limits = get_rate_limits(api_type, has_secured_cookie=has_secured_cookie)
+
+    return {
+        "api_type": api_type,
+        "max_num_queries": rate_limits["max_num_queries"],
+        "cooldown": rate_limits["cooldown"],
+        INTER_REQUEST_COOLDOWN_FIELD: rate_limits[INTER_REQUEST_COOLDOWN_FIELD],
+        "query_timestamps": deque(),
+        "paused_until": 0.0,
+        "lock": threading.Lock(),
+    }
+
+
+def get_shared_rate_limiter(
+    api_type: str,
+    *,
+    has_secured_cookie: bool = False,
+) -> dict:
+    # The budget is shared by every batch of the process, so that consecutive batches do not exceed the rate limits.
+    key = f"{api_type}:{has_secured_cookie}"
+
+    with _shared_rate_limiters_lock:
+        if key not in _shared_rate_limiters:
+            _shared_rate_limiters[key] = create_rate_limiter(
+                api_type,
+                has_secured_cookie=has_secured_cookie,
+            )
+
+        return _shared_rate_limiters[key]
+
+
+def compute_waiting_time(rate_limiter: dict, current_time: float) -> float:
+    query_timestamps = rate_limiter["query_timestamps"]
+
+    # Forget about queries which are out of the sliding window.
+    while (
+        query_timestamps
+        and query_timestamps[0] + rate_limiter["cooldown"] <= current_time
+    ):
+        query_timestamps.popleft()
+
+    waiting_time = rate_limiter["paused_until"] - current_time
+
+    if len(query_timestamps) >= rate_limiter["max_num_queries"]:
+        waiting_time = max(
+            waiting_time,
+            query_timestamps[0] + rate_limiter["cooldown"] - current_time,
+        )
+
+    if query_timestamps:
+        waiting_time = max(
+            waiting_time,
+            query_timestamps[-1]
+            + rate_limiter[INTER_REQUEST_COOLDOWN_FIELD]
+            - current_time,
+        )
+
+    return max(0.0, waiting_time)
+
+
+def wait_for_rate_limiter(rate_limiter: dict, *, verbose: bool = False) -> None:
+    # Block until a query is allowed, then count it. The lock is held while waiting, so that threads are served in turn.
+    with rate_limiter["lock"]:
+        waiting_time = compute_waiting_time(rate_limiter, time.monotonic())
+
+        if waiting_time > 0:
+            if verbose:
+                print(
+                    f"[{rate_limiter['api_type']}] Budget of {rate_limiter['max_num_queries']} queries reached. Cooldown: {waiting_time:.0f} seconds",
+                )
+            time.sleep(waiting_time)
+
+        rate_limiter["query_timestamps"].append(time.monotonic())
+
+
+def pause_rate_limiter(
+    rate_limiter: dict,
+    duration_in_seconds: float | None = None,
+) -> None:
+    # Typically called after a status code 429, so that every thread waits for the end of the cooldown.
+    if duration_in_seconds is None:
+        duration_in_seconds = rate_limiter["cooldown"]
+
+    with rate_limiter["lock"]:
+        rate_limiter["paused_until"] = max(
+            rate_limiter["paused_until"],
+            time.monotonic() + duration_in_seconds,
+        )
+
+
+def is_rate_limiter_exhausted(rate_limiter: dict) -> bool:
+    # Return True if the next query has to wait for the end of a cooldown, rather than for the delay between queries.
+    # Typically called to save temporary data to disk before a long wait.
+    with rate_limiter["lock"]:
+        current_time = time.monotonic()
+        compute_waiting_time(rate_limiter, current_time)
+
+        return (
+            len(rate_limiter["query_timestamps"]) >= rate_limiter["max_num_queries"]
+            or rate_limiter["paused_until"] > current_time
+        )
+
+
+def try_to_acquire_rate_limiter(
+    rate_limiter: dict,
+    num_reserved_queries: int = 0,
+) -> bool:
+    # Count a query and return True if it is allowed right now, without waiting, and without drawing from the queries
+    # reserved for other threads. Typically called by low-priority background work, which gives way to the foreground:
+    # the lock is held by any thread waiting for the rate limiter, in which case the query is not allowed.
+    if not rate_limiter["lock"].acquire(blocking=False):
+        return False
+
+    try:
+        current_time = time.monotonic()
+
+        is_allowed = compute_waiting_time(rate_limiter, current_time) == 0 and (
+            len(rate_limiter["query_timestamps"])
+            < rate_limiter["max_num_queries"] - num_reserved_queries
+        )
+
+        if is_allowed:
+            rate_limiter["query_timestamps"].append(current_time)
+    finally:
+        rate_limiter["lock"].release()
+
+    return is_allowed
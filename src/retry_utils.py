@@ -0,0 +1,142 @@
+# Objective: retry transient failures of queries to Steam, with an exponential backoff.
+#
+# The policy shared by batch fetchers is:
+# - a query is retried a few times, with an exponential backoff, if its status code is retryable,
+# - an item which still fails is put in a retry queue, so that it does not abort the batch, and the queue is processed
+#   again at the end of the batch,
+# - all the retries of a batch draw from a retry budget, so that a batch does not retry forever during an outage.
+
+import random
+import threading
+import time
+from collections.abc import Callable
+from http import HTTPStatus
+from typing import Final
+
+DEFAULT_MAX_NUM_ATTEMPTS: Final[int] = 3
+BASE_BACKOFF_IN_SECONDS: Final[float] = 2.0
+MAX_BACKOFF_IN_SECONDS: Final[float] = 60.0
+DEFAULT_MAX_NUM_RETRIES_PER_BATCH: Final[int] = 100
+
+SUCCESSFUL_STATUS_CODES: Final[set[int]] = {
+    HTTPStatus.OK,
+    HTTPStatus.NOT_MODIFIED,
+}
+
+RETRYABLE_STATUS_CODES: Final[set[int]] = {
+    HTTPStatus.TOO_MANY_REQUESTS,
+    HTTPStatus.INTERNAL_SERVER_ERROR,
+    HTTPStatus.BAD_GATEWAY,
+    HTTPStatus.SERVICE_UNAVAILABLE,
+    HTTPStatus.GATEWAY_TIMEOUT,
+}
+
+
+# Retry budgets may be shared by several threads.
+_retry_budget_lock = threading.Lock()
+
+
+def is_successful_status_code(status_code: int | None) -> bool:
+    return status_code in SUCCESSFUL_STATUS_CODES
+
+
+def is_retryable_status_code(status_code: int | None) -> bool:
+    # NB: the status code is None if no response was received, e.g. after a timeout or a connection error.
+    return status_code is None or status_code in RETRYABLE_STATUS_CODES
+
+
+def compute_backoff_in_seconds(
+    attempt_no: int,
+    base_backoff_in_seconds: float = BASE_BACKOFF_IN_SECONDS,
+    max_backoff_in_seconds: float = MAX_BACKOFF_IN_SECONDS,
+) -> float:
+    # Exponential backoff with "full jitter", so that concurrent threads do not retry all at once.
+    # Reference: https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+    backoff_in_seconds = min(
+        max_backoff_in_seconds,
+        base_backoff_in_seconds * 2**attempt_no,
+    )
+
+    return random.uniform(0, backoff_in_seconds)  # noqa: S311
+
+
+def create_retry_budget(max_num_retries: int | None = None) -> dict[str, int]:
+    if max_num_retries is None:
+        max_num_retries = DEFAULT_MAX_NUM_RETRIES_PER_BATCH
+
+    return {"num_remaining_retries": max_num_retries}
+
+
+def consume_retry_budget(retry_budget: dict[str, int] | None) -> bool:
+    # Return True if a retry is allowed. NB: without any budget, retries are not limited.
+    if retry_budget is None:
+        return True
+
+    with _retry_budget_lock:
+        if retry_budget["num_remaining_retries"] <= 0:
+            return False
+
+        retry_budget["num_remaining_retries"] -= 1
+
+    return True
+
+
+def request_with_retries[T](
+    request_fn: Callable[[], tuple[T, int | None]],
+    max_num_attempts: int = DEFAULT_MAX_NUM_ATTEMPTS,
+    retry_budget: dict[str, int] | None = None,
+    on_rate_limited: Callable[[], None] | None = None,
+) -> tuple[T, int | None]:
+    # The request function returns its result, and the status code, which is None if no response was received.
+    for attempt_no in range(max_num_attempts):
+        result, status_code = request_fn()
+
+        if is_successful_status_code(status_code) or not is_retryable_status_code(
+            status_code,
+        ):
+            break
+
+        if status_code == HTTPStatus.TOO_MANY_REQUESTS and on_rate_limited is not None:
+            on_rate_limited()
+
+        if attempt_no + 1 >= max_num_attempts or not consume_retry_budget(
+            retry_budget,
+        ):
+            break
+
+        time.sleep(compute_backoff_in_seconds(attempt_no))
+
+    return result, status_code
+
+
+def process_retry_queue[T](
+    retry_queue: list[T],
+    process_fn: Callable[[T], bool],
+    max_num_rounds: int = DEFAULT_MAX_NUM_ATTEMPTS,
+    retry_budget: dict[str, int] | None = None,
+    *,
+    verbose: bool = True,
+) -> list[T]:
+    # Process failed items again, after a backoff, until they succeed, or until the number of rounds or the retry
+    # budget is exhausted. The process function returns True on success. Return the items which still fail.
+    for round_no in range(max_num_rounds):
+        if not retry_queue:
+            break
+
+        if verbose:
+            print(
+                f"Retry n°{round_no + 1}: processing {len(retry_queue)} failed items again.",
+            )
+
+        time.sleep(compute_backoff_in_seconds(round_no))
+
+        retry_queue = [
+            item
+            for item in retry_queue
+            if not consume_retry_budget(retry_budget) or not process_fn(item)
+        ]
+
+    if verbose and retry_queue:
+        print(f"{len(retry_queue)} items still failed after all the retries.")
+
+    return retry_queue
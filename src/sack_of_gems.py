@@ -1,13 +1,22 @@
 # Objective: retrieve the price which sellers ask for a 'Sack of Gems'.
 
+from datetime import timedelta
 from http import HTTPStatus
+from typing import Final
 
+from src.creation_time_utils import get_current_time, to_timestamp
+from src.data_context import get_value_with_memo
 from src.json_utils import load_json, save_json
 from src.market_listing import get_listing_details
-from src.market_order import download_market_order_data
+from src.market_order import UPDATE_COOLDOWN_FIELD, download_market_order_data
 from src.personal_info import get_cookie_dict
 from src.utils import get_sack_of_gems_listing_file_name
 
+# The item name ID of the 'Sack of Gems' listing never changes, so there is no need to scrape the listing page.
+SACK_OF_GEMS_ITEM_NAMEID: Final[str] = "26463978"
+# The price of a sack of gems is downloaded at most once per this duration, across runs.
+GEM_PRICE_CACHE_DURATION_IN_MINUTES: Final[int] = 60
+
 
 def get_listing_hash_for_gems() -> str:
     return "753-Sack of Gems"
@@ -19,21 +28,102 @@ def get_num_gems_per_sack_of_gems() -> int:
 
 def download_sack_of_gems_price(
     sack_of_gems_listing_file_name: str | None = None,
+    max_age_in_minutes: int = GEM_PRICE_CACHE_DURATION_IN_MINUTES,
     *,
     verbose: bool = True,
 ) -> float:
     if sack_of_gems_listing_file_name is None:
         sack_of_gems_listing_file_name = get_sack_of_gems_listing_file_name()
 
-    cookie = get_cookie_dict()
+    # NB: within a shared data context, the price is only downloaded once per run. Across runs and processes, the
+    # price saved to disk is re-used if it is recent enough.
+    return get_value_with_memo(
+        "sack_of_gems_price",
+        lambda: (
+            load_recent_sack_of_gems_price(
+                sack_of_gems_listing_file_name,
+                max_age_in_minutes,
+            )
+            or download_sack_of_gems_price_from_scratch(
+                sack_of_gems_listing_file_name,
+                verbose=verbose,
+            )
+        ),
+    )
+
+
+def load_sack_of_gems_listing_details(
+    sack_of_gems_listing_file_name: str,
+) -> dict[str, dict]:
+    try:
+        listing_details = load_json(sack_of_gems_listing_file_name)
+    except FileNotFoundError:
+        listing_details = {}
+
+    return listing_details
+
+
+def load_recent_sack_of_gems_price(
+    sack_of_gems_listing_file_name: str,
+    max_age_in_minutes: int = GEM_PRICE_CACHE_DURATION_IN_MINUTES,
+) -> float | None:
+    listing_hash = get_listing_hash_for_gems()
+    listing_details = load_sack_of_gems_listing_details(sack_of_gems_listing_file_name)
+
+    try:
+        last_update_timestamp = listing_details[listing_hash][UPDATE_COOLDOWN_FIELD]
+        sack_of_gems_price = listing_details[listing_hash]["ask"]
+    except KeyError:
+        return None
+
+    threshold_timestamp = to_timestamp(
+        get_current_time() - timedelta(minutes=max_age_in_minutes),
+    )
+
+    if last_update_timestamp < threshold_timestamp or sack_of_gems_price <= 0:
+        return None
+
+    return sack_of_gems_price
+
+
+def download_sack_of_gems_price_from_scratch(
+    sack_of_gems_listing_file_name: str,
+    *,
+    verbose: bool = True,
+) -> float:
     listing_hash = get_listing_hash_for_gems()
+    listing_details = load_sack_of_gems_listing_details(sack_of_gems_listing_file_name)
+    last_known_details = listing_details.get(listing_hash, {})
+
+    # The item name ID is constant, so the pinned item name ID is used until one is saved along with a valid price.
+    item_nameid = last_known_details.get("item_nameid")
 
-    listing_details, status_code = get_listing_details(
-        listing_hash=listing_hash,
-        cookie=cookie,
+    bid_price, ask_price, bid_volume, ask_volume = download_market_order_data(
+        listing_hash,
+        item_nameid or SACK_OF_GEMS_ITEM_NAMEID,
+        verbose=verbose,
     )
 
-    if status_code == HTTPStatus.OK:
+    # NB: if no valid price is downloaded, the last known price is re-used, even if it has expired, instead of spending
+    # a query of listing pages. It is not saved again, so that a new price is downloaded at the next call.
+    last_known_price = last_known_details.get("ask", -1)
+    if ask_price <= 0 and last_known_price > 0:
+        if verbose:
+            print(
+                f"Re-using the last known price of a sack of gems: {last_known_price:.2f} €.",
+            )
+        return last_known_price
+
+    # The listing page is only fetched if the pinned item name ID, which was never confirmed, does not work.
+    if ask_price <= 0 and item_nameid is None:
+        listing_details, status_code = get_listing_details(
+            listing_hash=listing_hash,
+            cookie=get_cookie_dict(),
+        )
+
+        if status_code != HTTPStatus.OK:
+            raise AssertionError
+
         item_nameid = listing_details[listing_hash]["item_nameid"]
 
         bid_price, ask_price, bid_volume, ask_volume = download_market_order_data(
@@ -41,16 +131,22 @@ def download_sack_of_gems_price(
             item_nameid,
             verbose=verbose,
         )
-        listing_details[listing_hash]["bid"] = bid_price
-        listing_details[listing_hash]["ask"] = ask_price
-        listing_details[listing_hash]["bid_volume"] = bid_volume
-        listing_details[listing_hash]["ask_volume"] = ask_volume
+    else:
+        if ask_price > 0:
+            last_known_details["item_nameid"] = item_nameid or SACK_OF_GEMS_ITEM_NAMEID
+        listing_details[listing_hash] = last_known_details
+
+    listing_details[listing_hash]["bid"] = bid_price
+    listing_details[listing_hash]["ask"] = ask_price
+    listing_details[listing_hash]["bid_volume"] = bid_volume
+    listing_details[listing_hash]["ask_volume"] = ask_volume
+    listing_details[listing_hash][UPDATE_COOLDOWN_FIELD] = to_timestamp(
+        get_current_time(),
+    )
 
-        sack_of_gems_price = ask_price
+    sack_of_gems_price = ask_price
 
-        save_json(listing_details, sack_of_gems_listing_file_name)
-    else:
-        raise AssertionError
+    save_json(listing_details, sack_of_gems_listing_file_name)
 
     return sack_of_gems_price
 
@@ -0,0 +1,338 @@
+# Objective: time the stages of each entry-point workflow, and keep a history of runs to spot regressions.
+#
+# Usage:
+#   - decorate a workflow with @track_workflow("workflow name"),
+#   - wrap each stage with `with track_stage("stage name", items_in) as stage:` and call `set_num_items_out()`,
+#   - report cache hits and misses with record_cache_lookup(),
+#   - run `python -m src.telemetry_utils` to compare the last runs of each workflow.
+#
+# NB: if no run is active, stages and cache lookups are simply not recorded, so library functions can be instrumented
+#     without any side effect for callers which do not care about telemetry.
+
+import functools
+import statistics
+import time
+from collections.abc import Callable, Iterator, Sized
+from contextlib import contextmanager
+from typing import Final
+
+from src.creation_time_utils import get_current_time, to_timestamp
+from src.data_context import join_background_threads
+from src.json_utils import load_json, save_json
+from src.utils import get_run_history_file_name
+
+MAX_NUM_RUNS_IN_HISTORY: Final[int] = 200
+DEFAULT_NUM_RUNS_TO_COMPARE: Final[int] = 5
+# A stage is flagged if it is this many times slower than the median of the previous runs...
+REGRESSION_RATIO_THRESHOLD: Final[float] = 1.5
+# ... and if it lasts long enough for the slowdown to matter.
+MIN_DURATION_FOR_REGRESSION_IN_SECONDS: Final[float] = 1.0
+
+_current_run: dict | None = None
+
+
+def get_current_run() -> dict | None:
+    return _current_run
+
+
+def start_run(workflow_name: str) -> dict:
+    global _current_run  # noqa: PLW0603
+
+    _current_run = {
+        "workflow": workflow_name,
+        "start_timestamp": to_timestamp(get_current_time()),
+        "duration_in_seconds": None,
+        "stages": [],
+        "cache": {},
+        "_start_counter": time.perf_counter(),
+    }
+
+    return _current_run
+
+
+def count_items(items: Sized | int | None) -> int | None:
+    if items is None or isinstance(items, int):
+        return items
+
+    return len(items)
+
+
+def set_num_items_out(stage: dict, items_out: Sized | int | None) -> None:
+    stage["num_items_out"] = count_items(items_out)
+
+
+@contextmanager
+def track_stage(
+    stage_name: str,
+    items_in: Sized | int | None = None,
+) -> Iterator[dict]:
+    stage = {
+        "name": stage_name,
+        "duration_in_seconds": None,
+        "num_items_in": count_items(items_in),
+        "num_items_out": None,
+    }
+
+    start_counter = time.perf_counter()
+
+    try:
+        yield stage
+    finally:
+        stage["duration_in_seconds"] = time.perf_counter() - start_counter
+
+        if _current_run is not None:
+            _current_run["stages"].append(stage)
+
+
+def record_cache_lookup(cache_name: str, *, is_hit: bool) -> None:
+    if _current_run is None:
+        return
+
+    cache_stats = _current_run["cache"].setdefault(cache_name, {"hits": 0, "misses": 0})
+
+    if is_hit:
+        cache_stats["hits"] += 1
+    else:
+        cache_stats["misses"] += 1
+
+
+def compute_cache_hit_rates(cache: dict[str, dict]) -> dict[str, float]:
+    hit_rates = {}
+
+    for cache_name, cache_stats in cache.items():
+        num_lookups = cache_stats["hits"] + cache_stats["misses"]
+        if num_lookups > 0:
+            hit_rates[cache_name] = cache_stats["hits"] / num_lookups
+
+    return hit_rates
+
+
+def load_run_history(run_history_file_name: str | None = None) -> list[dict]:
+    if run_history_file_name is None:
+        run_history_file_name = get_run_history_file_name()
+
+    try:
+        run_history = load_json(run_history_file_name)["runs"]
+    except FileNotFoundError:
+        run_history = []
+
+    return run_history
+
+
+def save_run_to_history(
+    run: dict,
+    run_history_file_name: str | None = None,
+) -> None:
+    if run_history_file_name is None:
+        run_history_file_name = get_run_history_file_name()
+
+    run_history = load_run_history(run_history_file_name)
+    run_history.append(run)
+
+    save_json(
+        {"runs": run_history[-MAX_NUM_RUNS_IN_HISTORY:]},
+        run_history_file_name,
+    )
+
+
+def end_run(
+    *,
+    save_to_disk: bool = True,
+    run_history_file_name: str | None = None,
+    verbose: bool = True,
+) -> dict | None:
+    global _current_run  # noqa: PLW0603
+
+    run = _current_run
+    _current_run = None
+
+    if run is None:
+        return None
+
+    run["duration_in_seconds"] = time.perf_counter() - run.pop("_start_counter")
+    run["cache_hit_rates"] = compute_cache_hit_rates(run["cache"])
+
+    if verbose:
+        print_run(run)
+
+    if save_to_disk:
+        save_run_to_history(run, run_history_file_name)
+
+    return run
+
+
+def track_workflow[**P, R](
+    workflow_name: str,
+) -> Callable[[Callable[P, R]], Callable[P, R]]:
+    # Decorator to record a run for each call to an entry-point workflow.
+    # Nested workflows (e.g. a workflow calling another one) are recorded within the outermost run.
+
+    def decorator(workflow: Callable[P, R]) -> Callable[P, R]:
+        @functools.wraps(workflow)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+            if _current_run is not None:
+                with track_stage(workflow_name):
+                    return workflow(*args, **kwargs)
+
+            start_run(workflow_name)
+            try:
+                return workflow(*args, **kwargs)
+            finally:
+                # NB: background threads may still record cache lookups, so they are joined before the run is closed.
+                join_background_threads()
+                end_run()
+
+        return wrapper
+
+    return decorator
+
+
+def format_num_items(stage: dict) -> str:
+    num_items_in = stage["num_items_in"]
+    num_items_out = stage["num_items_out"]
+
+    if num_items_in is None and num_items_out is None:
+        return ""
+
+    if num_items_out is None:
+        return f" ; #in = {num_items_in}"
+
+    return f" ; #in = {num_items_in} ; #out = {num_items_out}"
+
+
+def print_run(run: dict) -> None:
+    print(
+        f"\n# Timing for {run['workflow']}: {run['duration_in_seconds']:.2f} seconds",
+    )
+
+    for stage in run["stages"]:
+        print(
+            f"-   {stage['name']}: {stage['duration_in_seconds']:.2f} s{format_num_items(stage)}",
+        )
+
+    for cache_name, hit_rate in run["cache_hit_rates"].items():
+        print(f"-   cache hit rate for {cache_name}: {hit_rate:.0%}")
+
+
+def aggregate_stage_durations(run: dict) -> dict[str, dict]:
+    # Stages which are run several times within the same workflow are summed up.
+
+    aggregated_stages: dict[str, dict] = {}
+
+    for stage in run["stages"]:
+        aggregated_stage = aggregated_stages.setdefault(
+            stage["name"],
+            {"duration_in_seconds": 0.0, "num_items_in": None},
+        )
+        aggregated_stage["duration_in_seconds"] += stage["duration_in_seconds"]
+
+        if stage["num_items_in"] is not None:
+            aggregated_stage["num_items_in"] = (
+                aggregated_stage["num_items_in"] or 0
+            ) + stage["num_items_in"]
+
+    return aggregated_stages
+
+
+def compute_cost_per_item(aggregated_stage: dict) -> float:
+    # Normalize the duration by the number of input items, so that stages are not flagged merely because data grew.
+    num_items_in = aggregated_stage["num_items_in"]
+
+    if num_items_in:
+        return aggregated_stage["duration_in_seconds"] / num_items_in
+
+    return aggregated_stage["duration_in_seconds"]
+
+
+def find_regressed_stages(
+    runs: list[dict],
+    regression_ratio_threshold: float = REGRESSION_RATIO_THRESHOLD,
+) -> list[str]:
+    if len(runs) < 2:
+        return []
+
+    *previous_runs, latest_run = [aggregate_stage_durations(run) for run in runs]
+
+    regressed_stages = []
+
+    for stage_name, latest_stage in latest_run.items():
+        previous_costs = [
+            compute_cost_per_item(previous_run[stage_name])
+            for previous_run in previous_runs
+            if stage_name in previous_run
+        ]
+
+        if not previous_costs:
+            continue
+
+        reference_cost = statistics.median(previous_costs)
+
+        if (
+            latest_stage["duration_in_seconds"]
+            >= MIN_DURATION_FOR_REGRESSION_IN_SECONDS
+            and compute_cost_per_item(latest_stage)
+            > regression_ratio_threshold * reference_cost
+        ):
+            regressed_stages.append(stage_name)
+
+    return regressed_stages
+
+
+def compare_last_runs(
+    workflow_name: str,
+    num_runs: int = DEFAULT_NUM_RUNS_TO_COMPARE,
+    run_history: list[dict] | None = None,
+    *,
+    verbose: bool = True,
+) -> list[str]:
+    if run_history is None:
+        run_history = load_run_history()
+
+    runs = [run for run in run_history if run["workflow"] == workflow_name][-num_runs:]
+
+    regressed_stages = find_regressed_stages(runs)
+
+    if verbose:
+        print(f"\n# Last {len(runs)} runs for {workflow_name}")
+
+        aggregated_runs = [aggregate_stage_durations(run) for run in runs]
+        stage_names = list(
+            dict.fromkeys(
+                stage_name
+                for aggregated_run in aggregated_runs
+                for stage_name in aggregated_run
+            ),
+        )
+
+        for stage_name in stage_names:
+            durations = [
+                (
+                    f"{aggregated_run[stage_name]['duration_in_seconds']:8.2f}"
+                    if stage_name in aggregated_run
+                    else f"{'-':>8}"
+                )
+                for aggregated_run in aggregated_runs
+            ]
+            flag = " <-- regression" if stage_name in regressed_stages else ""
+            print(f"{stage_name:<40}{''.join(durations)}{flag}")
+
+        print(
+            f"{'total':<40}{''.join(f'{run["duration_in_seconds"]:8.2f}' for run in runs)}",
+        )
+
+    return regressed_stages
+
+
+def main(num_runs: int = DEFAULT_NUM_RUNS_TO_COMPARE) -> bool:
+    run_history = load_run_history()
+
+    workflow_names = dict.fromkeys(run["workflow"] for run in run_history)
+
+    for workflow_name in workflow_names:
+        compare_last_runs(workflow_name, num_runs=num_runs, run_history=run_history)
+
+    return True
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,17 @@
 from pathlib import Path
-
-import requests
+from typing import TYPE_CHECKING
 
 from src.tag_utils import get_tag_drop_rate_str
 
+if TYPE_CHECKING:
+    import requests
+
 TIMEOUT_IN_SECONDS = 5
 SEARCH_TIMEOUT_IN_SECONDS = 3 * TIMEOUT_IN_SECONDS
 LISTING_TIMEOUT_IN_SECONDS = 3 * TIMEOUT_IN_SECONDS
 
 
-def get_jar(resp_data: requests.Response) -> dict:
+def get_jar(resp_data: "requests.Response") -> dict:
     return resp_data.cookies.get_dict()
 
 
@@ -129,6 +131,28 @@ def get_next_creation_time_file_name() -> str:
     return get_data_folder() + "next_creation_times.json"
 
 
+def get_rarity_pattern_catalog_file_name() -> str:
+    return get_data_folder() + "rarity_patterns.json"
+
+
+def get_run_history_file_name() -> str:
+    return get_data_folder() + "run_history.json"
+
+
+def get_http_cache_folder() -> str:
+    http_cache_folder = get_data_folder() + "http_cache/"
+    Path(http_cache_folder).mkdir(exist_ok=True)
+
+    return http_cache_folder
+
+
+def get_profile_folder() -> str:
+    profile_folder = get_data_folder() + "profiles/"
+    Path(profile_folder).mkdir(exist_ok=True)
+
+    return profile_folder
+
+
 def main() -> bool:
     for file_name in (
         get_badge_creation_file_name(from_javascript=False),
@@ -138,6 +162,7 @@ def main() -> bool:
         get_market_order_file_name(),
         get_next_creation_time_file_name(),
         get_listing_details_output_file_name(),
+        get_run_history_file_name(),
     ):
         print(file_name)
 
@@ -1,20 +1,97 @@
+import os
+import shutil
+import tempfile
+import threading
 import unittest
+from pathlib import Path
+from unittest import mock
 
 import market_arbitrage
+import market_arbitrage_with_foil_cards
 from src import (
     batch_create_packs,
+    crafting_scheduler,
     creation_time_utils,
+    data_context,
     drop_rate_estimates,
+    foil_benchmark_utils,
+    gamble_expected_value,
+    goo_value_predictor,
+    http_cache,
+    import_time_utils,
+    inventory_utils,
+    item_nameid_backfill,
+    item_type_inference,
+    job_scheduler,
+    json_utils,
+    listing_index,
+    market_foil_utils,
     market_listing,
     market_order,
     market_search,
     market_utils,
     parsing_utils,
+    profiling_utils,
+    rarity_pattern_catalog,
+    rate_limiter,
+    retry_utils,
     sack_of_gems,
+    telemetry_utils,
     transaction_fee,
     utils,
 )
 
+_temp_dir: tempfile.TemporaryDirectory | None = None
+_patches: list = []
+
+
+def setUpModule() -> None:
+    # Files written by the tests are redirected to a temporary folder, so that tracked data files are not rewritten.
+    global _temp_dir  # noqa: PLW0603
+
+    _temp_dir = tempfile.TemporaryDirectory()
+
+    listing_details_output_file_name = str(
+        Path(_temp_dir.name) / "listing_details.json",
+    )
+    shutil.copy(
+        utils.get_listing_details_output_file_name(),
+        listing_details_output_file_name,
+    )
+
+    _patches.extend(
+        [
+            mock.patch(
+                "src.telemetry_utils.get_run_history_file_name",
+                return_value=str(Path(_temp_dir.name) / "run_history.json"),
+            ),
+            mock.patch(
+                "src.market_listing.get_listing_details_output_file_name",
+                return_value=listing_details_output_file_name,
+            ),
+            mock.patch(
+                "src.item_nameid_backfill.get_listing_details_output_file_name",
+                return_value=listing_details_output_file_name,
+            ),
+            # Failed queries are neither retried by batches nor delayed by a backoff, so that the tests do not wait for
+            # minutes, e.g. for the rate limiter once the retries of failed queries have exhausted its budget.
+            mock.patch("src.retry_utils.DEFAULT_MAX_NUM_RETRIES_PER_BATCH", 0),
+            mock.patch("src.retry_utils.time"),
+        ],
+    )
+
+    for patch in _patches:
+        patch.start()
+
+
+def tearDownModule() -> None:
+    for patch in _patches:
+        patch.stop()
+    _patches.clear()
+
+    if _temp_dir is not None:
+        _temp_dir.cleanup()
+
 
 class TestMarketListingMethods(unittest.TestCase):
     @staticmethod
@@ -32,6 +109,80 @@ class TestMarketListingMethods(unittest.TestCase):
 
         assert len(all_listing_details) == len(listing_hashes)
 
+    @staticmethod
+    def test_get_item_nameid_batch() -> None:
+        listing_details = {
+            "753-Sack of Gems": {"item_nameid": 1, "is_marketable": True},
+        }
+        streamed_listing_details = {}
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            listing_details_output_file_name = str(Path(temp_dir) / "details.json")
+            json_utils.save_json(listing_details, listing_details_output_file_name)
+
+            item_nameids = market_listing.get_item_nameid_batch(
+                list(listing_details),
+                listing_details_output_file_name=listing_details_output_file_name,
+                on_listing_details=streamed_listing_details.__setitem__,
+            )
+
+        # Item name IDs found on disk are streamed at once.
+        assert streamed_listing_details == listing_details
+        assert item_nameids == listing_details
+
+    @staticmethod
+    def test_get_item_nameid_batch_with_a_missing_listing_page() -> None:
+        listing_details = {
+            "753-Sack of Gems": {"item_nameid": 1, "is_marketable": True},
+        }
+        missing_listing_hash = "407420-Gabe Newell Simulator Booster Pack"
+
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch(
+                "src.market_listing.get_listing_details",
+                return_value=({}, 404),
+            ),
+        ):
+            listing_details_output_file_name = str(Path(temp_dir) / "details.json")
+            json_utils.save_json(listing_details, listing_details_output_file_name)
+
+            item_nameids = market_listing.get_item_nameid_batch(
+                [*listing_details, missing_listing_hash],
+                listing_details_output_file_name=listing_details_output_file_name,
+            )
+
+        # A listing page which could not be downloaded is skipped.
+        assert item_nameids == listing_details
+
+    @staticmethod
+    def test_update_marketability_status_bypasses_the_cache() -> None:
+        listing_hash = "753-Sack of Gems"
+        listing_details = {listing_hash: {"item_nameid": 1, "is_marketable": False}}
+
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch(
+                "src.market_listing.get_listing_details",
+                return_value=(
+                    {listing_hash: {"item_nameid": 1, "is_marketable": True}},
+                    200,
+                ),
+            ) as get_listing_details,
+        ):
+            listing_details_output_file_name = str(Path(temp_dir) / "details.json")
+            json_utils.save_json(listing_details, listing_details_output_file_name)
+
+            item_nameids = market_listing.get_item_nameid_batch(
+                [],
+                listing_details_output_file_name=listing_details_output_file_name,
+                listing_hashes_to_forcefully_process=[listing_hash],
+            )
+
+        # Listing pages are cached forever, so the marketability status is refreshed without the cache.
+        assert get_listing_details.call_args.kwargs["use_cache"] is False
+        assert item_nameids[listing_hash]["is_marketable"] is True
+
     @staticmethod
     def test_main() -> None:
         assert market_listing.main() is True
@@ -44,11 +195,83 @@ class TestParsingUtilsMethods(unittest.TestCase):
 
 
 class TestCreationTimeUtilsMethods(unittest.TestCase):
+    @staticmethod
+    def test_determine_whether_a_booster_pack_can_be_crafted() -> None:
+        current_time = creation_time_utils.get_current_time()
+
+        for delay_in_days, can_be_crafted in [(-2, True), (1, False)]:
+            next_creation_time = creation_time_utils.get_formatted_current_time(
+                delay_in_days=delay_in_days,
+            )
+
+            assert (
+                creation_time_utils.determine_whether_a_booster_pack_can_be_crafted(
+                    {"next_creation_time": next_creation_time},
+                    current_time,
+                )
+                is can_be_crafted
+            )
+
     @staticmethod
     def test_main() -> None:
         assert creation_time_utils.main() is True
 
 
+class TestCraftingSchedulerMethods(unittest.TestCase):
+    @staticmethod
+    def test_build_crafting_schedule() -> None:
+        next_creation_times = {
+            "440": creation_time_utils.get_formatted_current_time(delay_in_days=1),
+        }
+
+        schedule = crafting_scheduler.build_crafting_schedule(
+            ["440", "570"],
+            next_creation_times,
+        )
+
+        # The appID without any next creation time can be crafted first.
+        assert schedule[0][1] == "570"
+        assert schedule[0][0] < max(schedule)[0]
+
+    @staticmethod
+    def test_check_arbitrage_for_app_id() -> None:
+        listing_hash = "440-Team Fortress 2 Booster Pack"
+        badge_data = {
+            "440": {
+                "listing_hash": listing_hash,
+                "gem_amount": 400,
+                "gem_price": 0.0,
+                "sell_price": 0.0,
+            },
+        }
+
+        with (
+            mock.patch("src.crafting_scheduler.get_gem_price", return_value=0.001),
+            mock.patch(
+                "src.crafting_scheduler.load_market_order_data_from_disk",
+                return_value={},
+            ),
+            mock.patch(
+                "src.crafting_scheduler.download_market_order_data_batch",
+                return_value={listing_hash: {"bid": 0.5, "ask": 0.6}},
+            ),
+            mock.patch(
+                "src.crafting_scheduler.find_badge_arbitrages",
+                return_value={},
+            ) as find_fn,
+        ):
+            crafting_scheduler.check_arbitrage_for_app_id(
+                "440",
+                badge_data,
+                verbose=False,
+            )
+
+        # Prices are refreshed just before the decision, without altering the badge data.
+        assert find_fn.call_args.args[0]["440"]["gem_price"] == 0.4
+        assert find_fn.call_args.args[0]["440"]["sell_price"] == 0.6
+        assert badge_data["440"]["gem_price"] == 0.0
+
+
 class TestSackOfGemsMethods(unittest.TestCase):
     @staticmethod
     def test_download_sack_of_gems_price() -> None:
@@ -62,12 +285,103 @@ class TestSackOfGemsMethods(unittest.TestCase):
 
         assert sack_of_gems_price > 0
 
+    @staticmethod
+    def test_load_recent_sack_of_gems_price() -> None:
+        listing_hash = sack_of_gems.get_listing_hash_for_gems()
+        current_timestamp = creation_time_utils.to_timestamp(
+            creation_time_utils.get_current_time(),
+        )
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fname = str(Path(temp_dir) / "listing_sack_of_gems.json")
+
+            json_utils.save_json(
+                {listing_hash: {"ask": 0.57, "update_timestamp": current_timestamp}},
+                fname,
+            )
+            assert sack_of_gems.load_recent_sack_of_gems_price(fname) == 0.57
+
+            # The price is too old to be re-used.
+            json_utils.save_json(
+                {listing_hash: {"ask": 0.57, "update_timestamp": 0}},
+                fname,
+            )
+            assert sack_of_gems.load_recent_sack_of_gems_price(fname) is None
+
+    @staticmethod
+    def test_download_sack_of_gems_price_from_scratch_without_any_ask() -> None:
+        listing_hash = sack_of_gems.get_listing_hash_for_gems()
+
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch(
+                "src.sack_of_gems.download_market_order_data",
+                return_value=(-1, -1, -1, -1),
+            ),
+            mock.patch("src.sack_of_gems.get_listing_details") as get_listing_details,
+        ):
+            fname = str(Path(temp_dir) / "listing_sack_of_gems.json")
+
+            # The last known price is re-used, even if it has expired.
+            json_utils.save_json(
+                {listing_hash: {"ask": 0.57, "update_timestamp": 0}},
+                fname,
+            )
+            assert (
+                sack_of_gems.download_sack_of_gems_price_from_scratch(
+                    fname,
+                    verbose=False,
+                )
+                == 0.57
+            )
+
+            # Without any price, the listing page is not fetched if the item name ID is known.
+            json_utils.save_json({listing_hash: {"item_nameid": "1"}}, fname)
+            assert (
+                sack_of_gems.download_sack_of_gems_price_from_scratch(
+                    fname,
+                    verbose=False,
+                )
+                == -1
+            )
+
+        get_listing_details.assert_not_called()
+
 
 class TestMarketSearchMethods(unittest.TestCase):
     @staticmethod
     def test_download_all_listings() -> None:
         assert market_search.download_all_listings() is True
 
+    @staticmethod
+    def test_load_all_listings_with_index() -> None:
+        all_listings = {"10-A Booster Pack": {"sell_listings": 5, "sell_price": 30}}
+
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            data_context.shared_data_context(),
+        ):
+            listing_output_file_name = str(Path(temp_dir) / "listings.json")
+            market_search.save_all_listings(all_listings, listing_output_file_name)
+
+            market_search.load_all_listings(listing_output_file_name, with_index=True)
+
+            all_listings["20-B Booster Pack"] = {"sell_listings": 5, "sell_price": 10}
+            with mock.patch("src.market_search.build_listing_index") as build_fn:
+                market_search.save_all_listings(all_listings, listing_output_file_name)
+                index = market_search.load_all_listings(
+                    listing_output_file_name,
+                    with_index=True,
+                )
+
+        # The memoized index is updated incrementally when the listings are saved, instead of being built again.
+        build_fn.assert_not_called()
+        assert index["listings"] == all_listings
+        assert listing_index.get_listing_hashes_in_price_range(index) == [
+            "20-B Booster Pack",
+            "10-A Booster Pack",
+        ]
+
 
 class TestMarketUtilsMethods(unittest.TestCase):
     @staticmethod
@@ -91,6 +405,86 @@ class TestMarketArbitrageMethods(unittest.TestCase):
 
         assert flag
 
+    @staticmethod
+    def test_apply_workflow_with_item_nameid_backfill() -> None:
+        for retrieve_market_orders_online in [False, True]:
+            workflow = mock.MagicMock()
+
+            with (
+                mock.patch(
+                    "market_arbitrage.get_filtered_badge_data",
+                    workflow.get_filtered_badge_data,
+                ),
+                mock.patch(
+                    "market_arbitrage.background_item_nameid_backfill",
+                    workflow.background_item_nameid_backfill,
+                ),
+                mock.patch("market_arbitrage.load_market_order_data", return_value={}),
+                mock.patch(
+                    "market_arbitrage.update_badge_arbitrages_with_latest_market_order_data",
+                    return_value={},
+                ),
+                mock.patch("market_arbitrage.print_gem_price_reminder"),
+            ):
+                workflow.get_filtered_badge_data.return_value = {}
+
+                assert market_arbitrage.apply_workflow(
+                    retrieve_listings_from_scratch=False,
+                    retrieve_market_orders_online=retrieve_market_orders_online,
+                )
+
+            # The backfill is only started if market orders are downloaded, after the crawl of search pages.
+            called_names = [name for name, _args, _kwargs in workflow.mock_calls]
+            assert ("background_item_nameid_backfill" in called_names) is (
+                retrieve_market_orders_online
+            )
+            assert called_names[0] == "get_filtered_badge_data"
+
+
+class TestMarketArbitrageWithFoilCardsMethods(unittest.TestCase):
+    @staticmethod
+    def test_apply_workflow_for_foil_cards() -> None:
+        # Goo values and item types are known for every appID, so that the workflow runs offline.
+        all_listings = {
+            "10-Card A (Foil)": {"sell_listings": 3, "sell_price": 5},
+            "10-Card B (Foil)": {"sell_listings": 1, "sell_price": 9},
+            "20-Card C (Foil)": {"sell_listings": 2, "sell_price": 30},
+        }
+        all_listing_details = {
+            "10-Card A (Foil)": {"item_nameid": 1, "item_type_no": 2},
+            "20-Card C (Foil)": {"item_nameid": 2, "item_type_no": 3},
+        }
+        all_goo_details = {"10": 100, "20": 40}
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            file_names = {}
+
+            for field, data in [
+                ("get_listing_output_file_name_for_foil_cards", all_listings),
+                (
+                    "get_listing_details_output_file_name_for_foil_cards",
+                    all_listing_details,
+                ),
+                ("get_goo_details_file_nam_for_for_foil_cards", all_goo_details),
+            ]:
+                file_names[field] = str(Path(temp_dir) / f"{field}.json")
+                json_utils.save_json(data, file_names[field])
+
+            with mock.patch.multiple(
+                market_arbitrage_with_foil_cards,
+                **{
+                    field: mock.Mock(return_value=fname)
+                    for field, fname in file_names.items()
+                },
+            ):
+                flag = market_arbitrage_with_foil_cards.apply_workflow_for_foil_cards(
+                    retrieve_listings_from_scratch=False,
+                    enforced_sack_of_gems_price=0.30,
+                    verbose=False,
+                )
+
+        assert flag
+
 
 class TestMarketOrderMethods(unittest.TestCase):
     @staticmethod
@@ -103,6 +497,128 @@ class TestMarketOrderMethods(unittest.TestCase):
 
         assert flag
 
+    @staticmethod
+    def test_get_market_order_headers() -> None:
+        market_order_data = {
+            "bid": 0.30,
+            market_order.ETAG_FIELD: '"abc"',
+            market_order.LAST_MODIFIED_FIELD: "Tue, 01 Nov 2022 00:00:00 GMT",
+        }
+        validators = market_order.get_validators(market_order_data)
+
+        headers = market_order.get_market_order_headers(validators)
+        assert headers["If-None-Match"] == '"abc"'
+        assert headers["If-Modified-Since"] == "Tue, 01 Nov 2022 00:00:00 GMT"
+
+        # Without validators, the request is not conditional.
+        headers = market_order.get_market_order_headers()
+        assert "If-None-Match" not in headers
+        assert "If-Modified-Since" not in headers
+
+    @staticmethod
+    def test_download_market_order_data_batch_with_a_missing_listing_page() -> None:
+        badge_data = {
+            "10": {"listing_hash": "10-A Booster Pack", "gem_price": 0.10},
+            "20": {"listing_hash": "20-B Booster Pack", "gem_price": 0.10},
+        }
+        listing_details = {
+            "10-A Booster Pack": {"item_nameid": 1, "is_marketable": True},
+        }
+
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch(
+                "src.market_order.force_update_sessionid",
+                side_effect=lambda cookie: cookie,
+            ),
+            mock.patch(
+                "src.market_listing.get_listing_details",
+                return_value=({}, 404),
+            ),
+            mock.patch(
+                "src.market_order.download_market_order_data_with_validators",
+                return_value=((0.30, 0.40, 100, 10), {}, 200),
+            ),
+        ):
+            listing_details_output_file_name = str(Path(temp_dir) / "details.json")
+            json_utils.save_json(listing_details, listing_details_output_file_name)
+            market_order_output_file_name = str(Path(temp_dir) / "orders.json")
+
+            market_order_dict = market_order.download_market_order_data_batch(
+                badge_data,
+                market_order_output_file_name=market_order_output_file_name,
+                listing_details_output_file_name=listing_details_output_file_name,
+            )
+
+            # The market orders downloaded before the failure are saved to disk.
+            assert list(market_order_dict) == ["10-A Booster Pack"]
+            assert list(json_utils.load_json(market_order_output_file_name)) == [
+                "10-A Booster Pack",
+            ]
+
+    @staticmethod
+    def test_select_badge_data_to_revalidate() -> None:
+        badge_data = {
+            "10": {"listing_hash": "10-A Booster Pack", "gem_price": 0.10},
+            "20": {"listing_hash": "20-B Booster Pack", "gem_price": 0.10},
+            "30": {"listing_hash": "30-C Booster Pack", "gem_price": 0.10},
+        }
+        market_order_dict = {
+            "10-A Booster Pack": {"bid": 0.05},
+            "20-B Booster Pack": {"bid": 0.50},
+        }
+
+        # Missing market orders first, then the highest estimated profit first.
+        selected_badge_data = market_order.select_badge_data_to_revalidate(
+            badge_data,
+            market_order_dict,
+            max_num_listings=2,
+        )
+        assert list(selected_badge_data) == ["30", "20"]
+
+    @staticmethod
+    def test_save_market_order_data() -> None:
+        field = market_order.UPDATE_COOLDOWN_FIELD
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fname = str(Path(temp_dir) / "market_orders.json")
+            market_order.save_market_order_data({"A": {"bid": 1, field: 2}}, fname)
+
+            # The most recent row of each listing is kept.
+            all_market_order_data = market_order.save_market_order_data(
+                {"A": {"bid": 0, field: 1}, "B": {"bid": 3, field: 1}},
+                fname,
+            )
+
+        assert all_market_order_data == {
+            "A": {"bid": 1, field: 2},
+            "B": {"bid": 3, field: 1},
+        }
+
+    @staticmethod
+    def test_can_skip_unchanged_listing() -> None:
+        badge_data = {"gem_price": 0.50, "sell_price": 0.60, "sell_listings": 12}
+        market_order_data = {
+            "bid": 0.30,
+            "ask": 0.60,
+            "bid_volume": 100,
+            "ask_volume": 12,
+        } | market_order.get_listing_snapshot(badge_data)
+
+        assert market_order.can_skip_unchanged_listing(market_order_data, badge_data)
+
+        # The number of sell listings has changed on search pages.
+        assert not market_order.can_skip_unchanged_listing(
+            market_order_data,
+            badge_data | {"sell_listings": 11},
+        )
+
+        # The bid is close to the crafting cost.
+        assert not market_order.can_skip_unchanged_listing(
+            market_order_data | {"bid": 0.55},
+            badge_data,
+        )
+
 
 class TestUtilsMethods(unittest.TestCase):
     @staticmethod
@@ -128,5 +644,731 @@ class TestDropRateEstimatesMethods(unittest.TestCase):
         assert drop_rate_estimates.main() is True
 
 
+class TestHttpCacheMethods(unittest.TestCase):
+    @staticmethod
+    def test_prune_http_cache() -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            http_cache_folder = f"{temp_dir}/"
+            file_names = {
+                cache_policy: http_cache.get_cache_policy_folder(
+                    cache_policy,
+                    http_cache_folder,
+                )
+                + "entry.json.gz"
+                for cache_policy in ["market_order", "market_listing"]
+            }
+
+            # Both entries were written a day ago.
+            for fname in file_names.values():
+                Path(fname).touch()
+                os.utime(fname, (0, Path(fname).stat().st_mtime - 24 * 3600))
+
+            assert http_cache.prune_http_cache(http_cache_folder) == 1
+
+            # Listing pages are kept forever.
+            assert not Path(file_names["market_order"]).exists()
+            assert Path(file_names["market_listing"]).exists()
+
+    @staticmethod
+    def test_cached_entry() -> None:
+        entry = {
+            "url": "https://steamcommunity.com/market/itemordershistogram",
+            "status_code": 200,
+            "headers": {"ETag": '"abc"'},
+            "encoding": "utf-8",
+            "body": '{"success": 1}',
+            "timestamp": 0,
+        }
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fname = str(Path(temp_dir) / "entry.json.gz")
+            http_cache.save_cached_entry(entry, fname)
+            loaded_entry = http_cache.load_cached_entry(fname)
+
+        assert loaded_entry == entry
+
+        response = http_cache.convert_entry_to_response(loaded_entry)
+        assert response.ok
+        assert response.json() == {"success": 1}
+        assert response.headers["ETag"] == '"abc"'
+
+        assert http_cache.is_entry_fresh(entry, time_to_live=None)
+        assert not http_cache.is_entry_fresh(entry, time_to_live=60)
+
+        # The key does not depend on the order of the parameters.
+        assert http_cache.get_cache_key(
+            "GET",
+            entry["url"],
+            {"a": "1", "b": "2"},
+        ) == http_cache.get_cache_key("GET", entry["url"], {"b": "2", "a": "1"})
+
+    @staticmethod
+    def test_get_flight_key() -> None:
+        url = "https://steamcommunity.com/market/itemordershistogram"
+        params = {"item_nameid": "1"}
+
+        # A conditional request is never coalesced with an unconditional one.
+        assert http_cache.get_flight_key(url, params) != http_cache.get_flight_key(
+            url,
+            params,
+            {"If-None-Match": '"abc"'},
+        )
+        assert not http_cache.is_request_in_flight(url, params)
+
+    @staticmethod
+    def test_rate_limited_requests() -> None:
+        import requests  # noqa: PLC0415
+
+        url = "https://steamcommunity.com/market/itemordershistogram"
+        response = http_cache.convert_entry_to_response(
+            {
+                "url": url,
+                "status_code": 200,
+                "headers": {},
+                "encoding": "utf-8",
+                "body": '{"success": 1}',
+                "timestamp": 0,
+            },
+        )
+        waits = []
+
+        def wait_fn(rate_limiter: dict) -> bool:
+            waits.append(rate_limiter)
+            return rate_limiter["is_allowed"]
+
+        with (
+            tempfile.TemporaryDirectory() as temp_dir,
+            mock.patch(
+                "src.http_cache.get_http_cache_folder",
+                return_value=f"{temp_dir}/",
+            ),
+            mock.patch("requests.get", return_value=response) as get,
+        ):
+            with http_cache.rate_limited_requests(
+                {"is_allowed": True},
+                wait_fn=wait_fn,
+            ):
+                for _ in range(2):
+                    http_cache.cached_get(
+                        url,
+                        {"item_nameid": "1"},
+                        cache_policy="market_order",
+                    )
+
+            # The cached response does not wait for the rate limiter.
+            assert len(waits) == 1
+            assert get.call_count == 1
+
+            is_cancelled = False
+
+            with http_cache.rate_limited_requests(
+                {"is_allowed": False},
+                wait_fn=wait_fn,
+            ):
+                try:
+                    http_cache.cached_get(
+                        url,
+                        {"item_nameid": "2"},
+                        cache_policy="market_order",
+                    )
+                except requests.exceptions.RequestException:
+                    is_cancelled = True
+
+            # The request is cancelled if the rate limiter does not allow it.
+            assert is_cancelled
+            assert len(waits) == 2
+            assert get.call_count == 1
+
+
+class TestDataContextMethods(unittest.TestCase):
+    @staticmethod
+    def test_shared_data_context() -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fname = str(Path(temp_dir) / "data.json")
+            json_utils.save_json({"a": {"b": 1}}, fname)
+
+            with data_context.shared_data_context() as context:
+                data = json_utils.load_json(fname)
+                data["a"]["b"] = 2
+
+                # The memo is not affected by changes made by the caller.
+                assert json_utils.load_json(fname) == {"a": {"b": 1}}
+                assert len(context["files"]) == 1
+
+                json_utils.save_json(data, fname)
+                assert json_utils.load_json(fname) == {"a": {"b": 2}}
+
+            assert not data_context.is_data_context_active()
+
+    @staticmethod
+    def test_background_threads_are_joined_before_teardown() -> None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            fname = str(Path(temp_dir) / "data.json")
+            json_utils.save_json({"a": 1}, fname)
+
+            loaded_data = []
+            is_started = threading.Event()
+
+            def load_data() -> None:
+                is_started.wait()
+                loaded_data.append(json_utils.load_json(fname))
+
+            with data_context.shared_data_context():
+                thread = data_context.start_background_thread(load_data, "loader")
+                is_started.set()
+
+            # The thread is done before the context is torn down, so that it does not load data from a closed context.
+            assert not thread.is_alive()
+            assert loaded_data == [{"a": 1}]
+
+
+class TestFoilBenchmarkUtilsMethods(unittest.TestCase):
+    @staticmethod
+    def test_resolve_item_types_in_a_single_pass() -> None:
+        for num_app_ids in [10, 100]:
+            all_listings, all_listing_details = (
+                foil_benchmark_utils.generate_synthetic_foil_data(num_app_ids)
+            )
+            groups_by_app_id = market_foil_utils.group_listing_hashes_by_app_id(
+                listing_index.build_listing_index(all_listings),
+                verbose=False,
+            )
+
+            with mock.patch(
+                "src.market_foil_utils.build_dictionary_of_representative_listing_hashes",
+                wraps=market_foil_utils.build_dictionary_of_representative_listing_hashes,
+            ) as build_dictionary:
+                app_ids = market_foil_utils.find_app_ids_with_unknown_item_type_for_their_representatives(
+                    groups_by_app_id,
+                    list(all_listings),
+                    all_listing_details=all_listing_details,
+                    verbose=False,
+                )
+
+            # Representatives are indexed once, whatever the number of appIDs, instead of once per appID.
+            assert build_dictionary.call_count == 1
+            assert app_ids == [str(app_id) for app_id in range(0, num_app_ids, 3)]
+
+
+class TestGambleExpectedValueMethods(unittest.TestCase):
+    @staticmethod
+    def test_summarize_gamble() -> None:
+        # A badge drops an item worth 100 cents with probability 1/4, and an item worth nothing otherwise.
+        badge_value_distribution = {100: 0.25, 0: 0.75}
+
+        summary = gamble_expected_value.summarize_gamble(
+            badge_value_distribution,
+            badge_price_in_cents=30,
+            num_badges=2,
+        )
+
+        assert abs(summary["expected_profit"] - (2 * 25 - 60)) < 1e-9
+        assert abs(summary["variance"] - 2 * 100**2 * 0.25 * 0.75) < 1e-9
+        assert abs(summary["probability_of_profit"] - (1 - 0.75**2)) < 1e-9
+
+    @staticmethod
+    def test_main() -> None:
+        assert gamble_expected_value.main() is True
+
+
+class TestGooValuePredictorMethods(unittest.TestCase):
+    @staticmethod
+    def test_select_app_ids_to_query() -> None:
+        all_goo_details = {str(app_id): 40 for app_id in range(100)}
+        num_cards_per_set = {str(app_id): 5 for app_id in range(102)}
+        num_cards_per_set["102"] = 15
+
+        model = goo_value_predictor.build_goo_value_model(
+            all_goo_details,
+            num_cards_per_set,
+        )
+
+        app_ids_to_query = goo_value_predictor.select_app_ids_to_query(
+            ["100", "101", "102"],
+            model,
+            num_cards_per_set,
+            # 40 gems are worth 1.2 cents if a sack of gems costs 0.30€
+            cheapest_ask_in_cents={"100": 1, "101": 3, "102": 3},
+            sack_of_gems_price_in_euros=0.30,
+        )
+
+        # 100: could be profitable ; 101: cannot be profitable ; 102: unknown set size.
+        assert app_ids_to_query == ["100", "102"]
+
+    @staticmethod
+    def test_main() -> None:
+        assert goo_value_predictor.main() is True
+
+
+class TestJobSchedulerMethods(unittest.TestCase):
+    @staticmethod
+    def test_submit_job() -> None:
+        processed_jobs = []
+
+        with job_scheduler.shared_job_scheduler():
+            futures = [
+                job_scheduler.submit_job(api_type, job_fn)
+                for api_type, job_fn in [
+                    ("market_search", lambda: processed_jobs.append("first") or 1),
+                    ("market_order", lambda: 2),
+                    ("market_search", lambda: processed_jobs.append("second") or 3),
+                ]
+            ]
+            results = [future.result() for future in futures]
+
+        # Jobs of the same endpoint class are processed in order.
+        assert results == [1, 2, 3]
+        assert processed_jobs == ["first", "second"]
+
+        # Outside of a shared job scheduler, jobs are run immediately.
+        assert job_scheduler.submit_job("market_search", lambda: 4).done()
+
+
+class TestListingIndexMethods(unittest.TestCase):
+    @staticmethod
+    def test_build_listing_index() -> None:
+        index = listing_index.build_listing_index(
+            {
+                "10-A Booster Pack": {"sell_listings": 5, "sell_price": 30},
+                "20-B Booster Pack": {"sell_listings": 5, "sell_price": 10},
+                "10-A Card": {"sell_listings": 5, "sell_price": 20},
+            },
+        )
+
+        assert listing_index.get_listing_hashes_in_price_range(index, 10, 20) == [
+            "20-B Booster Pack",
+            "10-A Card",
+        ]
+        assert listing_index.get_listing_hashes_in_price_range(
+            index,
+            min_sell_price=20,
+            reverse=True,
+        ) == ["10-A Booster Pack", "10-A Card"]
+        assert listing_index.get_listing_hashes_for_app_id(index, "10") == [
+            "10-A Booster Pack",
+            "10-A Card",
+        ]
+
+    @staticmethod
+    def test_upsert_listings() -> None:
+        app_id_index = {"10": ["10-A Booster Pack"]}
+        index = {
+            "listings": {"10-A Booster Pack": {"sell_listings": 5, "sell_price": 30}},
+            "price_index": [(30, "10-A Booster Pack")],
+            "app_id_index": app_id_index.copy(),
+        }
+
+        listing_index.upsert_listings(
+            index,
+            {
+                "10-A Booster Pack": {"sell_listings": 5, "sell_price": 5},
+                "10-A Card": {"sell_listings": 5, "sell_price": 20},
+            },
+        )
+
+        assert index["price_index"] == [(5, "10-A Booster Pack"), (20, "10-A Card")]
+        assert listing_index.get_listing_hashes_for_app_id(index, "10") == [
+            "10-A Booster Pack",
+            "10-A Card",
+        ]
+        # The lists of the appID index are replaced rather than mutated.
+        assert app_id_index == {"10": ["10-A Booster Pack"]}
+
+
+class TestInventoryUtilsMethods(unittest.TestCase):
+    @staticmethod
+    def test_pop_asset_id() -> None:
+        listing_hash = "292030-The Witcher 3: Wild Hunt Booster Pack"
+        steam_inventory = {
+            "rgInventory": {
+                "101": {"id": "101", "classid": "1", "instanceid": "0"},
+                "102": {"id": "102", "classid": "1", "instanceid": "0"},
+                "103": {"id": "103", "classid": "1", "instanceid": "7"},
+            },
+            "rgDescriptions": {
+                "1_0": {"market_hash_name": listing_hash, "marketable": 1},
+                "1_7": {"market_hash_name": listing_hash, "marketable": 0},
+            },
+        }
+
+        inventory_index = inventory_utils.build_inventory_index(steam_inventory)
+
+        asset_ids = {
+            inventory_utils.pop_asset_id(inventory_index, listing_hash)
+            for _ in range(2)
+        }
+
+        # Two distinct marketable assets, then the unmarketable one as a last resort.
+        assert asset_ids == {"101", "102"}
+        assert inventory_utils.pop_asset_id(inventory_index, listing_hash) == "103"
+        assert inventory_utils.pop_asset_id(inventory_index, listing_hash) is None
+
+    @staticmethod
+    def test_sell_assets_from_inventory_index() -> None:
+        listing_hash = "292030-The Witcher 3: Wild Hunt Booster Pack"
+        inventory_index = {
+            listing_hash: {"1_0": {"marketable": True, "asset_ids": ["101", "102"]}},
+        }
+
+        def sell_fn(asset_id: str, price_in_cents: int) -> dict:
+            return {"success": asset_id == "102" and price_in_cents > 0}
+
+        results = inventory_utils.sell_assets_from_inventory_index(
+            inventory_index,
+            {listing_hash: 30},
+            sell_fn,
+            num_copies_per_listing_hash={listing_hash: 2},
+        )
+
+        # The first asset is sold, then the sale of the second one fails, so it is dropped from the index too.
+        assert results == {listing_hash: {"success": False}}
+        assert inventory_index[listing_hash]["1_0"]["asset_ids"] == []
+
+    @staticmethod
+    def test_is_inventory_index_expired() -> None:
+        current_timestamp = creation_time_utils.to_timestamp(
+            creation_time_utils.get_current_time(),
+        )
+
+        for last_full_refresh_timestamp, is_expired in [
+            (None, True),
+            (
+                current_timestamp - 2 * inventory_utils.INVENTORY_INDEX_TTL_IN_SECONDS,
+                True,
+            ),
+            (current_timestamp, False),
+        ]:
+            assert (
+                inventory_utils.is_inventory_index_expired(
+                    {"last_full_refresh_timestamp": last_full_refresh_timestamp},
+                )
+                is is_expired
+            )
+
+    @staticmethod
+    def test_add_inventory_page_to_index() -> None:
+        listing_hash = "292030-The Witcher 3: Wild Hunt Booster Pack"
+        page = {
+            "assets": [
+                {"assetid": "105", "classid": "1", "instanceid": "0"},
+                {"assetid": "104", "classid": "1", "instanceid": "0"},
+                {"assetid": "103", "classid": "1", "instanceid": "0"},
+            ],
+            "descriptions": [
+                {
+                    "classid": "1",
+                    "instanceid": "0",
+                    "market_hash_name": listing_hash,
+                    "marketable": 1,
+                },
+            ],
+        }
+
+        inventory_index = {}
+        has_reached_known_assets = inventory_utils.add_inventory_page_to_index(
+            inventory_index,
+            page,
+            last_known_asset_id=103,
+        )
+
+        # Only the assets created after the last known asset are indexed.
+        assert has_reached_known_assets
+        assert inventory_index[listing_hash]["1_0"]["asset_ids"] == ["105", "104"]
+        assert inventory_utils.find_last_asset_id(inventory_index) == 105
+
+    @staticmethod
+    def test_get_asset_id_of_created_booster_pack() -> None:
+        creation_result = {
+            "purchase_result": {"communityitemid": "123", "appid": 685400},
+            "goo_amount": "22793",
+        }
+
+        assert (
+            inventory_utils.get_asset_id_of_created_booster_pack(creation_result)
+            == "123"
+        )
+        assert inventory_utils.get_asset_id_of_created_booster_pack(None) is None
+
+    @staticmethod
+    def test_create_then_sell_booster_packs_in_pipeline() -> None:
+        listing_hash = "292030-The Witcher 3: Wild Hunt Booster Pack"
+
+        with (
+            mock.patch("src.inventory_utils.get_cookie_dict", return_value={}),
+            mock.patch(
+                "src.inventory_utils.create_booster_pack",
+                return_value={"purchase_result": {}},
+            ),
+            mock.patch(
+                "src.inventory_utils.sell_booster_packs_for_batch",
+                return_value={listing_hash: None},
+            ) as sell_fn,
+        ):
+            inventory_utils.create_then_sell_booster_packs_in_pipeline(
+                {listing_hash: 30},
+                update_steam_inventory=False,
+                profile_id="0",
+            )
+
+        # Without an asset ID at creation, the pack is matched in the inventory, which is only updated if required.
+        assert sell_fn.call_args.kwargs["update_steam_inventory"] is False
+
+
+class TestItemNameidBackfillMethods(unittest.TestCase):
+    @staticmethod
+    def test_prioritize_listing_hashes_for_backfill() -> None:
+        badge_creation_details = {
+            "10": {"name": "A", "gem_value": 400},
+            "20": {"name": "B", "gem_value": 400},
+            "30": {"name": "C", "gem_value": 1000},
+            "40": {"name": "D", "gem_value": 400},
+        }
+        all_listings = {
+            f"{app_id}-{badge['name']} Booster Pack": {"sell_price": 100}
+            for app_id, badge in badge_creation_details.items()
+        }
+        all_listings["50-E Booster Pack"] = {"sell_price": 500}
+
+        listing_hashes = item_nameid_backfill.prioritize_listing_hashes_for_backfill(
+            badge_creation_details,
+            all_listings,
+            listing_details={"40-D Booster Pack": {"item_nameid": 1}},
+            market_order_dict={"10-A Booster Pack": {}, "30-C Booster Pack": {}},
+        )
+
+        # New games first, then the highest sell price per gem first, then games which are not owned.
+        assert listing_hashes == [
+            "20-B Booster Pack",
+            "10-A Booster Pack",
+            "30-C Booster Pack",
+            "50-E Booster Pack",
+        ]
+
+
+class TestItemTypeInferenceMethods(unittest.TestCase):
+    @staticmethod
+    def test_infer_item_types() -> None:
+        all_listing_details = {
+            "10-Card A (Foil)": {"item_type_no": None},
+            "10-Card B (Foil)": {"item_type_no": 15},
+            "20-Card A (Foil)": {"item_type_no": 3},
+            "30-Card A (Foil)": {"item_type_no": 9},
+        }
+        num_cards_per_set = {"20": 5, "30": 5}
+
+        inferred_item_types = item_type_inference.infer_item_types(
+            ["10", "40"],
+            all_listing_details,
+            num_cards_per_set,
+            min_confidence=0.6,
+        )
+
+        # 10: item type of another card ; 40: default item type, consistent with half of the known item types.
+        assert inferred_item_types["10"]["item_type"] == 15
+        assert "40" not in inferred_item_types
+
+        # The default item type is not confident enough, even if it is consistent with most of the known item types.
+        all_listing_details["40-Card A (Foil)"] = {"item_type_no": 4}
+        num_cards_per_set["40"] = 5
+
+        inferred_item_types = item_type_inference.infer_item_types(
+            ["50"],
+            all_listing_details,
+            num_cards_per_set,
+        )
+
+        assert inferred_item_types == {}
+
+    @staticmethod
+    def test_main() -> None:
+        assert item_type_inference.main() is True
+
+
+class TestImportTimeUtilsMethods(unittest.TestCase):
+    @staticmethod
+    def test_entry_modules_do_not_import_network_dependencies() -> None:
+        # NB: this checks which modules are imported, not the start-up time, which is too noisy for a test.
+        for module_name in import_time_utils.ENTRY_MODULES:
+            assert import_time_utils.find_eagerly_imported_modules(module_name) == []
+
+    @staticmethod
+    def test_main() -> None:
+        assert import_time_utils.main() is True
+
+
+class TestProfilingUtilsMethods(unittest.TestCase):
+    @staticmethod
+    def test_is_profiling_requested() -> None:
+        assert profiling_utils.is_profiling_requested(["script.py", "--profile"])
+        assert not profiling_utils.is_profiling_requested(["script.py"])
+
+    @staticmethod
+    def test_main() -> None:
+        assert profiling_utils.main() is True
+
+
+class TestRarityPatternCatalogMethods(unittest.TestCase):
+    @staticmethod
+    def test_get_item_rarity_patterns_per_app_id() -> None:
+        catalog = {
+            "profile backgrounds": {
+                "10": {"common": 3, "uncommon": 1, "rare": 1},
+                "20": {"common": 2, "uncommon": 2, "rare": 1},
+            },
+        }
+        listing_hashes_per_app_id_for_common = {"10": 3, "20": 4, "30": 1}
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            catalog_file_name = str(Path(temp_dir) / "rarity_patterns.json")
+            json_utils.save_json(catalog, catalog_file_name)
+
+            item_rarity_patterns_per_app_id = (
+                rarity_pattern_catalog.get_item_rarity_patterns_per_app_id(
+                    listing_hashes_per_app_id_for_common,
+                    catalog_file_name=catalog_file_name,
+                    look_for_profile_backgrounds=True,
+                    retrieve_missing_rarity_patterns=False,
+                )
+            )
+
+        # 20: the number of items of Common rarity has changed ; 30: new appID.
+        assert rarity_pattern_catalog.find_app_ids_to_refresh(
+            catalog["profile backgrounds"],
+            listing_hashes_per_app_id_for_common,
+        ) == ["20", "30"]
+        assert (
+            item_rarity_patterns_per_app_id["10"]
+            == catalog["profile backgrounds"]["10"]
+        )
+        assert item_rarity_patterns_per_app_id["30"]["uncommon"] is None
+
+
+class TestRateLimiterMethods(unittest.TestCase):
+    @staticmethod
+    def test_compute_waiting_time() -> None:
+        limiter = rate_limiter.create_rate_limiter("goo_value")
+        limiter["max_num_queries"] = 2
+        limiter["cooldown"] = 60
+
+        assert rate_limiter.compute_waiting_time(limiter, current_time=0) == 0
+
+        limiter["query_timestamps"].extend([0, 1])
+        assert rate_limiter.compute_waiting_time(limiter, current_time=2) == 58
+
+        # The first query is out of the sliding window.
+        assert rate_limiter.compute_waiting_time(limiter, current_time=60) == 0
+
+    @staticmethod
+    def test_is_rate_limiter_exhausted() -> None:
+        limiter = rate_limiter.create_rate_limiter("goo_value")
+        limiter["max_num_queries"] = 1
+
+        assert not rate_limiter.is_rate_limiter_exhausted(limiter)
+
+        rate_limiter.wait_for_rate_limiter(limiter)
+        assert rate_limiter.is_rate_limiter_exhausted(limiter)
+
+    @staticmethod
+    def test_try_to_acquire_rate_limiter() -> None:
+        limiter = rate_limiter.create_rate_limiter("goo_value")
+        limiter["max_num_queries"] = 2
+        limiter[rate_limiter.INTER_REQUEST_COOLDOWN_FIELD] = 0
+
+        # Queries reserved for the foreground are not available to background work.
+        assert rate_limiter.try_to_acquire_rate_limiter(limiter, num_reserved_queries=1)
+        assert not rate_limiter.try_to_acquire_rate_limiter(
+            limiter,
+            num_reserved_queries=1,
+        )
+        assert rate_limiter.try_to_acquire_rate_limiter(limiter)
+        assert not rate_limiter.try_to_acquire_rate_limiter(limiter)
+
+
+class TestRetryUtilsMethods(unittest.TestCase):
+    @staticmethod
+    def test_is_retryable_status_code() -> None:
+        assert retry_utils.is_retryable_status_code(None)
+        assert retry_utils.is_retryable_status_code(429)
+        assert not retry_utils.is_retryable_status_code(403)
+
+    @staticmethod
+    def test_compute_backoff_in_seconds() -> None:
+        for attempt_no in range(10):
+            backoff = retry_utils.compute_backoff_in_seconds(attempt_no)
+            assert 0 <= backoff <= retry_utils.MAX_BACKOFF_IN_SECONDS
+
+    @staticmethod
+    def test_request_with_retries() -> None:
+        status_codes = [403, 200]
+        _result, status_code = retry_utils.request_with_retries(
+            lambda: (None, status_codes.pop(0)),
+        )
+
+        # A status code which is not retryable is returned at once.
+        assert status_code == 403
+        assert status_codes == [200]
+
+    @staticmethod
+    def test_process_retry_queue() -> None:
+        retry_budget = retry_utils.create_retry_budget(max_num_retries=2)
+
+        failed_items = retry_utils.process_retry_queue(
+            [1, 2, 3],
+            lambda item: item % 2 == 1,
+            max_num_rounds=1,
+            retry_budget=retry_budget,
+        )
+
+        # Item 3 is not retried, because the retry budget is exhausted.
+        assert failed_items == [2, 3]
+        assert not retry_utils.consume_retry_budget(retry_budget)
+
+
+class TestTelemetryUtilsMethods(unittest.TestCase):
+    @staticmethod
+    def test_find_regressed_stages() -> None:
+        runs = [
+            {
+                "stages": [
+                    {"name": "stage", "duration_in_seconds": 2.0, "num_items_in": 10},
+                ],
+            },
+            {
+                "stages": [
+                    {"name": "stage", "duration_in_seconds": 8.0, "num_items_in": 10},
+                ],
+            },
+        ]
+
+        assert telemetry_utils.find_regressed_stages(runs) == ["stage"]
+
+        # Slower because there are more items to process: not a regression.
+        runs[-1]["stages"][0]["num_items_in"] = 40
+        assert telemetry_utils.find_regressed_stages(runs) == []
+
+    @staticmethod
+    def test_track_workflow() -> None:
+        @telemetry_utils.track_workflow("dummy workflow")
+        def dummy_workflow() -> bool:
+            with telemetry_utils.track_stage("dummy stage", [1, 2, 3]) as stage:
+                telemetry_utils.record_cache_lookup("dummy cache", is_hit=True)
+                telemetry_utils.set_num_items_out(stage, [1])
+            return True
+
+        telemetry_utils.start_run("outer workflow")
+        assert dummy_workflow() is True
+        run = telemetry_utils.end_run(save_to_disk=False, verbose=False)
+
+        assert [stage["name"] for stage in run["stages"]] == [
+            "dummy stage",
+            "dummy workflow",
+        ]
+        assert run["cache_hit_rates"] == {"dummy cache": 1.0}
+
+    @staticmethod
+    def test_main() -> None:
+        assert telemetry_utils.main() is True
+
+
 if __name__ == "__main__":
     unittest.main()